@@ -1,10 +1,33 @@
 import os
-from flask import Flask, render_template, request, jsonify
-from typing import Optional, Dict, Any, List
+import json
+import time
+import uuid
+import shutil
+import zipfile
+import tempfile
+from flask import Flask, render_template, request, jsonify, Response, send_file, g
+from typing import Optional, Dict, Any, List, Tuple
 from werkzeug.utils import secure_filename
+from components import scan_website_ports as port_scanner_config
 from components.scan_website_ports import scan_website_ports
+from components.udp_scan import COMMON_UDP_PORTS
+from components import tls_inspect
 from components.generate_strong_password import generate_strong_password, analyze_password_strength
 from components.analyze_metadata import analyze_metadata
+from components.metadata_cache import MetadataCache, save_stream_hashed, cache_key
+from components.batch_metadata import BatchMetadataAnalyzer, extract_archive, summarize_batch
+from components.file_signatures import sniff_file
+from components.analyzer_registry import registry as analyzer_registry
+from components import metrics
+from components.profiling import RequestProfile, ProfileStore, token_matches, MODES as PROFILE_MODES, MODE_SAMPLING
+from components.sanitize_metadata import sanitize_file, SanitizeError, SUPPORTED_FORMATS as SANITIZE_FORMATS
+from components.scan_history import ScanHistory
+from components.scan_scheduler import ScanScheduler, DEFAULT_FULL_EVERY, MIN_INTERVAL as SCAN_JOB_MIN_INTERVAL
+from components.response_encoding import (
+    negotiate_encoding, is_compressible, compress, compress_stream, serialize, wants_msgpack,
+    columnar_ports, supported_encodings, MIN_COMPRESS_SIZE, MSGPACK_AVAILABLE
+)
+from components.chunked_upload import ChunkedUploads, UploadError, RECOMMENDED_CHUNK_SIZE, DEFAULT_MAX_UPLOAD_SIZE
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 
@@ -12,14 +35,140 @@ app = Flask(__name__, static_folder='static', template_folder='templates')
 app.config['JSON_SORT_KEYS'] = False
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB máximo
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
-app.config['ALLOWED_EXTENSIONS'] = {
-    'pdf', 'docx', 'doc', 'xlsx', 'xls', 'txt', 'log', 'md',
-    'jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'webp'
-}
+
+# Caché de análisis de metadatos (clave = hash del contenido)
+app.config['METADATA_CACHE_SIZE'] = int(os.environ.get('METADATA_CACHE_SIZE', 256))
+app.config['METADATA_CACHE_DIR'] = os.environ.get('METADATA_CACHE_DIR') or None
+app.config['METADATA_CACHE_MAX_BYTES'] = int(os.environ.get('METADATA_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Análisis por lotes (pool de procesos)
+app.config['BATCH_MAX_CONTENT_LENGTH'] = int(os.environ.get('BATCH_MAX_CONTENT_LENGTH', 128 * 1024 * 1024))
+app.config['BATCH_WORKERS'] = int(os.environ.get('BATCH_WORKERS', 0)) or None
+app.config['BATCH_WORKER_MEMORY_MB'] = int(os.environ.get('BATCH_WORKER_MEMORY_MB', 1024)) or None
+
+# Perfilado bajo demanda (deshabilitado si no hay token)
+app.config['PROFILE_TOKEN'] = os.environ.get('CYBERTOOLS_PROFILE_TOKEN') or None
+app.config['PROFILE_BUFFER_SIZE'] = int(os.environ.get('PROFILE_BUFFER_SIZE', 20))
+
+# Subidas por partes: archivos mayores que MAX_CONTENT_LENGTH (cada parte lo respeta)
+app.config['CHUNKED_UPLOAD_MAX_SIZE'] = int(os.environ.get('CHUNKED_UPLOAD_MAX_SIZE', DEFAULT_MAX_UPLOAD_SIZE))
+app.config['CHUNKED_UPLOAD_TTL'] = int(os.environ.get('CHUNKED_UPLOAD_TTL', 24 * 3600))
+
+# Historial de escaneos (SQLite; ruta vacía = deshabilitado)
+app.config['SCAN_HISTORY_DB'] = os.environ.get(
+    'SCAN_HISTORY_DB', os.path.join(os.path.dirname(__file__), 'data', 'scan_history.db')
+) or None
+
+# Escaneos recurrentes (requieren el historial); el planificador solo corre si se habilita
+app.config['SCAN_SCHEDULER'] = os.environ.get('SCAN_SCHEDULER', 'false').lower() == 'true'
+app.config['SCAN_SCHEDULER_MAX_CONCURRENT'] = int(os.environ.get('SCAN_SCHEDULER_MAX_CONCURRENT', 10))
+app.config['SCAN_HISTORY_RETENTION_DAYS'] = float(os.environ.get('SCAN_HISTORY_RETENTION_DAYS', 90)) or None
 
 # Crear carpeta de uploads si no existe
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+metadata_cache = MetadataCache(
+    max_entries=app.config['METADATA_CACHE_SIZE'],
+    disk_dir=app.config['METADATA_CACHE_DIR'],
+    disk_max_bytes=app.config['METADATA_CACHE_MAX_BYTES']
+)
+
+batch_analyzer = BatchMetadataAnalyzer(
+    max_workers=app.config['BATCH_WORKERS'],
+    memory_limit_mb=app.config['BATCH_WORKER_MEMORY_MB']
+)
+
+chunked_uploads = ChunkedUploads(
+    os.path.join(app.config['UPLOAD_FOLDER'], 'chunked'),
+    max_size=app.config['CHUNKED_UPLOAD_MAX_SIZE'],
+    session_ttl=app.config['CHUNKED_UPLOAD_TTL']
+)
+
+profile_store = ProfileStore(max_profiles=app.config['PROFILE_BUFFER_SIZE'])
+
+scan_history = ScanHistory(app.config['SCAN_HISTORY_DB']) if app.config['SCAN_HISTORY_DB'] else None
+
+scan_scheduler = ScanScheduler(
+    scan_history, max_concurrent_scans=app.config['SCAN_SCHEDULER_MAX_CONCURRENT'],
+    retention_days=app.config['SCAN_HISTORY_RETENTION_DAYS']
+) if scan_history is not None else None
+if scan_scheduler is not None and app.config['SCAN_SCHEDULER']:
+    scan_scheduler.start()
+
+START_TIME = time.time()
+
+# Métricas de latencia por ruta
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+# Perfilado de una petición: header X-Profile o ?profile=<token>
+@app.before_request
+def start_request_profile():
+    token = app.config['PROFILE_TOKEN']
+    if token is None:
+        return None
+    provided = request.headers.get('X-Profile') or request.args.get('profile')
+    if not provided or not token_matches(token, provided):
+        return None
+    mode = request.headers.get('X-Profile-Mode') or request.args.get('profile_mode') or MODE_SAMPLING
+    if mode not in PROFILE_MODES:
+        mode = MODE_SAMPLING
+    route = request.url_rule.rule if request.url_rule else request.path
+    g.request_profile = RequestProfile(mode, route, request.method)
+
+@app.after_request
+def finish_request_profile(response):
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        profile_store.add(profile.finish(response.status_code))
+        response.headers['X-Profile-Id'] = profile.id
+    return response
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            method=request.method, route=route, status=str(response.status_code)
+        )
+    return response
+
+# Compresión negociada (gzip/zstd); las respuestas en streaming se comprimen por partes
+@app.after_request
+def compress_response(response):
+    if (response.direct_passthrough or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers or not is_compressible(response.mimetype)):
+        return response
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < MIN_COMPRESS_SIZE:
+            return response
+        response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def api_response(payload: Dict[str, Any], status: int = 200) -> Response:
+    """
+    Respuesta JSON o MessagePack (Accept: application/msgpack o ?format=msgpack)
+
+    Para resultados grandes; la compresión la aplica compress_response.
+    """
+    body, content_type = serialize(payload, wants_msgpack(request.headers.get('Accept'), request.args.get('format')))
+    response = Response(body, status=status, content_type=content_type)
+    response.vary.add('Accept')
+    return response
+
 # Ruta principal
 @app.route('/')
 def index():
@@ -30,6 +179,65 @@ def index():
 def favicon():
     return app.send_static_file('images/logo.ico')
 
+DEFAULT_SCAN_PORTS = [80, 443, 22, 21, 8080, 3306, 3389]
+SCAN_PROTOCOLS = ('tcp', 'udp')
+
+def parse_scan_request(data: Any) -> Tuple[Optional[str], List[int], Optional[str]]:
+    """
+    Valida el cuerpo JSON de /api/scan_ports
+
+    Compartido por el servidor WSGI (Flask) y el ASGI (asgi.py).
+
+    Returns:
+        Tupla (target, puertos válidos, mensaje de error o None)
+    """
+    if not isinstance(data, dict):
+        return None, [], "Se esperaba JSON"
+
+    target = str(data.get('target') or '').strip()
+    if not target:
+        return None, [], "Target requerido"
+
+    protocol = data.get('protocol', 'tcp')
+    if protocol not in SCAN_PROTOCOLS:
+        return None, [], "Protocolo debe ser 'tcp' o 'udp'"
+
+    # Puertos personalizados o comunes del protocolo
+    custom_ports = data.get('ports', COMMON_UDP_PORTS if protocol == 'udp' else DEFAULT_SCAN_PORTS)
+
+    if not isinstance(custom_ports, list):
+        return None, [], "Puertos deben ser una lista"
+
+    # Validar puertos (entre 1 y 65535)
+    valid_ports = [p for p in custom_ports if isinstance(p, int) and 1 <= p <= 65535]
+    if not valid_ports:
+        return None, [], "No hay puertos válidos"
+
+    return target, valid_ports, None
+
+def record_scan(scan_result: Dict[str, Any], ports: List[int]) -> None:
+    """
+    Guarda un escaneo completado en el historial y le adjunta los cambios
+    respecto del escaneo anterior del mismo host (clave "history")
+
+    Un fallo del historial nunca hace fallar el escaneo.
+    """
+    if scan_history is None or scan_result.get("protocol", "tcp") != "tcp":
+        # El historial solo guarda escaneos TCP
+        return
+    try:
+        target = scan_result["target"]
+        previous = scan_history.latest_ids(target, 1)
+        # El escáner puede recortar la lista (p. ej. en Render): solo se
+        # registran los puertos realmente sondeados
+        scan_id = scan_history.record(scan_result, ports[:scan_result["scanned_ports"]])
+        scan_result["history"] = {
+            "scan_id": scan_id,
+            "changes": scan_history.diff(target, from_id=previous[0] if previous else None, to_id=scan_id)
+        }
+    except Exception as e:
+        app.logger.error(f"No se pudo guardar el escaneo en el historial: {e}")
+
 # API de escaneo de puertos (mejorada)
 @app.route('/api/scan_ports', methods=['POST'])
 def api_scan_ports():
@@ -38,29 +246,23 @@ def api_scan_ports():
             return jsonify({"status": "error", "message": "Se esperaba JSON"}), 400
 
         data = request.get_json()
-        target = data.get('target', '').strip()
-        
-        if not target:
-            return jsonify({"status": "error", "message": "Target requerido"}), 400
-
-        # Puertos personalizados o comunes
-        custom_ports = data.get('ports', [80, 443, 22, 21, 8080, 3306, 3389])
-
-        if not isinstance(custom_ports, list):
-            return jsonify({"status": "error", "message": "Puertos deben ser una lista"}), 400
-
-        # Validar puertos (entre 1 y 65535)
-        valid_ports = [p for p in custom_ports if isinstance(p, int) and 1 <= p <= 65535]
-        if not valid_ports:
-            return jsonify({"status": "error", "message": "No hay puertos válidos"}), 400
+        target, valid_ports, error = parse_scan_request(data)
+        if error:
+            return jsonify({"status": "error", "message": error}), 400
 
         # Escanear
-        scan_result = scan_website_ports(target, valid_ports)
+        scan_result = scan_website_ports(target, valid_ports, protocol=data.get('protocol', 'tcp'),
+                                         tls=bool(data.get('tls', False)))
         
         if "error" in scan_result:
             return jsonify({"status": "error", "message": scan_result["error"]}), 400
 
-        return jsonify({
+        record_scan(scan_result, valid_ports)
+
+        if request.args.get('layout') == 'columnar':
+            scan_result = columnar_ports(scan_result)
+
+        return api_response({
             "status": "success",
             "data": scan_result
         })
@@ -73,6 +275,106 @@ def api_scan_ports():
             "debug": str(e)
         }), 500
 
+# Historial de escaneos
+@app.route('/api/scan_history')
+def api_scan_history():
+    if scan_history is None:
+        return jsonify({"error": "Historial de escaneos deshabilitado"}), 404
+
+    limit = max(1, min(request.args.get('limit', 20, type=int), 500))
+    target = request.args.get('target', '').strip()
+    if target:
+        return jsonify({"status": "success", "target": target, "scans": scan_history.history(target, limit)})
+    return jsonify({"status": "success", "targets": scan_history.targets(limit)})
+
+@app.route('/api/scan_history/<int:scan_id>')
+def api_scan_history_detail(scan_id: int):
+    if scan_history is None:
+        return jsonify({"error": "Historial de escaneos deshabilitado"}), 404
+
+    scan = scan_history.get_scan(scan_id)
+    if scan is None:
+        return jsonify({"error": "Escaneo no encontrado"}), 404
+    if request.args.get('layout') == 'columnar':
+        scan = columnar_ports(scan)
+    return api_response({"status": "success", "data": scan})
+
+# Cambios entre escaneos: ?target=host (último vs anterior) o &from=<id>&to=<id>
+@app.route('/api/scan_history/diff')
+def api_scan_history_diff():
+    if scan_history is None:
+        return jsonify({"error": "Historial de escaneos deshabilitado"}), 404
+
+    target = request.args.get('target', '').strip()
+    if not target:
+        return jsonify({"error": "Target requerido"}), 400
+
+    changes = scan_history.diff(
+        target,
+        from_id=request.args.get('from', type=int),
+        to_id=request.args.get('to', type=int)
+    )
+    if changes is None:
+        return jsonify({"error": "No hay escaneos de ese target con esos IDs"}), 404
+    return jsonify({"status": "success", "data": changes})
+
+# Escaneos recurrentes
+@app.route('/api/scan_jobs', methods=['GET', 'POST'])
+def api_scan_jobs():
+    if scan_scheduler is None:
+        return jsonify({"error": "Historial de escaneos deshabilitado"}), 404
+
+    if request.method == 'GET':
+        return jsonify({
+            "status": "success",
+            "scheduler_running": scan_scheduler.running,
+            "jobs": scan_history.list_jobs()
+        })
+
+    if not request.is_json:
+        return jsonify({"status": "error", "message": "Se esperaba JSON"}), 400
+
+    data = request.get_json()
+    target, valid_ports, error = parse_scan_request(data)
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
+    if data.get('protocol', 'tcp') != 'tcp':
+        return jsonify({"status": "error", "message": "Los escaneos recurrentes solo admiten TCP"}), 400
+
+    interval = data.get('interval', 300)
+    full_every = data.get('full_every', DEFAULT_FULL_EVERY)
+    if not isinstance(interval, (int, float)) or interval < SCAN_JOB_MIN_INTERVAL:
+        return jsonify({"status": "error", "message": f"El intervalo mínimo es {SCAN_JOB_MIN_INTERVAL:.0f}s"}), 400
+    if not isinstance(full_every, int) or full_every < 1:
+        return jsonify({"status": "error", "message": "full_every debe ser un entero positivo"}), 400
+
+    job = scan_scheduler.add_job(target, valid_ports, interval, full_every)
+    return jsonify({"status": "success", "data": job}), 201
+
+@app.route('/api/scan_jobs/<int:job_id>', methods=['DELETE'])
+def api_scan_job_delete(job_id: int):
+    if scan_scheduler is None:
+        return jsonify({"error": "Historial de escaneos deshabilitado"}), 404
+    if not scan_scheduler.remove_job(job_id):
+        return jsonify({"error": "Job no encontrado"}), 404
+    return jsonify({"status": "success"})
+
+# Eventos de cambio: ?since=<último id recibido>&target=<host>
+@app.route('/api/scan_jobs/events')
+def api_scan_job_events():
+    if scan_history is None:
+        return jsonify({"error": "Historial de escaneos deshabilitado"}), 404
+    events = scan_history.events(
+        since_id=request.args.get('since', 0, type=int),
+        target=request.args.get('target', '').strip() or None,
+        limit=max(1, min(request.args.get('limit', 100, type=int), 1000))
+    )
+    return jsonify({
+        "status": "success",
+        "events": events,
+        "last_id": events[-1]["id"] if events else request.args.get('since', 0, type=int)
+    })
+
 # API de generación de contraseñas (MEJORADA)
 @app.route('/api/generate_password', methods=['POST'])
 def api_generate_password():
@@ -111,13 +413,14 @@ def api_generate_password():
             pass
         
         # Generar contraseña
-        password: str = generate_strong_password(
-            length=length,
-            phrase=phrase if phrase else None,
-            use_numbers=use_numbers,
-            use_symbols=use_symbols,
-            use_uppercase=use_uppercase
-        )
+        with metrics.STAGE_LATENCY.time(stage="generate_password"):
+            password: str = generate_strong_password(
+                length=length,
+                phrase=phrase if phrase else None,
+                use_numbers=use_numbers,
+                use_symbols=use_symbols,
+                use_uppercase=use_uppercase
+            )
         
         # Analizar fortaleza
         analysis = analyze_password_strength(password)
@@ -139,6 +442,72 @@ def api_generate_password():
             "details": str(e)
         }), 500
 
+def wants_deep_scan(value: Any) -> bool:
+    """Interpreta el parámetro 'deep' (form, query o JSON)"""
+    if isinstance(value, bool):
+        return value
+    return str(value or '').lower() in ('1', 'true', 'yes', 'on')
+
+def process_saved_upload(filepath: str, filename: str, digest: str,
+                         deep: bool = False) -> Tuple[Dict[str, Any], int]:
+    """
+    Valida, busca en caché y analiza un archivo ya guardado en disco
+
+    Compartido por el servidor WSGI (Flask) y el ASGI (asgi.py). Siempre
+    elimina el archivo antes de volver. Con deep=True también se analiza
+    el contenido incrustado (imágenes y adjuntos de DOCX/XLSX/PDF).
+
+    Returns:
+        Tupla (cuerpo JSON, código HTTP)
+    """
+    try:
+        # Validar por contenido (magic bytes), no por extensión
+        supported, file_format = is_supported_content(filepath)
+        if not supported:
+            app.logger.warning(f"Unsupported content: {file_format} ({filename})")
+            return {
+                "error": f"Tipo de archivo no soportado (contenido detectado: {file_format})",
+                "supported": supported_formats()
+            }, 400
+        
+        key = cache_key(digest, os.path.splitext(filename)[1], deep)
+        
+        cached = metadata_cache.get(key)
+        if cached is not None:
+            cached["file_info"]["filename"] = filename
+            cached["cache_hit"] = True
+            app.logger.info(f"Cache hit for: {filename} ({digest[:12]})")
+            return {"status": "success", "data": cached}, 200
+        
+        # Analizar metadatos
+        app.logger.info(f"Analyzing metadata for: {filename}")
+        result = analyze_metadata(filepath, deep=deep)
+        
+        if "error" in result and result.get("status") != "success":
+            app.logger.error(f"Analysis error: {result['error']}")
+            return {"error": result["error"]}, 400
+        
+        result["file_info"]["filename"] = filename
+        result["content_hash"] = digest
+        metadata_cache.put(key, result)
+        result["cache_hit"] = False
+        
+        app.logger.info(f"Analysis completed successfully for: {filename}")
+        return {"status": "success", "data": result}, 200
+    
+    except Exception as e:
+        app.logger.error(f"Error en análisis de metadatos: {str(e)}", exc_info=True)
+        return {
+            "error": "Error procesando el archivo",
+            "details": str(e)
+        }, 500
+    
+    finally:
+        # Eliminar archivo después del análisis (también en caso de error)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+            app.logger.info(f"File deleted: {filepath}")
+
 # API de análisis de metadatos (NUEVO)
 @app.route('/api/analyze_metadata', methods=['POST'])
 def api_analyze_metadata():
@@ -154,60 +523,258 @@ def api_analyze_metadata():
             app.logger.warning("Empty filename")
             return jsonify({"error": "Nombre de archivo vacío"}), 400
         
-        # Validar extensión
-        file_ext = os.path.splitext(file.filename)[1].lower().replace('.', '')
-        if file_ext not in app.config['ALLOWED_EXTENSIONS']:
-            app.logger.warning(f"Unsupported extension: {file_ext}")
-            return jsonify({
-                "error": f"Tipo de archivo no soportado: .{file_ext}",
-                "supported": list(app.config['ALLOWED_EXTENSIONS'])
-            }), 400
-        
-        # Guardar archivo de forma segura
+        # Guardar archivo de forma segura (nombre único: puede haber subidas simultáneas)
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex[:8]}_{filename}")
         
+        # Guardar calculando el hash mientras se recibe el archivo
         app.logger.info(f"Saving file to: {filepath}")
-        file.save(filepath)
+        with metrics.STAGE_LATENCY.time(stage="upload_receive"):
+            digest = save_stream_hashed(file.stream, filepath)
         
-        try:
-            # Analizar metadatos
-            app.logger.info(f"Analyzing metadata for: {filename}")
-            result = analyze_metadata(filepath)
-            
-            # Eliminar archivo después del análisis
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                app.logger.info(f"File deleted: {filepath}")
+        payload, status = process_saved_upload(filepath, filename, digest,
+                                               wants_deep_scan(request.values.get('deep')))
+        return api_response(payload, status)
             
-            if "error" in result and result.get("status") != "success":
-                app.logger.error(f"Analysis error: {result['error']}")
-                return jsonify({"error": result["error"]}), 400
-            
-            app.logger.info(f"Analysis completed successfully for: {filename}")
+    except Exception as e:
+        app.logger.error(f"Error en análisis de metadatos: {str(e)}", exc_info=True)
+        return jsonify({
+            "error": "Error procesando el archivo",
+            "details": str(e)
+        }), 500
+
+# Subidas por partes (reanudables) para archivos mayores que MAX_CONTENT_LENGTH
+def upload_error_response(error: UploadError):
+    body = {"error": str(error)}
+    if error.offset is not None:
+        body["offset"] = error.offset
+    return jsonify(body), error.status
+
+@app.route('/api/uploads', methods=['POST'])
+def api_upload_create():
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(str(data.get('filename') or ''))
+    if not filename:
+        return jsonify({"error": "Nombre de archivo requerido"}), 400
+    try:
+        upload = chunked_uploads.create(filename, data.get('size'))
+    except UploadError as e:
+        return upload_error_response(e)
+    upload["chunk_size"] = min(RECOMMENDED_CHUNK_SIZE, app.config['MAX_CONTENT_LENGTH'])
+    return jsonify(upload), 201, {"Location": f"/api/uploads/{upload['upload_id']}"}
+
+@app.route('/api/uploads/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+def api_upload(upload_id: str):
+    try:
+        if request.method == 'DELETE':
+            chunked_uploads.abort(upload_id)
+            return jsonify({"status": "aborted"})
+
+        if request.method == 'GET':
+            upload = chunked_uploads.status(upload_id)
+            return jsonify(upload), 200, {"Upload-Offset": str(upload["offset"])}
+
+        # PUT: el cuerpo crudo es la parte; el offset va en Upload-Offset o ?offset=
+        try:
+            offset = int(request.headers.get('Upload-Offset', request.args.get('offset', '')))
+        except ValueError:
+            return jsonify({"error": "Offset requerido (header Upload-Offset)"}), 400
+
+        upload = chunked_uploads.append(upload_id, offset, request.stream)
+
+        # Rechazar pronto un contenido que no se podrá analizar
+        detected = upload["detected_format"]
+        if detected and detected["type"] == 'unknown':
+            chunked_uploads.abort(upload_id)
             return jsonify({
-                "status": "success",
-                "data": result
-            })
-            
-        except Exception as e:
-            # Limpiar archivo en caso de error
-            if os.path.exists(filepath):
+                "error": f"Tipo de archivo no soportado (contenido detectado: {detected['format']})",
+                "supported": supported_formats()
+            }), 400
+
+        return jsonify(upload), 200, {"Upload-Offset": str(upload["offset"])}
+
+    except UploadError as e:
+        return upload_error_response(e)
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def api_upload_complete(upload_id: str):
+    try:
+        filepath, filename, digest = chunked_uploads.finish(upload_id, app.config['UPLOAD_FOLDER'])
+    except UploadError as e:
+        return upload_error_response(e)
+    data = request.get_json(silent=True) or {}
+    deep = wants_deep_scan(data.get('deep', request.args.get('deep')))
+    payload, status = process_saved_upload(filepath, filename, digest, deep)
+    return api_response(payload, status)
+
+# API de análisis de metadatos por lotes (varios archivos o un .zip)
+@app.route('/api/analyze_metadata/batch', methods=['POST'])
+def api_analyze_metadata_batch():
+    # Los lotes admiten un cuerpo mayor que el límite global
+    request.max_content_length = app.config['BATCH_MAX_CONTENT_LENGTH']
+
+    uploads = request.files.getlist('files') + request.files.getlist('file')
+    uploads = [f for f in uploads if f.filename]
+    if not uploads:
+        return jsonify({"error": "No se proporcionaron archivos"}), 400
+
+    deep = wants_deep_scan(request.values.get('deep'))
+    batch_dir = tempfile.mkdtemp(prefix='batch_', dir=app.config['UPLOAD_FOLDER'])
+    try:
+        pending = []   # (ruta, nombre, clave de caché)
+        cached = []    # (nombre, resultado)
+        skipped = []
+
+        for index, upload in enumerate(uploads):
+            filename = secure_filename(upload.filename) or f"file_{index}"
+            filepath = os.path.join(batch_dir, f"{index:04d}_{filename}")
+            with metrics.STAGE_LATENCY.time(stage="upload_receive"):
+                digest = save_stream_hashed(upload.stream, filepath)
+            file_type, _ = sniff_file(filepath)
+
+            if file_type == 'archive':
+                members, archive_skipped = extract_archive(
+                    filepath, tempfile.mkdtemp(dir=batch_dir)
+                )
+                skipped.extend(f"{filename}/{msg}" for msg in archive_skipped)
                 os.remove(filepath)
-                app.logger.info(f"File deleted after error: {filepath}")
-            raise e
-            
+                for member_path, member_name in members:
+                    supported, member_format = is_supported_content(member_path)
+                    if supported:
+                        pending.append((member_path, f"{filename}/{member_name}", None))
+                    else:
+                        skipped.append(f"{filename}/{member_name}: tipo no soportado ({member_format})")
+                        os.remove(member_path)
+                continue
+
+            supported, file_format = is_supported_content(filepath)
+            if not supported:
+                skipped.append(f"{filename}: tipo no soportado ({file_format})")
+                os.remove(filepath)
+                continue
+
+            key = cache_key(digest, os.path.splitext(filename)[1], deep)
+            hit = metadata_cache.get(key)
+            if hit is not None:
+                hit["file_info"]["filename"] = filename
+                cached.append((filename, hit))
+                os.remove(filepath)
+            else:
+                pending.append((filepath, filename, key))
     except Exception as e:
-        app.logger.error(f"Error en análisis de metadatos: {str(e)}", exc_info=True)
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        app.logger.error(f"Error preparando lote: {str(e)}", exc_info=True)
+        return jsonify({"error": "Error procesando los archivos", "details": str(e)}), 400
+
+    # Por ruta: dos archivos del lote pueden llamarse igual y tener distinto contenido
+    keys = {path: key for path, _, key in pending}
+
+    def generate():
+        results = []
+        try:
+            for name, result in cached:
+                result["cache_hit"] = True
+                results.append((name, result))
+                yield json.dumps({"type": "result", "filename": name, "data": result}, ensure_ascii=False) + "\n"
+
+            for path, name, result in batch_analyzer.analyze([(path, name) for path, name, _ in pending], deep):
+                if keys.get(path) and result.get("status") == "success":
+                    metadata_cache.put(keys[path], result)
+                result["cache_hit"] = False
+                results.append((name, result))
+                yield json.dumps({"type": "result", "filename": name, "data": result}, ensure_ascii=False) + "\n"
+
+            summary = summarize_batch(results)
+            summary["skipped"] = skipped
+            yield json.dumps({"type": "summary", "data": summary}, ensure_ascii=False) + "\n"
+        except Exception as e:
+            app.logger.error(f"Error en análisis por lotes: {str(e)}", exc_info=True)
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+        finally:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+# API de eliminación de metadatos (uno o varios archivos)
+@app.route('/api/sanitize', methods=['POST'])
+def api_sanitize():
+    request.max_content_length = app.config['BATCH_MAX_CONTENT_LENGTH']
+
+    uploads = request.files.getlist('files') + request.files.getlist('file')
+    uploads = [f for f in uploads if f.filename]
+    if not uploads:
+        return jsonify({"error": "No se proporcionaron archivos"}), 400
+
+    work_dir = tempfile.mkdtemp(prefix='sanitize_', dir=app.config['UPLOAD_FOLDER'])
+    try:
+        cleaned = []  # (ruta limpia, nombre de salida)
+        reports = {}
+
+        for index, upload in enumerate(uploads):
+            # Nombre único en el lote: clave del reporte y entrada del .zip
+            filename = unique_name(secure_filename(upload.filename) or f"file_{index}", reports)
+            src_path = os.path.join(work_dir, f"{index:04d}_in_{filename}")
+            dst_path = os.path.join(work_dir, f"{index:04d}_out_{filename}")
+            upload.save(src_path)
+            try:
+                reports[filename] = sanitize_file(src_path, dst_path)
+                cleaned.append((dst_path, f"clean_{filename}"))
+            except SanitizeError as e:
+                reports[filename] = {"error": str(e)}
+            finally:
+                os.remove(src_path)
+
+        if len(uploads) == 1:
+            if not cleaned:
+                shutil.rmtree(work_dir, ignore_errors=True)
+                return jsonify({
+                    "error": reports[filename]["error"],
+                    "supported": SANITIZE_FORMATS
+                }), 400
+            dst_path, download_name = cleaned[0]
+            response = send_file(dst_path, as_attachment=True, download_name=download_name)
+            response.headers['X-Sanitize-Report'] = json.dumps(reports[filename])
+        else:
+            # Lote: un .zip con las copias limpias y el reporte
+            archive_path = os.path.join(work_dir, 'sanitized.zip')
+            with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for dst_path, download_name in cleaned:
+                    archive.write(dst_path, download_name)
+                    os.remove(dst_path)
+                archive.writestr('report.json', json.dumps(reports, ensure_ascii=False, indent=2))
+            response = send_file(archive_path, as_attachment=True, download_name='sanitized.zip')
+
+        # Sin passthrough para que Werkzeug ejecute call_on_close al terminar
+        response.direct_passthrough = False
+        response.call_on_close(lambda: shutil.rmtree(work_dir, ignore_errors=True))
+        return response
+
+    except Exception as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        app.logger.error(f"Error sanitizando archivos: {str(e)}", exc_info=True)
         return jsonify({
             "error": "Error procesando el archivo",
             "details": str(e)
         }), 500
 
-def allowed_file(filename: str) -> bool:
-    """Verifica si la extensión del archivo está permitida"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+def unique_name(filename: str, taken) -> str:
+    """filename, o name_2.ext, name_3.ext... si ya está en taken"""
+    if filename not in taken:
+        return filename
+    stem, ext = os.path.splitext(filename)
+    counter = 2
+    while f"{stem}_{counter}{ext}" in taken:
+        counter += 1
+    return f"{stem}_{counter}{ext}"
+
+def supported_formats() -> List[str]:
+    """Formatos reconocidos por contenido (magic bytes) que pueden analizarse"""
+    return analyzer_registry.supported_formats()
+
+def is_supported_content(filepath: str) -> Tuple[bool, str]:
+    """Verifica por firma (magic bytes) si el contenido puede analizarse"""
+    file_type, file_format = sniff_file(filepath)
+    return analyzer_registry.supports(file_type, file_format), file_format
 
 # Manejadores de errores
 @app.errorhandler(404)
@@ -224,7 +791,43 @@ def internal_error(error):
 # Health check
 @app.route('/health')
 def health_check():
-    return jsonify({"status": "healthy", "version": "2.0"}), 200
+    return jsonify({
+        "status": "healthy",
+        "version": "2.0",
+        "uptime_seconds": round(time.time() - START_TIME, 1),
+        "pid": os.getpid()
+    }), 200
+
+# Métricas en formato Prometheus (por proceso)
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.exposition(), mimetype='text/plain; version=0.0.4')
+
+def _profile_admin_allowed() -> bool:
+    provided = request.headers.get('X-Profile-Token') or request.args.get('token')
+    return token_matches(app.config['PROFILE_TOKEN'], provided)
+
+# Perfiles recientes (requiere el token de administración)
+@app.route('/api/profiles')
+def api_profiles():
+    if not _profile_admin_allowed():
+        return jsonify({"error": "No autorizado"}), 403
+    return jsonify({"status": "success", "profiles": profile_store.list()})
+
+@app.route('/api/profiles/<profile_id>')
+def api_profile_download(profile_id: str):
+    if not _profile_admin_allowed():
+        return jsonify({"error": "No autorizado"}), 403
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        return jsonify({"error": "Perfil no encontrado"}), 404
+    if request.args.get('format') == 'pstats' and profile["pstats"]:
+        return Response(profile["pstats"], mimetype='text/plain')
+    return Response(
+        profile["collapsed"],
+        mimetype='text/plain',
+        headers={'Content-Disposition': f'attachment; filename=profile_{profile_id}.collapsed'}
+    )
 
 # Información del sistema (útil para debugging)
 @app.route('/api/info')
@@ -232,22 +835,47 @@ def api_info():
     return jsonify({
         "app": "CyberTools",
         "version": "2.1",
+        "response_encoding": {
+            "compression": supported_encodings(),
+            "formats": ["json"] + (["msgpack"] if MSGPACK_AVAILABLE else []),
+            "layouts": ["rows", "columnar"]
+        },
         "features": {
             "port_scanner": {
                 "optimized": True,
-                "max_workers": 100,
-                "timeout": "1.5s",
-                "caching": True
+                "max_workers": port_scanner_config.DEFAULT_MAX_WORKERS,
+                "timeout": f"{port_scanner_config.DEFAULT_TIMEOUT}s",
+                "known_port_timeout": f"{port_scanner_config.DEFAULT_TIMEOUT * port_scanner_config.KNOWN_PORT_TIMEOUT_FACTOR:.2f}s",
+                "caching": True,
+                "protocols": list(SCAN_PROTOCOLS),
+                "tls_inspection": {
+                    "max_concurrent_handshakes": tls_inspect.MAX_CONCURRENT_HANDSHAKES,
+                    "cache_ttl": f"{tls_inspect.CACHE_TTL:.0f}s"
+                },
+                "udp_default_ports": COMMON_UDP_PORTS,
+                "scans_in_flight": metrics.SCANS_IN_FLIGHT.value(),
+                "history": scan_history.stats() if scan_history is not None else {"enabled": False}
             },
             "password_generator": {
                 "phrase_based": True,
                 "configurable": True,
                 "max_length": 64
             },
+            "metadata_sanitizer": {
+                "enabled": True,
+                "supported_formats": SANITIZE_FORMATS,
+                "batch": True
+            },
             "metadata_analyzer": {
                 "enabled": True,
-                "supported_formats": list(app.config['ALLOWED_EXTENSIONS']),
-                "max_file_size": "16MB"
+                "supported_formats": supported_formats(),
+                "max_file_size": "16MB",
+                "analyzers": analyzer_registry.describe(),
+                "chunked_upload": {
+                    "max_file_size": f"{app.config['CHUNKED_UPLOAD_MAX_SIZE'] // (1024 * 1024)}MB",
+                    "chunk_size": min(RECOMMENDED_CHUNK_SIZE, app.config['MAX_CONTENT_LENGTH'])
+                },
+                "cache": metadata_cache.stats()
             }
         }
     })
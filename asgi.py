@@ -0,0 +1,396 @@
+"""
+Punto de entrada ASGI de CyberTools
+Adaptador ASGI delgado sobre la app Flask: mantiene todas las rutas y sus
+contratos JSON, pero atiende de forma nativa asíncrona las que pasan la mayor
+parte del tiempo esperando:
+
+    POST /api/scan_ports         -> escaneo con corrutinas (sin hilos por puerto)
+    POST /api/analyze_metadata   -> el upload se recibe en el event loop y solo
+                                    el análisis ocupa un hilo
+
+El resto de rutas se ejecuta en la app Flask a través de un puente WSGI que
+corre en un pool de hilos acotado (las respuestas en streaming, como el
+NDJSON de /api/analyze_metadata/batch, se envían a medida que se generan).
+El perfilado por petición (X-Profile) solo aplica a las rutas del puente.
+
+Uso:
+    uvicorn asgi:app --port 5000
+    gunicorn -c gunicorn_asgi.conf.py asgi:app
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import tempfile
+import threading
+import concurrent.futures
+from urllib.parse import parse_qs
+from typing import Dict, Any, List, Tuple, Optional, Callable, Awaitable
+
+from werkzeug.formparser import parse_form_data
+from werkzeug.utils import secure_filename
+
+from app import (app as flask_app, batch_analyzer, chunked_uploads, parse_scan_request,
+                 process_saved_upload, record_scan, scan_scheduler, wants_deep_scan)
+from components import metrics
+from components.metadata_cache import save_stream_hashed
+from components.scan_website_ports import scan_website_ports_async
+from components.response_encoding import encode_body, columnar_ports
+
+# Hilos para el puente WSGI y el análisis de uploads
+WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 32))
+# Cuerpos más grandes pasan de memoria a un archivo temporal
+SPOOL_MAX_SIZE = 1024 * 1024
+# Chunks de respuesta en vuelo por petición del puente (contrapresión)
+RESPONSE_QUEUE_SIZE = 8
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix='asgi-wsgi')
+
+
+class RequestTooLarge(Exception):
+    """El cuerpo supera el límite configurado"""
+
+
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get('headers', ()):
+        if key.lower() == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def _read_body(receive: Receive, limit: Optional[int]) -> tempfile.SpooledTemporaryFile:
+    """Recibe el cuerpo completo sin bloquear el event loop"""
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            body.close()
+            raise ConnectionResetError("El cliente cerró la conexión")
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if limit is not None and size > limit:
+            body.close()
+            raise RequestTooLarge()
+        body.write(chunk)
+        more_body = message.get('more_body', False)
+    body.seek(0)
+    return body
+
+
+async def _send_json(send: Send, payload: Dict[str, Any], status: int = 200) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('latin-1'))
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _query_param(scope: Scope, name: str) -> Optional[str]:
+    values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get(name)
+    return values[0] if values else None
+
+
+async def _send_encoded(scope: Scope, send: Send, payload: Dict[str, Any], status: int = 200) -> None:
+    """Resultado grande: JSON o MessagePack y compresión según lo que acepta el cliente"""
+    body, headers = encode_body(
+        payload,
+        accept=_header(scope, b'accept'),
+        accept_encoding=_header(scope, b'accept-encoding'),
+        fmt=_query_param(scope, 'format')
+    )
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers.items()]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _build_environ(scope: Scope, body) -> Dict[str, Any]:
+    """Traduce el scope ASGI a un environ WSGI (PEP 3333)"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]) if server[1] is not None else '80',
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for key, value in scope.get('headers', ()):
+        name = key.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            name = f'HTTP_{name}'
+            environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+def _record_latency(method: str, route: str, status: int, start: float) -> None:
+    metrics.REQUEST_LATENCY.observe(
+        time.perf_counter() - start, method=method, route=route, status=str(status)
+    )
+
+
+# --- Rutas nativas asíncronas ---
+
+async def scan_ports_endpoint(scope: Scope, receive: Receive, send: Send) -> None:
+    """Equivalente asíncrono de app.api_scan_ports"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        body = await _read_body(receive, flask_app.config['MAX_CONTENT_LENGTH'])
+        with body:
+            raw = body.read()
+
+        content_type = (_header(scope, b'content-type') or '').split(';')[0].strip().lower()
+        if not (content_type == 'application/json' or content_type.endswith('+json')):
+            status = 400
+            return await _send_json(send, {"status": "error", "message": "Se esperaba JSON"}, status)
+
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            status = 400
+            return await _send_json(send, {"status": "error", "message": "JSON inválido"}, status)
+
+        target, valid_ports, error = parse_scan_request(data)
+        if error:
+            status = 400
+            return await _send_json(send, {"status": "error", "message": error}, status)
+
+        scan_result = await scan_website_ports_async(
+            target, valid_ports, protocol=data.get('protocol', 'tcp'), tls=bool(data.get('tls', False)))
+
+        if "error" in scan_result:
+            status = 400
+            return await _send_json(send, {"status": "error", "message": scan_result["error"]}, status)
+
+        # SQLite es bloqueante: el historial se escribe en el pool de hilos
+        await asyncio.get_running_loop().run_in_executor(_executor, record_scan, scan_result, valid_ports)
+
+        if _query_param(scope, 'layout') == 'columnar':
+            scan_result = columnar_ports(scan_result)
+
+        status = 200
+        await _send_encoded(scope, send, {"status": "success", "data": scan_result}, status)
+
+    except ConnectionResetError:
+        status = 499
+    except RequestTooLarge:
+        status = 413
+        await _send_json(send, {"status": "error", "message": "Petición demasiado grande"}, status)
+    except Exception as e:
+        flask_app.logger.error(f"Error en escaneo: {str(e)}", exc_info=True)
+        status = 500
+        await _send_json(send, {
+            "status": "error",
+            "message": "Error en el servidor",
+            "debug": str(e)
+        }, status)
+    finally:
+        _record_latency(scope['method'], '/api/scan_ports', status, start)
+
+
+def _analyze_upload(scope: Scope, body) -> Tuple[Dict[str, Any], int]:
+    """Parte bloqueante del análisis (se ejecuta en el pool de hilos)"""
+    _, form, files = parse_form_data(_build_environ(scope, body))
+    file = files.get('file')
+
+    if file is None:
+        flask_app.logger.warning("No file in request")
+        return {"error": "No se proporcionó ningún archivo"}, 400
+
+    if file.filename == '':
+        flask_app.logger.warning("Empty filename")
+        return {"error": "Nombre de archivo vacío"}, 400
+
+    filename = secure_filename(file.filename)
+    filepath = os.path.join(flask_app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex[:8]}_{filename}")
+    with metrics.STAGE_LATENCY.time(stage="upload_receive"):
+        digest = save_stream_hashed(file.stream, filepath)
+    file.close()
+
+    deep = wants_deep_scan(form.get('deep', _query_param(scope, 'deep')))
+    return process_saved_upload(filepath, filename, digest, deep)
+
+
+async def analyze_metadata_endpoint(scope: Scope, receive: Receive, send: Send) -> None:
+    """Equivalente asíncrono de app.api_analyze_metadata"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        body = await _read_body(receive, flask_app.config['MAX_CONTENT_LENGTH'])
+        with body:
+            loop = asyncio.get_running_loop()
+            payload, status = await loop.run_in_executor(_executor, _analyze_upload, scope, body)
+        await _send_encoded(scope, send, payload, status)
+
+    except ConnectionResetError:
+        status = 499
+    except RequestTooLarge:
+        status = 413
+        await _send_json(send, {"error": "Archivo demasiado grande"}, status)
+    except Exception as e:
+        flask_app.logger.error(f"Error en análisis de metadatos: {str(e)}", exc_info=True)
+        status = 500
+        await _send_json(send, {
+            "error": "Error procesando el archivo",
+            "details": str(e)
+        }, status)
+    finally:
+        _record_latency(scope['method'], '/api/analyze_metadata', status, start)
+
+
+NATIVE_ROUTES = {
+    ('POST', '/api/scan_ports'): scan_ports_endpoint,
+    ('POST', '/api/analyze_metadata'): analyze_metadata_endpoint,
+}
+
+
+# --- Puente WSGI para el resto de rutas ---
+
+_END = object()
+
+
+def _run_wsgi(environ: Dict[str, Any], loop: asyncio.AbstractEventLoop,
+              queue: asyncio.Queue, cancelled: threading.Event) -> None:
+    """Ejecuta la app Flask y entrega (status, headers) y los chunks a la cola"""
+
+    def put(item) -> None:
+        if cancelled.is_set():
+            # El cliente se fue: cortar la generación de la respuesta
+            raise ConnectionResetError("El cliente cerró la conexión")
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+        put(('start', int(status.split(' ', 1)[0]), headers))
+        return lambda data: put(('body', data))
+
+    iterable = None
+    try:
+        iterable = flask_app.wsgi_app(environ, start_response)
+        for chunk in iterable:
+            if chunk:
+                put(('body', chunk))
+    except ConnectionResetError:
+        pass
+    except Exception as e:
+        put(('error', e))
+    finally:
+        if iterable is not None and hasattr(iterable, 'close'):
+            iterable.close()
+        asyncio.run_coroutine_threadsafe(queue.put(_END), loop).result()
+
+
+async def wsgi_bridge(scope: Scope, receive: Receive, send: Send) -> None:
+    """Atiende una petición con la app Flask en un hilo del pool"""
+    # Las rutas de lote aceptan cuerpos mayores; Flask aplica el límite exacto
+    limit = max(flask_app.config['MAX_CONTENT_LENGTH'], flask_app.config['BATCH_MAX_CONTENT_LENGTH'])
+    try:
+        body = await _read_body(receive, limit)
+    except ConnectionResetError:
+        return
+    except RequestTooLarge:
+        return await _send_json(send, {"error": "Petición demasiado grande"}, 413)
+
+    with body:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=RESPONSE_QUEUE_SIZE)
+        cancelled = threading.Event()
+        worker = loop.run_in_executor(_executor, _run_wsgi, _build_environ(scope, body),
+                                      loop, queue, cancelled)
+
+        started = False
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END:
+                    break
+                kind = item[0]
+                if kind == 'start':
+                    _, status, headers = item
+                    await send({
+                        'type': 'http.response.start',
+                        'status': status,
+                        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+                    })
+                    started = True
+                elif kind == 'body':
+                    await send({'type': 'http.response.body', 'body': item[1], 'more_body': True})
+                elif kind == 'error':
+                    flask_app.logger.error(f"Error en el puente WSGI: {item[1]}")
+                    if not started:
+                        await _send_json(send, {
+                            "error": "Error interno del servidor",
+                            "message": "Ocurrió un error inesperado"
+                        }, 500)
+                        started = None
+        except BaseException:
+            # Desconexión o cancelación: liberar el hilo vaciando la cola
+            cancelled.set()
+            while (await queue.get()) is not _END:
+                pass
+            raise
+        finally:
+            await worker
+
+        if started:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+# --- Aplicación ASGI ---
+
+async def _lifespan(receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            batch_analyzer.shutdown()
+            chunked_uploads.shutdown()
+            if scan_scheduler is not None:
+                scan_scheduler.stop()
+            _executor.shutdown(wait=False, cancel_futures=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope: Scope, receive: Receive, send: Send) -> None:
+    """Aplicación ASGI 3"""
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        raise RuntimeError(f"Tipo de conexión no soportado: {scope['type']}")
+
+    handler = NATIVE_ROUTES.get((scope['method'], scope['path']), wsgi_bridge)
+    await handler(scope, receive, send)
@@ -0,0 +1,801 @@
+"""
+Prueba de carga de extremo a extremo de la API con informe de SLO
+Levanta el servidor (gunicorn síncrono o ASGI) en un puerto libre y le envía
+una mezcla de peticiones a tasa de llegada fija (lazo abierto):
+
+    scan           POST /api/scan_ports contra listeners locales en loopback
+    password       POST /api/generate_password (aleatoria o por frase)
+    metadata       POST /api/analyze_metadata con un corpus generado de
+                   JPEG (EXIF/GPS), DOCX (autor, imágenes) y PDF (adjuntos)
+    metadata_deep  igual, con deep=1 (fuera de la mezcla por defecto)
+
+Por cada fase y ruta informa throughput, p50/p95/p99, tasa de errores y el
+RSS/hilos de los workers del servidor (muestreados de /proc). Por defecto
+cada ruta corre primero sola (para atribuirle memoria e hilos) y después la
+mezcla completa.
+
+La latencia se mide desde el instante programado de cada llegada, no desde
+el envío: si el cliente o el servidor se atrasan, la espera cuenta (sin
+"coordinated omission"). Con más de --max-inflight peticiones pendientes las
+llegadas nuevas se descartan y se informan como "dropped".
+
+Los resultados se guardan como línea base (benchmarks/baselines/NOMBRE.json)
+para comparar cambios de modelo de servidor o de motor:
+
+    python benchmarks/load_test.py --rate 20 --duration 30 --save-baseline sync-2w
+    python benchmarks/load_test.py --server asgi --compare sync-2w
+    python benchmarks/load_test.py --mix password=1 --rate 200 --mix-only
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --pid 12345
+
+El código de salida es 1 si se incumple algún SLO o hay regresiones frente a
+la línea base (más allá de --tolerance).
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import zlib
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import tempfile
+import platform
+import selectors
+import threading
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple
+from urllib.parse import urlsplit
+
+from serving_compare import ROOT, free_port, start_server, wait_ready
+
+BASELINE_DIR = os.path.join(ROOT, 'benchmarks', 'baselines')
+
+DEFAULT_MIX = "password=5,metadata=3,scan=2"
+
+# SLO por ruta (latencias en ms, tasa de errores como fracción)
+DEFAULT_SLO: Dict[str, Dict[str, float]] = {
+    "password": {"p99_ms": 250, "error_rate": 0.01},
+    "metadata": {"p99_ms": 2000, "error_rate": 0.01},
+    "metadata_deep": {"p99_ms": 5000, "error_rate": 0.01},
+    "scan": {"p99_ms": 1000, "error_rate": 0.01},
+}
+
+# Métricas comparadas con la línea base y si "más alto" es peor
+COMPARED_METRICS = {
+    "p50_ms": True, "p95_ms": True, "p99_ms": True,
+    "throughput_rps": False, "error_rate": True,
+}
+COMPARED_RESOURCES = ("rss_mb_peak", "threads_peak")
+# Diferencias absolutas por debajo de esto son ruido, no regresiones
+NOISE_FLOOR = {
+    "p50_ms": 5.0, "p95_ms": 5.0, "p99_ms": 5.0, "throughput_rps": 0.0,
+    "error_rate": 0.005, "rss_mb_peak": 10.0, "threads_peak": 2,
+}
+
+PASSWORD_PHRASES = (
+    "Me gusta programar en Python",
+    "El gato duerme sobre el teclado",
+    "Correr por la playa al amanecer",
+)
+
+
+# --- Corpus ---
+
+def _jpeg(rng: random.Random, size: Tuple[int, int], gps: bool) -> bytes:
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.ellipse((x, y, x + rng.randrange(10, 200), y + rng.randrange(10, 200)),
+                     fill=tuple(rng.randrange(256) for _ in range(3)))
+
+    exif = Image.Exif()
+    exif[0x010F] = rng.choice(("Canon", "NIKON CORPORATION", "Apple"))
+    exif[0x0110] = rng.choice(("EOS 80D", "D750", "iPhone 13"))
+    exif[0x0131] = "Adobe Photoshop 24.0"
+    exif[0x0132] = "2024:05:17 10:21:33"
+    if gps:
+        lat, lon = rng.uniform(-60, 70), rng.uniform(-170, 170)
+        exif[0x8825] = {
+            1: 'N' if lat >= 0 else 'S', 2: _dms(abs(lat)),
+            3: 'E' if lon >= 0 else 'W', 4: _dms(abs(lon)),
+        }
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=85, exif=exif)
+    return out.getvalue()
+
+
+def _dms(value: float) -> Tuple[float, float, float]:
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    return float(degrees), float(minutes), round(((value - degrees) * 60 - minutes) * 60, 2)
+
+
+def _docx(rng: random.Random, index: int, picture: Optional[bytes]) -> bytes:
+    from docx import Document
+    from docx.shared import Inches
+
+    document = Document()
+    document.core_properties.author = f"Autor {index}"
+    document.core_properties.last_modified_by = "Revisor"
+    document.core_properties.comments = "Documento de prueba de carga"
+    document.add_heading(f"Informe {index}", 0)
+    for _ in range(rng.randrange(5, 60)):
+        document.add_paragraph(" ".join(rng.choice(PASSWORD_PHRASES) for _ in range(8)))
+    if picture is not None:
+        document.add_picture(io.BytesIO(picture), width=Inches(3))
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def _pdf(rng: random.Random, index: int, attachment: Optional[bytes]) -> bytes:
+    from PyPDF2 import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(rng.randrange(1, 40)):
+        writer.add_blank_page(612, 792)
+    writer.add_metadata({
+        "/Author": f"Autor {index}",
+        "/Creator": "Microsoft Word",
+        "/Producer": "Acrobat PDFMaker 23",
+    })
+    if attachment is not None:
+        writer.add_attachment("foto.jpg", attachment)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def build_corpus(directory: str, count: int, seed: int = 0) -> List[str]:
+    """
+    Genera count archivos (un tercio de cada tipo) con metadatos sensibles
+    variados; la mitad de los DOCX/PDF llevan una foto incrustada con GPS
+
+    Returns:
+        Rutas de los archivos generados
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    sizes = ((640, 480), (1280, 960), (2048, 1536))
+    paths = []
+    for index in range(count):
+        kind = ('jpg', 'docx', 'pdf')[index % 3]
+        if kind == 'jpg':
+            data = _jpeg(rng, rng.choice(sizes), gps=index % 2 == 0)
+        else:
+            photo = _jpeg(rng, sizes[0], gps=True) if index % 2 == 0 else None
+            data = _docx(rng, index, photo) if kind == 'docx' else _pdf(rng, index, photo)
+        path = os.path.join(directory, f"corpus_{index:03d}.{kind}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        paths.append(path)
+    return paths
+
+
+def load_corpus(directory: str, count: int) -> List[Tuple[str, bytes]]:
+    """Corpus en memoria (se genera si el directorio no tiene archivos)"""
+    names = sorted(name for name in os.listdir(directory)
+                   if name.startswith('corpus_')) if os.path.isdir(directory) else []
+    paths = [os.path.join(directory, name) for name in names] or build_corpus(directory, count)
+    corpus = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            corpus.append((os.path.basename(path), f.read()))
+    return corpus
+
+
+# --- Objetivos de escaneo en loopback ---
+
+class LoopbackTargets:
+    """
+    Listeners TCP locales (aceptan y cierran) y puertos cerrados conocidos:
+    los escaneos terminan rápido y sin depender de la red
+    """
+
+    def __init__(self, open_count: int, closed_count: int):
+        self._selector = selectors.DefaultSelector()
+        self._listeners = []
+        for _ in range(open_count):
+            listener = socket.socket()
+            listener.bind(('127.0.0.1', 0))
+            listener.listen(128)
+            listener.setblocking(False)
+            self._selector.register(listener, selectors.EVENT_READ)
+            self._listeners.append(listener)
+        self.open_ports = [s.getsockname()[1] for s in self._listeners]
+        self.closed_ports = [free_port() for _ in range(closed_count)]
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+
+    @property
+    def ports(self) -> List[int]:
+        return self.open_ports + self.closed_ports
+
+    def _accept_loop(self) -> None:
+        while not self._stopped.is_set():
+            for key, _ in self._selector.select(timeout=0.2):
+                try:
+                    conn, _ = key.fileobj.accept()
+                    conn.close()
+                except OSError:
+                    pass
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+        for listener in self._listeners:
+            self._selector.unregister(listener)
+            listener.close()
+        self._selector.close()
+
+
+# --- Peticiones ---
+
+def _multipart(fields: Dict[str, str], filename: str, content: bytes) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n'
+    )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class RequestFactory:
+    """Construye (ruta HTTP, cuerpo, content-type) para cada tipo de petición"""
+
+    def __init__(self, corpus: List[Tuple[str, bytes]], scan_ports: List[int]):
+        self.corpus = corpus
+        self.scan_ports = scan_ports
+
+    def build(self, route: str, rng: random.Random) -> Tuple[str, bytes, str]:
+        if route == 'scan':
+            body = {"target": "127.0.0.1", "ports": self.scan_ports}
+            return '/api/scan_ports', json.dumps(body).encode(), 'application/json'
+        if route == 'password':
+            body = {"length": rng.choice((12, 16, 24, 32))}
+            if rng.random() < 0.3:
+                body["phrase"] = rng.choice(PASSWORD_PHRASES)
+            return '/api/generate_password', json.dumps(body).encode(), 'application/json'
+        if route in ('metadata', 'metadata_deep'):
+            filename, content = rng.choice(self.corpus)
+            fields = {"deep": "1"} if route == 'metadata_deep' else {}
+            body, content_type = _multipart(fields, filename, content)
+            return '/api/analyze_metadata', body, content_type
+        raise ValueError(f"Ruta desconocida: {route}")
+
+
+async def send_request(host: str, port: int, path: str, body: bytes, content_type: str,
+                       timeout: float) -> Tuple[int, int]:
+    """POST HTTP/1.1 (Connection: close); devuelve (código, bytes de respuesta)"""
+    async def exchange() -> Tuple[int, int]:
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(
+                f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            response = await reader.read()
+            return int(response.split(b' ', 2)[1]), len(response)
+        finally:
+            writer.close()
+
+    return await asyncio.wait_for(exchange(), timeout)
+
+
+# --- Estadísticas ---
+
+def percentile(ordered: List[float], p: float) -> Optional[float]:
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(p * len(ordered)) - 1)]
+
+
+class RouteStats:
+    """Latencias y errores de una ruta durante una fase"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.dropped = 0
+        self.response_bytes = 0
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        failed = sum(self.errors.values())
+        total = len(ordered) + failed + self.dropped
+
+        def ms(p: float) -> Optional[float]:
+            value = percentile(ordered, p)
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            "requests": total,
+            "ok": len(ordered),
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "error_rate": round((failed + self.dropped) / total, 4) if total else 0.0,
+            "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": ms(0.50),
+            "p95_ms": ms(0.95),
+            "p99_ms": ms(0.99),
+            "max_ms": ms(1.0),
+            "response_kb_mean": round(self.response_bytes / len(ordered) / 1024, 1) if ordered else None,
+        }
+
+
+# --- Recursos del servidor (/proc) ---
+
+def _proc_children(root: int) -> List[int]:
+    """Procesos hijos directos de root (workers de gunicorn)"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # El nombre va entre paréntesis y puede tener espacios
+        if int(stat.rpartition(')')[2].split()[1]) == root:
+            children.append(int(entry))
+    return children
+
+
+def _proc_usage(pid: int) -> Optional[Tuple[float, int]]:
+    """(RSS en MB, hilos) de un proceso"""
+    rss_kb, threads = None, None
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss_kb = int(line.split()[1])
+                elif line.startswith('Threads:'):
+                    threads = int(line.split()[1])
+    except OSError:
+        return None
+    if rss_kb is None or threads is None:
+        return None
+    return rss_kb / 1024, threads
+
+
+class ResourceSampler:
+    """
+    Muestrea en un hilo el RSS y los hilos del master y sus workers
+
+    Cada fase llama a reset() al empezar y a report() al terminar.
+    """
+
+    def __init__(self, root_pid: Optional[int], interval: float = 0.25):
+        self.root_pid = root_pid
+        self.interval = interval
+        self.available = root_pid is not None and os.path.isdir('/proc')
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.reset()
+
+    def start(self) -> None:
+        if self.available:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples = 0
+            self._rss_sum = 0.0
+            self._rss_peak = 0.0
+            self._worker_rss_peak = 0.0
+            self._threads_peak = 0
+            self._worker_threads_peak = 0
+            self._workers = 0
+
+    def _loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        workers = [_proc_usage(pid) for pid in _proc_children(self.root_pid)]
+        workers = [usage for usage in workers if usage is not None]
+        master = _proc_usage(self.root_pid)
+        if master is None:
+            return
+        rss = master[0] + sum(usage[0] for usage in workers)
+        threads = master[1] + sum(usage[1] for usage in workers)
+        with self._lock:
+            self._samples += 1
+            self._rss_sum += rss
+            self._rss_peak = max(self._rss_peak, rss)
+            self._threads_peak = max(self._threads_peak, threads)
+            self._workers = max(self._workers, len(workers))
+            if workers:
+                self._worker_rss_peak = max(self._worker_rss_peak, max(u[0] for u in workers))
+                self._worker_threads_peak = max(self._worker_threads_peak, max(u[1] for u in workers))
+
+    def report(self) -> Optional[Dict[str, Any]]:
+        if not self.available:
+            return None
+        self.sample()
+        with self._lock:
+            return {
+                "workers": self._workers,
+                "rss_mb_peak": round(self._rss_peak, 1),
+                "rss_mb_mean": round(self._rss_sum / self._samples, 1) if self._samples else None,
+                "worker_rss_mb_peak": round(self._worker_rss_peak, 1),
+                "threads_peak": self._threads_peak,
+                "worker_threads_peak": self._worker_threads_peak,
+                "samples": self._samples,
+            }
+
+
+# --- Generador de carga ---
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """'password=5,metadata=3' -> pesos por ruta (tipo de argparse)"""
+    mix = {}
+    for item in value.split(','):
+        route, _, weight = item.partition('=')
+        route = route.strip()
+        if route not in DEFAULT_SLO:
+            raise argparse.ArgumentTypeError(f"Ruta desconocida: {route} (válidas: {', '.join(DEFAULT_SLO)})")
+        try:
+            mix[route] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Peso inválido: {item}")
+        if mix[route] <= 0:
+            raise argparse.ArgumentTypeError(f"El peso debe ser positivo: {item}")
+    return mix
+
+
+async def run_phase(host: str, port: int, factory: RequestFactory, mix: Dict[str, float],
+                    rate: float, duration: float, timeout: float, max_inflight: int,
+                    poisson: bool, seed: int) -> Tuple[Dict[str, RouteStats], float]:
+    """
+    Envía peticiones a tasa fija durante duration segundos (lazo abierto)
+
+    Returns:
+        (estadísticas por ruta, segundos hasta la última respuesta)
+    """
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    routes, weights = list(mix), list(mix.values())
+    stats = {route: RouteStats() for route in routes}
+    tasks = set()
+
+    async def one(route: str, scheduled: float) -> None:
+        path, body, content_type = factory.build(route, rng)
+        try:
+            status, size = await send_request(host, port, path, body, content_type, timeout)
+        except asyncio.TimeoutError:
+            stats[route].error("timeout")
+            return
+        except (OSError, ValueError, IndexError) as e:
+            stats[route].error(type(e).__name__)
+            return
+        if status == 200:
+            stats[route].latencies.append(loop.time() - scheduled)
+            stats[route].response_bytes += size
+        else:
+            stats[route].error(f"http_{status}")
+
+    start = loop.time()
+    offset = 0.0
+    while offset < duration:
+        scheduled = start + offset
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        route = rng.choices(routes, weights)[0]
+        if len(tasks) >= max_inflight:
+            stats[route].dropped += 1
+        else:
+            task = asyncio.ensure_future(one(route, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        offset += rng.expovariate(rate) if poisson else 1 / rate
+
+    if tasks:
+        await asyncio.wait(tasks)
+    return stats, loop.time() - start
+
+
+def phase_seed(seed: int, phase: str) -> int:
+    """Semilla por fase: la secuencia de una fase no depende de cuáles corrieron antes"""
+    return seed + zlib.crc32(phase.encode())
+
+
+def run_phases(args: argparse.Namespace, host: str, port: int, factory: RequestFactory,
+               sampler: ResourceSampler) -> Dict[str, Any]:
+    phases = [] if args.mix_only or len(args.mix) == 1 else [(route, {route: 1.0}) for route in args.mix]
+    phases.append(("mix", args.mix))
+
+    if args.warmup > 0:
+        # Importaciones perezosas, índice de ciudades, pools: fuera de la medición
+        print(f"[warmup] {args.warmup:g}s...", file=sys.stderr, flush=True)
+        asyncio.run(run_phase(host, port, factory, args.mix, args.rate, args.warmup, args.timeout,
+                              args.max_inflight, args.poisson, phase_seed(args.seed, 'warmup')))
+
+    report = {}
+    for name, mix in phases:
+        print(f"[{name}] {args.rate:g} peticiones/s durante {args.duration:g}s...", file=sys.stderr, flush=True)
+        sampler.reset()
+        stats, elapsed = asyncio.run(run_phase(
+            host, port, factory, mix, args.rate, args.duration, args.timeout,
+            args.max_inflight, args.poisson, phase_seed(args.seed, name)
+        ))
+        routes = {route: route_stats.report(elapsed) for route, route_stats in stats.items()}
+        total = RouteStats()
+        for route_stats in stats.values():
+            total.latencies.extend(route_stats.latencies)
+            total.response_bytes += route_stats.response_bytes
+            total.dropped += route_stats.dropped
+            for kind, count in route_stats.errors.items():
+                total.errors[kind] = total.errors.get(kind, 0) + count
+        report[name] = {
+            "offered_rps": args.rate,
+            "elapsed_s": round(elapsed, 2),
+            "routes": routes,
+            "total": total.report(elapsed),
+            "resources": sampler.report(),
+        }
+        # Dejar que el servidor termine lo que tenga pendiente
+        time.sleep(args.pause)
+    return report
+
+
+# --- SLO y líneas base ---
+
+def parse_slo(values: List[str]) -> Dict[str, Dict[str, float]]:
+    """['metadata.p99_ms=1500', ...] sobre los SLO por defecto"""
+    slo = {route: dict(limits) for route, limits in DEFAULT_SLO.items()}
+    for value in values:
+        key, _, limit = value.partition('=')
+        route, _, metric = key.partition('.')
+        if route not in slo or not metric:
+            raise SystemExit(f"SLO inválido: {value} (formato RUTA.METRICA=VALOR)")
+        slo[route][metric] = float(limit)
+    return slo
+
+
+def check_slo(phases: Dict[str, Any], slo: Dict[str, Dict[str, float]]) -> List[str]:
+    """Incumplimientos: el valor medido supera el límite (o falta la medición)"""
+    violations = []
+    for phase, data in phases.items():
+        for route, measured in data["routes"].items():
+            for metric, limit in slo.get(route, {}).items():
+                value = measured.get(metric)
+                if value is None or value > limit:
+                    violations.append(f"[{phase}] {route}: {metric}={value} > {limit:g}")
+    return violations
+
+
+def baseline_path(name: str) -> str:
+    path = name if name.endswith('.json') else os.path.join(BASELINE_DIR, f"{name}.json")
+    # 'base.json' a secas es relativo al directorio actual
+    return os.path.abspath(path)
+
+
+def _worse(old: Optional[float], new: Optional[float], higher_is_worse: bool,
+           tolerance: float, metric: str) -> bool:
+    if old is None or new is None:
+        return old is not None
+    delta = new - old if higher_is_worse else old - new
+    return delta > max(abs(old) * tolerance, NOISE_FLOOR[metric])
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> Tuple[List[str], List[str]]:
+    """
+    Compara fase por fase y ruta por ruta contra una línea base
+
+    Returns:
+        (líneas de la comparación, regresiones)
+    """
+    lines, regressions = [], []
+    for phase, data in current["phases"].items():
+        old_phase = baseline["phases"].get(phase)
+        if old_phase is None:
+            continue
+        for route, measured in data["routes"].items():
+            old = old_phase["routes"].get(route)
+            if old is None:
+                continue
+            for metric, higher_is_worse in COMPARED_METRICS.items():
+                before, after = old.get(metric), measured.get(metric)
+                change = f"{(after - before) / before * 100:+.1f}%" if before and after is not None else "n/a"
+                line = f"[{phase}] {route:14s} {metric:15s} {before!s:>10} -> {after!s:>10} ({change})"
+                if _worse(before, after, higher_is_worse, tolerance, metric):
+                    regressions.append(line)
+                    line += "  REGRESIÓN"
+                lines.append(line)
+        old_res, new_res = old_phase.get("resources") or {}, data.get("resources") or {}
+        for metric in COMPARED_RESOURCES:
+            before, after = old_res.get(metric), new_res.get(metric)
+            if before is None or after is None:
+                continue
+            line = f"[{phase}] {'(servidor)':14s} {metric:15s} {before!s:>10} -> {after!s:>10}"
+            if _worse(before, after, True, tolerance, metric):
+                regressions.append(line)
+                line += "  REGRESIÓN"
+            lines.append(line)
+    return lines, regressions
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_report(phases: Dict[str, Any], out=sys.stderr) -> None:
+    header = f"{'ruta':14s} {'ok':>6s} {'err':>5s} {'drop':>5s} {'rps':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s}"
+    for phase, data in phases.items():
+        print(f"\n[{phase}] ofrecido {data['offered_rps']:g} rps, {data['elapsed_s']}s", file=out)
+        print(header, file=out)
+        for route, m in list(data["routes"].items()) + [("total", data["total"])]:
+            print(f"{route:14s} {m['ok']:6d} {sum(m['errors'].values()):5d} {m['dropped']:5d} "
+                  f"{m['throughput_rps']:8.2f} {m['p50_ms']!s:>8} {m['p95_ms']!s:>8} {m['p99_ms']!s:>8}", file=out)
+        resources = data.get("resources")
+        if resources:
+            print(f"servidor: {resources['workers']} workers, RSS pico {resources['rss_mb_peak']}MB "
+                  f"(worker {resources['worker_rss_mb_peak']}MB), hilos pico {resources['threads_peak']} "
+                  f"(worker {resources['worker_threads_peak']})", file=out)
+
+
+# --- CLI ---
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--server', choices=('sync', 'asgi'), default='sync',
+                        help='Servidor a levantar: gunicorn app:app o asgi:app')
+    parser.add_argument('--workers', type=int, default=2, help='Procesos del servidor')
+    parser.add_argument('--url', help='Usar un servidor ya levantado (no se arranca ninguno)')
+    parser.add_argument('--pid', type=int, help='PID del master del servidor de --url (para RSS/hilos)')
+    parser.add_argument('--rate', type=float, default=20, help='Llegadas por segundo de cada fase')
+    parser.add_argument('--duration', type=float, default=20, help='Segundos de cada fase')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Pesos por ruta (por defecto {DEFAULT_MIX})')
+    parser.add_argument('--mix-only', action='store_true', help='No correr cada ruta sola antes de la mezcla')
+    parser.add_argument('--poisson', action='store_true', help='Llegadas de Poisson en vez de equiespaciadas')
+    parser.add_argument('--max-inflight', type=int, default=256, help='Peticiones pendientes antes de descartar')
+    parser.add_argument('--timeout', type=float, default=30, help='Timeout del cliente por petición (s)')
+    parser.add_argument('--warmup', type=float, default=10, help='Segundos de carga sin medir antes de las fases')
+    parser.add_argument('--pause', type=float, default=1, help='Pausa entre fases (s)')
+    parser.add_argument('--corpus', help='Directorio del corpus (se genera si está vacío; por defecto temporal)')
+    parser.add_argument('--corpus-size', type=int, default=30, help='Archivos del corpus generado')
+    parser.add_argument('--scan-open', type=int, default=4, help='Listeners abiertos por escaneo')
+    parser.add_argument('--scan-closed', type=int, default=16, help='Puertos cerrados por escaneo')
+    parser.add_argument('--cache', action='store_true',
+                        help='Mantener la caché de metadatos del servidor (por defecto se desactiva)')
+    parser.add_argument('--slo', action='append', default=[], help='Límite RUTA.METRICA=VALOR (p. ej. scan.p99_ms=500)')
+    parser.add_argument('--save-baseline', metavar='NOMBRE', help='Guardar el resultado en benchmarks/baselines/')
+    parser.add_argument('--compare', metavar='NOMBRE', help='Comparar con una línea base guardada')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Empeoramiento relativo tolerado (0.2 = 20%%)')
+    parser.add_argument('--output', help='Escribir el informe JSON en este archivo (por defecto stdout)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    slo = parse_slo(args.slo)
+    baseline = None
+    if args.compare:
+        with open(baseline_path(args.compare), encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    corpus_dir = args.corpus or tempfile.mkdtemp(prefix='loadtest_corpus_')
+    corpus = load_corpus(corpus_dir, args.corpus_size) if any(r.startswith('metadata') for r in args.mix) else []
+    targets = LoopbackTargets(args.scan_open, args.scan_closed)
+    factory = RequestFactory(corpus, targets.ports)
+
+    server = None
+    try:
+        if args.url:
+            url = urlsplit(args.url)
+            host, port, root_pid = url.hostname, url.port or 80, args.pid
+        else:
+            host, port = '127.0.0.1', free_port()
+            # Los escaneos de prueba no se guardan en el historial de data/
+            env = {"SCAN_HISTORY_DB": ""}
+            if not args.cache:
+                env["METADATA_CACHE_SIZE"] = "0"
+                env["METADATA_CACHE_DIR"] = ""
+            server = start_server(args.server, port, args.workers, env)
+            wait_ready(port)
+            root_pid = server.pid
+
+        sampler = ResourceSampler(root_pid)
+        sampler.start()
+        try:
+            phases = run_phases(args, host, port, factory, sampler)
+        finally:
+            sampler.stop()
+    finally:
+        targets.close()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if not args.corpus:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    result = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "git_revision": _git_revision(),
+            "server": args.url or args.server,
+            "workers": None if args.url else args.workers,
+            "rate": args.rate,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "mix": args.mix,
+            "arrivals": "poisson" if args.poisson else "uniform",
+            "metadata_cache": args.cache,
+            "scan_ports": {"open": args.scan_open, "closed": args.scan_closed},
+            "corpus_files": len(corpus),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "phases": phases,
+    }
+
+    violations = check_slo(phases, slo)
+    result["slo"] = {"limits": slo, "violations": violations}
+
+    print_report(phases)
+    failed = bool(violations)
+    if violations:
+        print("\nSLO incumplidos:", file=sys.stderr)
+        for line in violations:
+            print(f"  {line}", file=sys.stderr)
+
+    if baseline is not None:
+        lines, regressions = compare(baseline, result, args.tolerance)
+        result["comparison"] = {"baseline": args.compare, "regressions": regressions}
+        print(f"\nComparación con {args.compare} ({baseline['meta'].get('server')}, "
+              f"{baseline['meta'].get('git_revision')}):", file=sys.stderr)
+        for line in lines:
+            print(f"  {line}", file=sys.stderr)
+        failed = failed or bool(regressions)
+
+    if args.save_baseline:
+        path = baseline_path(args.save_baseline)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\nLínea base guardada en {os.path.relpath(path, ROOT)}", file=sys.stderr)
+
+    report = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+    else:
+        print(report)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Comparación de carga: gunicorn síncrono (app:app) vs ASGI (asgi:app)
+Lanza ambos servidores en puertos libres y dispara escaneos largos
+concurrentes contra cada uno, midiendo throughput, latencia y errores.
+
+Para que cada escaneo sea "largo" sin depender de la red, el objetivo es un
+tarpit local: un socket con backlog lleno, donde cada connect() espera hasta
+el timeout del escáner (1.5s por puerto).
+
+Uso:
+    python benchmarks/serving_compare.py --concurrency 200 --workers 2
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+from typing import Dict, List, Any, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_tarpit() -> List[socket.socket]:
+    """Socket que nunca acepta: tras la primera conexión los connect() quedan colgados"""
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(0)
+    filler = socket.create_connection(listener.getsockname())
+    return [listener, filler]
+
+
+def start_server(kind: str, port: int, workers: int,
+                 env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    if kind == 'sync':
+        cmd = [sys.executable, '-m', 'gunicorn', 'app:app',
+               '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--timeout', '120']
+    else:
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_asgi.conf.py', 'asgi:app',
+               '--bind', f'127.0.0.1:{port}', '--workers', str(workers)]
+    return subprocess.Popen(cmd, cwd=ROOT, env={**os.environ, **(env or {})},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(port: int, timeout: float = 60) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1) as s:
+                s.sendall(b'GET /health HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n')
+                if s.recv(12).startswith(b'HTTP/1.1 200'):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"El servidor en el puerto {port} no arrancó")
+
+
+async def post_json(port: int, path: str, payload: Dict[str, Any], timeout: float) -> int:
+    """POST mínimo HTTP/1.1; devuelve el código de estado"""
+    body = json.dumps(payload).encode()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+        return int(response.split(b' ', 2)[1])
+    finally:
+        writer.close()
+
+
+async def run_load(port: int, target_port: int, requests: int, concurrency: int,
+                   timeout: float) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                status = await post_json(port, '/api/scan_ports',
+                                         {"target": "127.0.0.1", "ports": [target_port]}, timeout)
+                if status == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors[f"http_{status}"] = errors.get(f"http_{status}", 0) + 1
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def pct(p: float) -> Optional[float]:
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+    return {
+        "requests": requests,
+        "ok": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else None
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=200, help='Escaneos por servidor')
+    parser.add_argument('--concurrency', type=int, default=200, help='Escaneos simultáneos')
+    parser.add_argument('--workers', type=int, default=2, help='Procesos de cada servidor')
+    parser.add_argument('--timeout', type=float, default=30, help='Timeout del cliente por petición (s)')
+    parser.add_argument('--only', choices=('sync', 'asgi'), help='Probar un solo servidor')
+    args = parser.parse_args()
+
+    tarpit = start_tarpit()
+    target_port = tarpit[0].getsockname()[1]
+    results = {}
+    try:
+        for kind in ('sync', 'asgi'):
+            if args.only and kind != args.only:
+                continue
+            port = free_port()
+            server = start_server(kind, port, args.workers)
+            try:
+                wait_ready(port)
+                print(f"[{kind}] {args.requests} escaneos, concurrencia {args.concurrency}...", flush=True)
+                results[kind] = asyncio.run(run_load(port, target_port, args.requests,
+                                                     args.concurrency, args.timeout))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+    finally:
+        for s in tarpit:
+            s.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
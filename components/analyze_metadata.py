@@ -9,35 +9,27 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime
 import logging
 
-# Imports condicionales (instalar según disponibilidad)
-try:
-    from PIL import Image
-    from PIL.ExifTags import TAGS
-    PILLOW_AVAILABLE = True
-except ImportError:
-    PILLOW_AVAILABLE = False
+from components.file_signatures import sniff_file
+from components.ole2 import OleFile, read_summary, read_xls_sheet_names
+from components.analyzer_registry import registry
+from components import metrics
+from components.geo import decode_gps, describe_location, geocoder
+from components.embedded_content import (
+    DeepScanBudget, scan_embedded, embedded_warnings,
+    CONTAINER_FORMATS, DEEP_SCAN_MAX_DEPTH, DEEP_SCAN_WORKERS
+)
 
-try:
-    import PyPDF2
-    PYPDF2_AVAILABLE = True
-except ImportError:
-    PYPDF2_AVAILABLE = False
-
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-
-try:
-    import openpyxl
-    OPENPYXL_AVAILABLE = True
-except ImportError:
-    OPENPYXL_AVAILABLE = False
+# Las librerías de análisis (Pillow, PyPDF2, python-docx, openpyxl) se importan
+# dentro de cada analizador la primera vez que se usan; ver analyzer_registry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Valores EXIF binarios mayores se resumen en lugar de volcarse como texto
+EXIF_MAX_BINARY_BYTES = 256
+# IFD GPS dentro del EXIF
+GPS_IFD = 0x8825
+
 
 class MetadataAnalyzer:
     """Analizador de metadatos para múltiples tipos de archivo"""
@@ -54,39 +46,61 @@ class MetadataAnalyzer:
     def __init__(self):
         self.results = {}
         
-    def analyze_file(self, file_path: str) -> Dict[str, Any]:
+    def analyze_file(self, file_path: str, deep: bool = False) -> Dict[str, Any]:
         """
         Analiza un archivo y extrae todos los metadatos disponibles
         
         Args:
             file_path: Ruta al archivo a analizar
+            deep: Analizar también las imágenes y adjuntos incrustados en
+                  PDF/Word/Excel (ver embedded_content.py)
             
         Returns:
             Diccionario con metadatos extraídos
         """
+        return self._analyze(file_path, DeepScanBudget() if deep else None, 0)
+    
+    def _analyze(self, file_path: str, budget: Optional[DeepScanBudget], depth: int) -> Dict[str, Any]:
         if not os.path.exists(file_path):
             return {"error": "Archivo no encontrado"}
         
         # Información básica del archivo
         basic_info = self._get_basic_info(file_path)
         
-        # Determinar tipo de archivo
+        # Determinar tipo de archivo por su contenido (magic bytes)
         file_ext = os.path.splitext(file_path)[1].lower()
-        file_type = self._get_file_type(file_ext)
+        file_type, file_format = sniff_file(file_path)
+        basic_info["detected_format"] = file_format
         
-        # Extraer metadatos específicos según tipo
+        # Extraer metadatos específicos con el analizador registrado para el tipo
         specific_metadata = {}
+        spec = registry.resolve(file_type, file_format)
+        if spec is not None:
+            with metrics.PARSER_LATENCY.time(parser=spec.name):
+                specific_metadata = spec.handler(self, file_path)
+        
+        warnings = self._check_security_risks(specific_metadata)
         
-        if file_type == 'image' and PILLOW_AVAILABLE:
-            specific_metadata = self._analyze_image(file_path)
-        elif file_type == 'pdf' and PYPDF2_AVAILABLE:
-            specific_metadata = self._analyze_pdf(file_path)
-        elif file_type == 'word' and DOCX_AVAILABLE:
-            specific_metadata = self._analyze_word(file_path)
-        elif file_type == 'excel' and OPENPYXL_AVAILABLE:
-            specific_metadata = self._analyze_excel(file_path)
-        elif file_type == 'text':
-            specific_metadata = self._analyze_text(file_path)
+        # Contenido incrustado: cada elemento pasa por este mismo análisis
+        if budget is not None and depth < DEEP_SCAN_MAX_DEPTH and file_format in CONTAINER_FORMATS \
+                and "error" not in specific_metadata:
+            with metrics.PARSER_LATENCY.time(parser="deep-scan"):
+                embedded = scan_embedded(
+                    file_path, file_format, budget,
+                    analyze=lambda path: MetadataAnalyzer()._analyze(path, budget, depth + 1),
+                    # Los niveles anidados no abren otro pool en paralelo
+                    workers=DEEP_SCAN_WORKERS if depth == 0 else 1
+                )
+            specific_metadata["embedded"] = embedded
+            extra = embedded_warnings(embedded)
+            if extra:
+                warnings = [w for w in warnings if not w.startswith("✅")] + extra
+        
+        # Extensión que no coincide con el contenido real (archivo renombrado)
+        ext_type = self._get_file_type(file_ext)
+        if depth == 0 and 'unknown' not in (file_type, ext_type) and ext_type != file_type:
+            warnings = [f"⚠️ La extensión ({file_ext or 'ninguna'}) no coincide con el contenido real ({file_format.upper()})"] + \
+                       [w for w in warnings if not w.startswith("✅")]
         
         # Combinar resultados
         return {
@@ -94,7 +108,7 @@ class MetadataAnalyzer:
             "file_info": basic_info,
             "file_type": file_type,
             "metadata": specific_metadata,
-            "warnings": self._check_security_risks(specific_metadata),
+            "warnings": warnings,
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
     
@@ -113,8 +127,31 @@ class MetadataAnalyzer:
             "accessed": datetime.fromtimestamp(stat.st_atime).strftime("%Y-%m-%d %H:%M:%S")
         }
     
+    def _exif_value(self, value: Any) -> str:
+        """Valor EXIF como texto; los blobs binarios (MakerNote, miniaturas...) solo se resumen"""
+        if isinstance(value, bytes):
+            if len(value) > EXIF_MAX_BINARY_BYTES:
+                return f"<{len(value)} bytes binarios>"
+            value = value.decode('utf-8', errors='ignore')
+        return str(value)
+    
+    def _gps_location(self, image) -> Optional[Dict[str, Any]]:
+        """Coordenadas del IFD GPS y el lugar habitado más cercano"""
+        try:
+            gps = decode_gps(image.getexif().get_ifd(GPS_IFD))
+        except Exception as e:
+            logger.warning(f"Error leyendo GPS: {e}")
+            return None
+        if not gps:
+            return None
+        try:
+            gps["nearest_place"] = geocoder.nearest(gps["latitude"], gps["longitude"])
+        except (OSError, ValueError) as e:
+            logger.warning(f"Geocodificación inversa no disponible: {e}")
+        return gps
+    
     def _get_file_type(self, extension: str) -> str:
-        """Determina el tipo de archivo por extensión"""
+        """Tipo esperado según la extensión (solo para detectar renombrados)"""
         for file_type, extensions in self.SUPPORTED_TYPES.items():
             if extension in extensions:
                 return file_type
@@ -122,6 +159,9 @@ class MetadataAnalyzer:
     
     def _analyze_image(self, file_path: str) -> Dict[str, Any]:
         """Extrae metadatos EXIF de imágenes"""
+        from PIL import Image
+        from PIL.ExifTags import TAGS
+        
         try:
             image = Image.open(file_path)
             
@@ -142,9 +182,7 @@ class MetadataAnalyzer:
                         for tag_id, value in exif_raw.items():
                             tag = TAGS.get(tag_id, str(tag_id))
                             try:
-                                if isinstance(value, bytes):
-                                    value = value.decode('utf-8', errors='ignore')
-                                exif_data[tag] = str(value)
+                                exif_data[tag] = self._exif_value(value)
                             except:
                                 pass
                 
@@ -155,9 +193,7 @@ class MetadataAnalyzer:
                         for tag_id, value in exif_raw.items():
                             tag = TAGS.get(tag_id, str(tag_id))
                             try:
-                                if isinstance(value, bytes):
-                                    value = value.decode('utf-8', errors='ignore')
-                                exif_data[tag] = str(value)
+                                exif_data[tag] = self._exif_value(value)
                             except:
                                 pass
                 
@@ -173,6 +209,12 @@ class MetadataAnalyzer:
             except Exception as exif_error:
                 logger.warning(f"Error extracting EXIF: {exif_error}")
             
+            # GPS decodificado a grados decimales + ciudad más cercana (offline)
+            gps = self._gps_location(image)
+            if gps:
+                info["gps"] = gps
+                exif_data["GPSInfo"] = describe_location(gps)
+            
             # Determinar si hay EXIF
             if exif_data:
                 info["exif"] = exif_data
@@ -213,6 +255,8 @@ class MetadataAnalyzer:
     
     def _analyze_pdf(self, file_path: str) -> Dict[str, Any]:
         """Extrae metadatos de archivos PDF"""
+        import PyPDF2
+        
         try:
             with open(file_path, 'rb') as file:
                 reader = PyPDF2.PdfReader(file)
@@ -250,6 +294,8 @@ class MetadataAnalyzer:
     
     def _analyze_word(self, file_path: str) -> Dict[str, Any]:
         """Extrae metadatos de documentos Word (.docx)"""
+        from docx import Document
+        
         try:
             doc = Document(file_path)
             
@@ -288,6 +334,8 @@ class MetadataAnalyzer:
     
     def _analyze_excel(self, file_path: str) -> Dict[str, Any]:
         """Extrae metadatos de archivos Excel (.xlsx)"""
+        import openpyxl
+        
         try:
             workbook = openpyxl.load_workbook(file_path, data_only=True)
             
@@ -326,6 +374,54 @@ class MetadataAnalyzer:
             logger.error(f"Error analyzing Excel file: {e}")
             return {"error": str(e)}
     
+    def _analyze_ole2(self, file_path: str, kind: str) -> Dict[str, Any]:
+        """Extrae metadatos de documentos OLE2 heredados (.doc / .xls)"""
+        try:
+            with open(file_path, 'rb') as file:
+                ole = OleFile(file)
+                summary = read_summary(ole)
+                
+                if kind == 'excel':
+                    sheet_names = read_xls_sheet_names(ole)
+                    info = {
+                        "sheets": len(sheet_names),
+                        "sheet_names": sheet_names
+                    }
+                else:
+                    info = {
+                        "page_count": summary.get("page_count", "Unknown"),
+                        "word_count": summary.get("word_count", "Unknown"),
+                        "char_count": summary.get("char_count", "Unknown")
+                    }
+            
+            # Mismas claves que .docx/.xlsx para que el frontend las muestre igual
+            properties = {
+                "author": summary.get("author") or "Unknown",
+                "title": summary.get("title") or "Untitled",
+                "subject": summary.get("subject") or "None",
+                "keywords": summary.get("keywords") or "None",
+                "created": summary.get("created") or "Unknown",
+                "modified": summary.get("modified") or "Unknown",
+                "last_modified_by": summary.get("last_modified_by") or "Unknown",
+                "revision": summary.get("revision") or "Unknown"
+            }
+            for key in ('company', 'manager', 'application', 'template', 'comments', 'last_printed'):
+                if summary.get(key):
+                    properties[key] = str(summary[key])
+            
+            info["document_properties"] = properties
+            
+            # Datos sensibles
+            sensitive = {k: v for k, v in properties.items() 
+                        if v and v not in ["Unknown", "Untitled", "None"]}
+            info["sensitive_data"] = sensitive if sensitive else None
+            
+            return info
+            
+        except Exception as e:
+            logger.error(f"Error analyzing OLE2 document: {e}")
+            return {"error": str(e)}
+    
     def _analyze_text(self, file_path: str) -> Dict[str, Any]:
         """Analiza archivos de texto plano"""
         try:
@@ -358,7 +454,10 @@ class MetadataAnalyzer:
             if any(key in sensitive for key in ['Author', 'Creator', 'author', 'creator']):
                 warnings.append("⚠️ Contiene información del autor")
             
-            if any(key in sensitive for key in ['GPSInfo', 'Location']):
+            if metadata.get("gps"):
+                warnings.append("🚨 CRÍTICO: Contiene datos de geolocalización: "
+                                + describe_location(metadata["gps"]))
+            elif any(key in sensitive for key in ['GPSInfo', 'Location']):
                 warnings.append("🚨 CRÍTICO: Contiene datos de geolocalización")
             
             if any(key in sensitive for key in ['Make', 'Model', 'Software', 'Producer']):
@@ -383,23 +482,32 @@ class MetadataAnalyzer:
         return f"{bytes_size:.2f} TB"
 
 
-def analyze_metadata(file_path: str) -> Dict[str, Any]:
+# Analizadores incorporados
+registry.register('image', MetadataAnalyzer._analyze_image, requires=('PIL',), name='pillow')
+registry.register('pdf', MetadataAnalyzer._analyze_pdf, requires=('PyPDF2',), name='pypdf2')
+registry.register('word', MetadataAnalyzer._analyze_word, formats=('docx',), requires=('docx',), name='python-docx')
+registry.register('excel', MetadataAnalyzer._analyze_excel, formats=('xlsx',), requires=('openpyxl',), name='openpyxl')
+registry.register('word', lambda analyzer, path: analyzer._analyze_ole2(path, 'word'), formats=('doc',), name='ole2-doc')
+registry.register('excel', lambda analyzer, path: analyzer._analyze_ole2(path, 'excel'), formats=('xls',), name='ole2-xls')
+registry.register('text', MetadataAnalyzer._analyze_text, name='text')
+
+
+def analyze_metadata(file_path: str, deep: bool = False) -> Dict[str, Any]:
     """
     Función principal para analizar metadatos de un archivo
     
     Args:
         file_path: Ruta al archivo
+        deep: Analizar también el contenido incrustado
         
     Returns:
         Diccionario con resultados del análisis
     """
     analyzer = MetadataAnalyzer()
-    return analyzer.analyze_file(file_path)
+    return analyzer.analyze_file(file_path, deep=deep)
 
-# Test básico
+# python -m components.analyze_metadata ... equivale a: python cybertools.py meta ...
 if __name__ == "__main__":
-    print("=== Analizador de Metadatos ===")
-    print(f"PIL/Pillow: {'✓' if PILLOW_AVAILABLE else '✗'}")
-    print(f"PyPDF2: {'✓' if PYPDF2_AVAILABLE else '✗'}")
-    print(f"python-docx: {'✓' if DOCX_AVAILABLE else '✗'}")
-    print(f"openpyxl: {'✓' if OPENPYXL_AVAILABLE else '✗'}")
\ No newline at end of file
+    import sys
+    from components.cli import main
+    sys.exit(main(["meta", *sys.argv[1:]]))
@@ -0,0 +1,201 @@
+"""
+Registro de Analizadores de Metadatos
+Asocia cada tipo de archivo detectado con su analizador. Las librerías de
+cada parser se importan recién la primera vez que se necesita ese tipo, y su
+disponibilidad se comprueba sin importarlas.
+
+Analizadores de terceros:
+    Un paquete puede exponer un entry point en el grupo
+    'cybertools.analyzers' que apunte a una función register(registry):
+
+        [project.entry-points."cybertools.analyzers"]
+        heic = "mi_paquete.heic:register"
+
+        def register(registry):
+            registry.register('image', analyze_heic, formats=('heic',),
+                              signatures=[(4, b'ftypheic'), (4, b'ftypmif1')],
+                              requires=('pillow_heif',), priority=10)
+
+    El handler recibe (analyzer, file_path) y devuelve un diccionario. Un
+    formato que la detección por contenido no conoce necesita sus firmas
+    (offset, prefijo); sin ellas el plugin solo puede reemplazar el
+    analizador de un formato existente. Los uploads se aceptan si algún
+    analizador registrado atiende el tipo/formato detectado.
+"""
+
+import importlib
+import importlib.util
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Callable, Iterable, Tuple
+
+from components.file_signatures import register_signature, formats_of_type
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = 'cybertools.analyzers'
+
+_availability: Dict[str, bool] = {}
+
+
+def module_available(module_name: str) -> bool:
+    """Comprueba si un módulo puede importarse sin importarlo (resultado cacheado)"""
+    if module_name not in _availability:
+        try:
+            _availability[module_name] = importlib.util.find_spec(module_name) is not None
+        except (ImportError, ValueError):
+            _availability[module_name] = False
+    return _availability[module_name]
+
+
+class AnalyzerSpec:
+    """Descripción de un analizador registrado"""
+
+    __slots__ = ('name', 'file_type', 'formats', 'requires', 'handler', 'priority')
+
+    def __init__(self, name: str, file_type: str, handler: Callable,
+                 formats: Optional[Iterable[str]] = None,
+                 requires: Iterable[str] = (), priority: int = 0):
+        self.name = name
+        self.file_type = file_type
+        self.handler = handler
+        self.formats = frozenset(formats) if formats else None
+        self.requires = tuple(requires)
+        self.priority = priority
+
+    def matches(self, file_type: str, file_format: str) -> bool:
+        return self.file_type == file_type and (self.formats is None or file_format in self.formats)
+
+    @property
+    def available(self) -> bool:
+        return all(module_available(m) for m in self.requires)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "file_type": self.file_type,
+            "formats": sorted(self.formats) if self.formats else "*",
+            "requires": list(self.requires),
+            "available": self.available
+        }
+
+
+class AnalyzerRegistry:
+    """Registro de analizadores por tipo/formato detectado"""
+
+    def __init__(self):
+        self._specs: List[AnalyzerSpec] = []
+        self._resolved: Dict[tuple, Optional[AnalyzerSpec]] = {}
+        self._entry_points_loaded = False
+        self._lock = threading.Lock()
+        # Reentrante: un plugin puede consultar el registro mientras se carga
+        self._plugins_lock = threading.RLock()
+        self._loading_plugins = False
+
+    def register(self, file_type: str, handler: Callable,
+                 formats: Optional[Iterable[str]] = None,
+                 requires: Iterable[str] = (), priority: int = 0,
+                 name: Optional[str] = None,
+                 signatures: Iterable[Tuple[int, bytes]] = ()) -> AnalyzerSpec:
+        """
+        Registra un analizador
+
+        Args:
+            file_type: Tipo detectado ('image', 'pdf', 'word', 'excel', 'text'...)
+            handler: Función (analyzer, file_path) -> dict
+            formats: Formatos concretos que atiende (None = todos los del tipo)
+            requires: Módulos que necesita (se comprueban sin importarlos)
+            priority: Mayor prioridad gana ante varios candidatos
+            name: Nombre descriptivo
+            signatures: Firmas (offset, prefijo) de un formato nuevo; requiere
+                        un único formato en formats
+        """
+        signatures = list(signatures)
+        if signatures:
+            if not formats or len(set(formats)) != 1:
+                raise ValueError("signatures requiere exactamente un formato en formats")
+            fmt = next(iter(formats))
+            for offset, prefix in signatures:
+                register_signature(offset, prefix, file_type, fmt)
+        spec = AnalyzerSpec(name or getattr(handler, '__name__', file_type),
+                            file_type, handler, formats, requires, priority)
+        with self._lock:
+            self._specs.append(spec)
+            self._specs.sort(key=lambda s: -s.priority)
+            self._resolved.clear()
+        return spec
+
+    def resolve(self, file_type: str, file_format: str) -> Optional[AnalyzerSpec]:
+        """Devuelve el analizador disponible de mayor prioridad para un tipo/formato"""
+        self._load_entry_points()
+        key = (file_type, file_format)
+        if key not in self._resolved:
+            spec = next((s for s in self._specs
+                         if s.matches(file_type, file_format) and s.available), None)
+            self._resolved[key] = spec
+        return self._resolved[key]
+
+    def specs(self) -> List[AnalyzerSpec]:
+        self._load_entry_points()
+        return list(self._specs)
+
+    def supports(self, file_type: str, file_format: str) -> bool:
+        """Hay algún analizador registrado (disponible o no) para el tipo/formato"""
+        return any(s.matches(file_type, file_format) for s in self.specs())
+
+    def supported_formats(self) -> List[str]:
+        """Formatos detectables por contenido que algún analizador atiende"""
+        formats = set()
+        for spec in self.specs():
+            formats |= spec.formats if spec.formats else formats_of_type(spec.file_type)
+        return sorted(formats)
+
+    def load_plugins(self) -> None:
+        """Carga los analizadores externos (entry points) si aún no se cargaron"""
+        self._load_entry_points()
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Lista de analizadores registrados y su disponibilidad"""
+        return [s.to_dict() for s in self.specs()]
+
+    def preload(self) -> None:
+        """Importa por adelantado las librerías de todos los analizadores disponibles"""
+        for spec in self.specs():
+            if spec.available:
+                for module_name in spec.requires:
+                    importlib.import_module(module_name)
+
+    def _load_entry_points(self) -> None:
+        if self._entry_points_loaded:
+            return
+        # Los demás hilos esperan a que termine la carga; el hilo que carga
+        # (p. ej. un plugin que llama a specs()) sigue con lo ya registrado
+        with self._plugins_lock:
+            if self._entry_points_loaded or self._loading_plugins:
+                return
+            self._loading_plugins = True
+            try:
+                self._register_entry_points()
+            finally:
+                self._loading_plugins = False
+                self._entry_points_loaded = True
+
+    def _register_entry_points(self) -> None:
+        try:
+            from importlib.metadata import entry_points
+            eps = entry_points(group=ENTRY_POINT_GROUP)
+        except Exception as e:
+            logger.warning(f"No se pudieron leer los entry points: {e}")
+            return
+
+        for ep in eps:
+            try:
+                ep.load()(self)
+                logger.info(f"Analizador externo registrado: {ep.name}")
+            except Exception as e:
+                logger.error(f"Error cargando analizador externo {ep.name}: {e}")
+
+
+# Registro global usado por MetadataAnalyzer
+registry = AnalyzerRegistry()
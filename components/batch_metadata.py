@@ -0,0 +1,242 @@
+"""
+Análisis de Metadatos por Lotes
+Reparte varios archivos (o el contenido de un .zip) entre un pool de procesos
+pre-calentado y entrega cada resultado a medida que termina
+"""
+
+import os
+import zipfile
+import logging
+import threading
+import concurrent.futures
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+from components.analyze_metadata import analyze_metadata
+from components import metrics
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Límites de extracción para archivos .zip
+MAX_ARCHIVE_MEMBERS = 500
+MAX_ARCHIVE_BYTES = 256 * 1024 * 1024
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def _init_worker(memory_limit_mb: Optional[int]) -> None:
+    """
+    Inicializa un proceso del pool:
+    - Limita la memoria direccionable (cada tarea corre con ese tope)
+    - Importa de antemano las librerías de análisis
+    """
+    if memory_limit_mb and RESOURCE_AVAILABLE:
+        limit = memory_limit_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError) as e:
+            logger.warning(f"No se pudo limitar la memoria del worker: {e}")
+
+    # Forzar la carga de los parsers para que la primera tarea no la pague
+    from components.analyzer_registry import registry
+    registry.preload()
+
+
+def _warmup() -> int:
+    return os.getpid()
+
+
+def _analyze_task(file_path: str, display_name: str, deep: bool = False) -> Dict[str, Any]:
+    """Tarea ejecutada en el pool (debe ser picklable y de nivel módulo)"""
+    try:
+        result = analyze_metadata(file_path, deep=deep)
+    except MemoryError:
+        return {"error": "Límite de memoria excedido analizando el archivo"}
+    if "file_info" in result:
+        result["file_info"]["filename"] = display_name
+    return result
+
+
+class BatchMetadataAnalyzer:
+    """Pool de procesos reutilizable para análisis de metadatos en lote"""
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 memory_limit_mb: Optional[int] = 1024):
+        """
+        Args:
+            max_workers: Procesos del pool (por defecto, núcleos disponibles)
+            memory_limit_mb: Memoria máxima por worker (None = sin límite)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.memory_limit_mb = memory_limit_mb
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        # Lotes simultáneos (servidor con hilos) no deben crear dos pools
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        """Crea el pool la primera vez y arranca todos sus procesos"""
+        with self._lock:
+            if self._executor is None:
+                executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(self.memory_limit_mb,)
+                )
+                # Pre-calentar: un no-op por worker levanta todos los procesos
+                warm = [executor.submit(_warmup) for _ in range(self.max_workers)]
+                concurrent.futures.wait(warm)
+                self._executor = executor
+            return self._executor
+
+    def _discard(self, executor: concurrent.futures.ProcessPoolExecutor) -> None:
+        """Descarta un pool roto (el próximo lote crea otro)"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def analyze(self, files: List[Tuple[str, str]],
+                deep: bool = False) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Analiza archivos en paralelo
+
+        Args:
+            files: Lista de tuplas (ruta en disco, nombre a mostrar)
+            deep: Analizar también el contenido incrustado de cada archivo
+
+        Yields:
+            Tuplas (ruta, nombre a mostrar, resultado) en orden de finalización.
+            La ruta identifica el archivo: el nombre puede repetirse en un lote.
+        """
+        executor = self.executor
+        try:
+            future_to_file = {
+                executor.submit(_analyze_task, path, name, deep): (path, name)
+                for path, name in files
+            }
+        except concurrent.futures.BrokenExecutor:
+            self._discard(executor)
+            raise
+
+        pending = len(future_to_file)
+        metrics.EXECUTOR_QUEUE_DEPTH.inc(pending, executor="metadata_batch")
+        try:
+            for future in concurrent.futures.as_completed(future_to_file):
+                path, name = future_to_file[future]
+                pending -= 1
+                metrics.EXECUTOR_QUEUE_DEPTH.dec(executor="metadata_batch")
+                try:
+                    yield path, name, future.result()
+                except concurrent.futures.BrokenExecutor:
+                    # Un worker murió (p. ej. por el límite de memoria)
+                    self._discard(executor)
+                    yield path, name, {"error": "El worker de análisis terminó inesperadamente"}
+                except Exception as e:
+                    logger.error(f"Error analizando {name}: {e}")
+                    yield path, name, {"error": str(e)}
+        finally:
+            metrics.EXECUTOR_QUEUE_DEPTH.dec(pending, executor="metadata_batch")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_archive(archive_path: str, dest_dir: str,
+                    max_members: int = MAX_ARCHIVE_MEMBERS,
+                    max_bytes: int = MAX_ARCHIVE_BYTES) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Extrae de forma segura los miembros de un .zip
+
+    Ignora directorios y rutas absolutas o con '..', y se detiene al superar el número de miembros o el
+    tamaño descomprimido máximo (protección contra zip bombs).
+
+    Returns:
+        Tupla (lista de (ruta extraída, nombre en el zip), lista de avisos)
+    """
+    extracted = []
+    skipped = []
+    total_bytes = 0
+
+    with zipfile.ZipFile(archive_path) as archive:
+        for index, info in enumerate(archive.infolist()):
+            name = info.filename
+            if info.is_dir():
+                continue
+            if len(extracted) >= max_members:
+                skipped.append(f"Límite de {max_members} archivos alcanzado")
+                break
+            if name.startswith(('/', '\\')) or '..' in name.replace('\\', '/').split('/'):
+                skipped.append(f"{name}: ruta no permitida")
+                continue
+
+            # El tipo se decide después por contenido (is_supported_content)
+            ext = os.path.splitext(name)[1].lower().replace('.', '')
+            dest = os.path.join(dest_dir, f"{index:04d}.{ext}" if ext else f"{index:04d}")
+            written = 0
+            with archive.open(info) as src, open(dest, 'wb') as out:
+                while True:
+                    chunk = src.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if total_bytes + written > max_bytes:
+                        break
+                    out.write(chunk)
+
+            if total_bytes + written > max_bytes:
+                os.remove(dest)
+                skipped.append(f"Límite de {max_bytes // (1024 * 1024)}MB descomprimidos alcanzado")
+                break
+
+            total_bytes += written
+            extracted.append((dest, name))
+
+    return extracted, skipped
+
+
+def risk_level(result: Dict[str, Any]) -> str:
+    """Clasifica un resultado según sus advertencias de seguridad"""
+    if "error" in result and result.get("status") != "success":
+        return "error"
+    warnings = result.get("warnings", [])
+    if any(w.startswith("🚨") for w in warnings):
+        return "critical"
+    if any(w.startswith("⚠️") for w in warnings):
+        return "warning"
+    return "clean"
+
+
+def summarize_batch(results: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Construye el resumen de riesgo agregado de un lote"""
+    levels = {"critical": [], "warning": [], "clean": [], "error": []}
+    warning_counts: Dict[str, int] = {}
+
+    for name, result in results:
+        levels[risk_level(result)].append(name)
+        for warning in result.get("warnings", []):
+            warning_counts[warning] = warning_counts.get(warning, 0) + 1
+
+    if levels["critical"]:
+        overall = "critical"
+    elif levels["warning"]:
+        overall = "warning"
+    else:
+        overall = "clean"
+
+    return {
+        "total_files": len(results),
+        "overall_risk": overall,
+        "counts": {level: len(names) for level, names in levels.items()},
+        "critical_files": levels["critical"],
+        "failed_files": levels["error"],
+        "warnings": dict(sorted(warning_counts.items(), key=lambda x: -x[1]))
+    }
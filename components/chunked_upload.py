@@ -0,0 +1,346 @@
+"""
+Subidas por Partes (reanudables)
+Permite subir archivos mayores que MAX_CONTENT_LENGTH en varias peticiones:
+
+    1. create()  -> id de la subida y tamaño declarado
+    2. append()  -> cada parte con su offset; si se corta, status() devuelve
+                    el offset real y el cliente continúa desde ahí
+    3. finish()  -> archivo completo y su hash, listo para analizar
+
+El hash (BLAKE2b, el mismo de la caché de metadatos) se calcula a medida que
+llegan las partes. El estado vive en disco (archivo parcial + JSON), así que
+cualquier worker puede recibir la siguiente parte; si un worker no tiene el
+hash en memoria lo recalcula desde el archivo parcial.
+
+En cuanto llega la cabecera se analiza en segundo plano: en imágenes el EXIF
+está al principio, así que los metadatos suelen estar listos antes de que
+termine la subida. Los formatos que guardan los metadatos al final (PDF,
+Office) esperan al archivo completo.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+import concurrent.futures
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, BinaryIO, Tuple
+
+from components import metrics
+from components.analyze_metadata import analyze_metadata, MetadataAnalyzer
+from components.file_signatures import sniff_bytes, SNIFF_SIZE
+from components.metadata_cache import new_hasher, CHUNK_SIZE
+
+try:
+    import fcntl
+except ImportError:  # Windows: las partes de una subida no se reciben en paralelo
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024
+DEFAULT_SESSION_TTL = 24 * 3600
+# Tamaño de parte recomendado al cliente (cada PUT respeta MAX_CONTENT_LENGTH)
+RECOMMENDED_CHUNK_SIZE = 8 * 1024 * 1024
+# Bytes que se esperan antes del análisis anticipado y máximo que se analiza
+EARLY_ANALYSIS_BYTES = 256 * 1024
+EARLY_ANALYSIS_MAX_BYTES = 4 * 1024 * 1024
+# Tipos cuyos metadatos están en la cabecera
+EARLY_TYPES = {'image', 'text'}
+MAX_CACHED_HASHERS = 64
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadError(Exception):
+    """Error de una subida por partes, con el código HTTP a devolver"""
+
+    def __init__(self, message: str, status: int = 400, offset: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class ChunkedUploads:
+    """Sesiones de subida por partes guardadas en un directorio"""
+
+    def __init__(self, upload_dir: str, max_size: int = DEFAULT_MAX_UPLOAD_SIZE,
+                 session_ttl: float = DEFAULT_SESSION_TTL):
+        """
+        Args:
+            upload_dir: Directorio de trabajo (se crea si no existe)
+            max_size: Tamaño máximo declarado de un archivo
+            session_ttl: Segundos sin actividad tras los que se descarta una subida
+        """
+        self.upload_dir = upload_dir
+        self.max_size = max_size
+        self.session_ttl = session_ttl
+        os.makedirs(upload_dir, exist_ok=True)
+        # upload_id -> (hasher, bytes ya hasheados)
+        self._hashers: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._early_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix='upload-early'
+        )
+
+    # --- Rutas ---
+
+    def _path(self, upload_id: str, suffix: str) -> str:
+        if not _UPLOAD_ID.match(upload_id or ''):
+            raise UploadError("Subida no encontrada", 404)
+        return os.path.join(self.upload_dir, f"{upload_id}{suffix}")
+
+    def _load_meta(self, upload_id: str) -> Dict[str, Any]:
+        try:
+            with open(self._path(upload_id, '.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError("Subida no encontrada o expirada", 404)
+
+    def _write_json(self, path: str, data: Dict[str, Any]) -> None:
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _locked_part(self, upload_id: str):
+        """Archivo parcial abierto para añadir, con lock exclusivo entre procesos"""
+        with open(self._path(upload_id, '.part'), 'ab') as part:
+            if fcntl is not None:
+                fcntl.flock(part, fcntl.LOCK_EX)
+            # Otro worker pudo añadir datos mientras se esperaba el lock
+            part.seek(0, os.SEEK_END)
+            yield part
+
+    # --- Hash incremental ---
+
+    def _hasher_at(self, upload_id: str, offset: int):
+        """Hasher con exactamente `offset` bytes consumidos"""
+        with self._lock:
+            entry = self._hashers.pop(upload_id, None)
+        if entry is not None and entry[1] == offset:
+            return entry[0]
+
+        # Otro worker recibió partes anteriores: rehashear desde el disco
+        hasher = new_hasher()
+        remaining = offset
+        with open(self._path(upload_id, '.part'), 'rb') as f:
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                remaining -= len(chunk)
+        return hasher
+
+    def _keep_hasher(self, upload_id: str, hasher, offset: int) -> None:
+        with self._lock:
+            self._hashers[upload_id] = (hasher, offset)
+            while len(self._hashers) > MAX_CACHED_HASHERS:
+                self._hashers.popitem(last=False)
+
+    # --- Ciclo de vida ---
+
+    def create(self, filename: str, size: int) -> Dict[str, Any]:
+        """Inicia una subida de `size` bytes"""
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError("El tamaño debe ser un entero positivo")
+        if size > self.max_size:
+            raise UploadError(f"Archivo muy grande (máx {self.max_size // (1024 * 1024)}MB)", 413)
+
+        self.purge_stale()
+        upload_id = uuid.uuid4().hex
+        open(self._path(upload_id, '.part'), 'wb').close()
+        self._write_json(self._path(upload_id, '.json'), {
+            "filename": filename, "size": size, "created": time.time()
+        })
+        metrics.CHUNKED_UPLOADS.inc(event="created")
+        return self.status(upload_id)
+
+    def status(self, upload_id: str) -> Dict[str, Any]:
+        """Estado de la subida: offset desde el que continuar y análisis anticipado"""
+        meta = self._load_meta(upload_id)
+        offset = os.path.getsize(self._path(upload_id, '.part'))
+        return {
+            "upload_id": upload_id,
+            "filename": meta["filename"],
+            "size": meta["size"],
+            "offset": offset,
+            "complete": offset == meta["size"],
+            "detected_format": meta.get("detected_format"),
+            "early_result": self._early_result(upload_id)
+        }
+
+    def append(self, upload_id: str, offset: int, stream: BinaryIO) -> Dict[str, Any]:
+        """
+        Añade una parte que empieza en `offset`
+
+        Raises:
+            UploadError: 409 (con el offset correcto) si no coincide con lo
+            recibido, 413 si se excede el tamaño declarado
+        """
+        meta = self._load_meta(upload_id)
+        size = meta["size"]
+
+        with self._locked_part(upload_id) as part:
+            start = part.tell()
+            if offset != start:
+                raise UploadError("El offset no coincide con lo recibido", 409, offset=start)
+
+            hasher = self._hasher_at(upload_id, start)
+            written = 0
+            try:
+                with metrics.STAGE_LATENCY.time(stage="upload_chunk"):
+                    while True:
+                        chunk = stream.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        if start + written + len(chunk) > size:
+                            raise UploadError("La parte excede el tamaño declarado", 413, offset=start + written)
+                        hasher.update(chunk)
+                        part.write(chunk)
+                        written += len(chunk)
+            finally:
+                # Lo ya escrito queda (una parte cortada se reanuda desde ahí)
+                part.flush()
+                self._keep_hasher(upload_id, hasher, start + written)
+                metrics.CHUNKED_UPLOAD_BYTES.inc(written)
+
+        end = start + written
+        os.utime(self._path(upload_id, '.json'), None)
+
+        if start < SNIFF_SIZE <= end or (start == 0 and end == size):
+            meta["detected_format"] = self._sniff(upload_id)
+            self._write_json(self._path(upload_id, '.json'), meta)
+        threshold = min(EARLY_ANALYSIS_BYTES, size)
+        if start < threshold <= end:
+            self._start_early_analysis(upload_id, meta, end)
+
+        return self.status(upload_id)
+
+    def finish(self, upload_id: str, dest_dir: str) -> Tuple[str, str, str]:
+        """
+        Cierra una subida completa y mueve el archivo a dest_dir
+
+        Returns:
+            Tupla (ruta final, nombre original, hash del contenido)
+        """
+        meta = self._load_meta(upload_id)
+        with self._locked_part(upload_id) as part:
+            received = part.tell()
+            if received != meta["size"]:
+                raise UploadError(f"Subida incompleta: {received} de {meta['size']} bytes", 409, offset=received)
+            digest = self._hasher_at(upload_id, received).hexdigest()
+            dest = os.path.join(dest_dir, f"{upload_id[:8]}_{meta['filename']}")
+            os.replace(self._path(upload_id, '.part'), dest)
+
+        self._discard(upload_id, keep_part=True)
+        metrics.CHUNKED_UPLOADS.inc(event="completed")
+        return dest, meta["filename"], digest
+
+    def abort(self, upload_id: str) -> None:
+        self._load_meta(upload_id)
+        self._discard(upload_id)
+        metrics.CHUNKED_UPLOADS.inc(event="aborted")
+
+    def _discard(self, upload_id: str, keep_part: bool = False) -> None:
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+        suffixes = ['.json', '.early.json'] + ([] if keep_part else ['.part'])
+        for suffix in suffixes:
+            try:
+                os.remove(self._path(upload_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def purge_stale(self) -> int:
+        """Descarta las subidas sin actividad durante session_ttl"""
+        cutoff = time.time() - self.session_ttl
+        purged = 0
+        with os.scandir(self.upload_dir) as it:
+            for entry in it:
+                name = entry.name
+                if not name.endswith('.json') or name.endswith('.early.json'):
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        self._discard(name[:-len('.json')])
+                        purged += 1
+                except (FileNotFoundError, UploadError):
+                    continue
+        if purged:
+            metrics.CHUNKED_UPLOADS.inc(purged, event="expired")
+            logger.info(f"{purged} subidas por partes expiradas descartadas")
+        return purged
+
+    # --- Análisis anticipado ---
+
+    def _sniff(self, upload_id: str) -> Dict[str, str]:
+        with open(self._path(upload_id, '.part'), 'rb') as f:
+            file_type, fmt = sniff_bytes(f.read(SNIFF_SIZE))
+        return {"type": file_type, "format": fmt}
+
+    def _early_result(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(upload_id, '.early.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _start_early_analysis(self, upload_id: str, meta: Dict[str, Any], received: int) -> None:
+        early_path = self._path(upload_id, '.early.json')
+        detected = meta.get("detected_format") or self._sniff(upload_id)
+        if detected["type"] not in EARLY_TYPES:
+            self._write_json(early_path, {
+                "status": "unavailable",
+                "reason": "Este formato guarda sus metadatos al final del archivo"
+            })
+            return
+
+        # Copia de la cabecera: el archivo parcial sigue creciendo mientras se analiza
+        ext = os.path.splitext(meta["filename"])[1]
+        head_path = self._path(upload_id, f'.head{ext}')
+        remaining = min(received, EARLY_ANALYSIS_MAX_BYTES)
+        with open(self._path(upload_id, '.part'), 'rb') as src, open(head_path, 'wb') as dst:
+            while remaining > 0:
+                chunk = src.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                dst.write(chunk)
+                remaining -= len(chunk)
+        self._write_json(early_path, {"status": "pending"})
+        self._early_executor.submit(self._early_task, upload_id, meta, head_path, early_path)
+
+    def _early_task(self, upload_id: str, meta: Dict[str, Any], head_path: str, early_path: str) -> None:
+        try:
+            analyzed_bytes = os.path.getsize(head_path)
+            with metrics.STAGE_LATENCY.time(stage="upload_early_analysis"):
+                result = analyze_metadata(head_path)
+            if result.get("status") != "success":
+                early = {"status": "unavailable", "reason": result.get("error", "Cabecera insuficiente")}
+            else:
+                info = result["file_info"]
+                info["filename"] = meta["filename"]
+                info["size_bytes"] = meta["size"]
+                info["size"] = MetadataAnalyzer()._format_size(meta["size"])
+                early = {"status": "ready", "analyzed_bytes": analyzed_bytes, "data": result}
+        except Exception as e:
+            logger.warning(f"Análisis anticipado fallido ({upload_id}): {e}")
+            early = {"status": "unavailable", "reason": str(e)}
+        finally:
+            if os.path.exists(head_path):
+                os.remove(head_path)
+
+        # La subida pudo completarse o cancelarse mientras tanto
+        if os.path.exists(self._path(upload_id, '.json')):
+            self._write_json(early_path, early)
+        metrics.CHUNKED_UPLOADS.inc(event=f"early_{early['status']}")
+
+    def shutdown(self) -> None:
+        self._early_executor.shutdown(wait=False, cancel_futures=True)
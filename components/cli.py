@@ -0,0 +1,402 @@
+"""
+CLI y API de Lotes de CyberTools
+Ejecuta el escáner de puertos, el generador de contraseñas y el analizador de
+metadatos sin pasar por Flask: lee targets, cantidades/frases o rutas desde
+argumentos, archivos o stdin y emite un objeto JSON por línea (JSON Lines) a
+medida que cada elemento termina.
+
+    python cybertools.py scan google.com github.com --ports 22,80,443,8000-8100
+    cat hosts.txt | python cybertools.py scan --tls > scans.jsonl
+    python cybertools.py gen 20 --length 24
+    python cybertools.py gen "Me gusta programar en Python" --no-symbols
+    find /evidencia -type f | python cybertools.py meta --workers 8 --summary
+    python cybertools.py --format msgpack scan --layout columnar -f hosts.txt | gzip > scans.mpk.gz
+    python cybertools.py decode --rows scans.mpk.gz
+    python cybertools.py scan -f hosts.txt -p 1-65535 --shards 8 --rate 20000
+
+Las entradas se consumen de forma perezosa: un stdin infinito o enorme no se
+carga en memoria, solo hay en vuelo tantos elementos como la concurrencia.
+Sin el límite de 16MB del servidor (los archivos se leen desde disco).
+
+Las funciones scan_many, generate_many y analyze_many son la API de
+librería: devuelven los mismos registros que la CLI escribe.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from typing import Dict, List, Any, Optional, Callable, Iterable, Iterator, AsyncIterator, TextIO
+
+from components.scan_website_ports import scan_website_ports_async, PortScanner
+from components.sharded_scan import (
+    ShardedScanner, LocalCoordinator, SocketCoordinator, connect_worker, DEFAULT_RATE
+)
+from components.udp_scan import COMMON_UDP_PORTS
+from components.generate_strong_password import generate_strong_password, analyze_password_strength
+from components.batch_metadata import BatchMetadataAnalyzer, risk_level, summarize_batch
+from components.scan_history import decode_ports
+from components.response_encoding import (
+    serialize, columnar_ports, expand_columnar, decode_records, MSGPACK_AVAILABLE
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCAN_CONCURRENCY = 32
+DEFAULT_PASSWORD_LENGTH = 16
+# Archivos enviados al pool por tanda (por worker)
+ANALYZE_CHUNK_PER_WORKER = 8
+
+
+# --- Entradas ---
+
+def iter_inputs(items: List[str], files: List[str], stdin: TextIO = sys.stdin) -> Iterator[str]:
+    """
+    Elementos de entrada: argumentos, luego una línea por elemento de cada
+    archivo ('-' = stdin). Sin argumentos ni archivos se lee stdin si no es
+    una terminal. Se ignoran líneas vacías y comentarios (#).
+    """
+    yield from items
+    if not items and not files and not stdin.isatty():
+        files = ['-']
+    for path in files:
+        handle = stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            for line in handle:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield line
+        finally:
+            if handle is not stdin:
+                handle.close()
+
+
+def parse_address(value: str) -> tuple:
+    """'host:puerto' -> (host, puerto)"""
+    host, _, port = value.rpartition(':')
+    if not host or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"Dirección inválida: {value} (se espera HOST:PUERTO)")
+    return host, int(port)
+
+
+def _shard_authkey() -> bytes:
+    return os.environ.get('SCAN_SHARD_AUTHKEY', '').encode()
+
+
+def parse_ports(value: str) -> List[int]:
+    """'22,80,8000-8100' -> lista de puertos (tipo de argparse)"""
+    try:
+        ports = decode_ports(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Lista de puertos inválida: {value}")
+    if not ports or any(not 1 <= p <= 65535 for p in ports):
+        raise argparse.ArgumentTypeError("Los puertos deben estar entre 1 y 65535")
+    return list(dict.fromkeys(ports))
+
+
+# --- API de librería ---
+
+async def scan_many(targets: Iterable[str], ports: Optional[List[int]] = None,
+                    protocol: str = "tcp", tls: bool = False,
+                    concurrency: int = DEFAULT_SCAN_CONCURRENCY) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Escanea varios targets a la vez con el escáner asíncrono
+
+    Las conexiones siguen limitadas por SCAN_ASYNC_MAX_CONNECTIONS en todo el
+    proceso; concurrency solo limita cuántos hosts se escanean a la vez.
+
+    Yields:
+        Resultado de cada target (con la clave "target") en orden de finalización
+    """
+    loop = asyncio.get_running_loop()
+    iterator = iter(targets)
+    pending = set()
+    exhausted = False
+
+    async def scan(target: str) -> Dict[str, Any]:
+        return {"target": target, **await scan_website_ports_async(target, ports, protocol=protocol, tls=tls)}
+
+    while pending or not exhausted:
+        while not exhausted and len(pending) < concurrency:
+            # La lectura puede bloquear (stdin): se hace fuera del event loop
+            target = await loop.run_in_executor(None, next, iterator, None)
+            if target is None:
+                exhausted = True
+            else:
+                pending.add(asyncio.ensure_future(scan(target)))
+        if not pending:
+            break
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield task.result()
+
+
+def generate_many(items: Iterable[str], length: int = DEFAULT_PASSWORD_LENGTH,
+                  use_numbers: bool = True, use_symbols: bool = True,
+                  use_uppercase: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Genera contraseñas: un elemento numérico N produce N contraseñas
+    aleatorias; cualquier otro texto se usa como frase (una contraseña)
+    """
+    def build(phrase: Optional[str]) -> Dict[str, Any]:
+        try:
+            password = generate_strong_password(length, phrase=phrase, use_numbers=use_numbers,
+                                                use_symbols=use_symbols, use_uppercase=use_uppercase)
+        except ValueError as e:
+            return {"error": str(e)}
+        return {
+            "password": password,
+            "mode": "phrase" if phrase else "random",
+            "strength": analyze_password_strength(password)
+        }
+
+    for item in items:
+        if item.isdigit():
+            for _ in range(int(item)):
+                yield build(None)
+        else:
+            yield build(item)
+
+
+def expand_paths(paths: Iterable[str]) -> Iterator[str]:
+    """Rutas de archivos; los directorios se recorren recursivamente"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def analyze_many(paths: Iterable[str], workers: Optional[int] = None,
+                 memory_limit_mb: Optional[int] = 1024,
+                 deep: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Analiza metadatos de muchos archivos en el pool de procesos
+
+    Las rutas se envían al pool por tandas para no materializar entradas
+    enormes; dentro de cada tanda los resultados salen en orden de finalización.
+    Con deep=True se analiza también el contenido incrustado de cada archivo.
+    """
+    analyzer = BatchMetadataAnalyzer(max_workers=workers, memory_limit_mb=memory_limit_mb)
+    chunk_size = analyzer.max_workers * ANALYZE_CHUNK_PER_WORKER
+    chunk = []
+    try:
+        for path in expand_paths(paths):
+            if not os.path.isfile(path):
+                yield {"path": path, "risk": "error", "error": "Archivo no encontrado"}
+                continue
+            chunk.append((path, path))
+            if len(chunk) >= chunk_size:
+                yield from _analyze_chunk(analyzer, chunk, deep)
+                chunk = []
+        if chunk:
+            yield from _analyze_chunk(analyzer, chunk, deep)
+    finally:
+        analyzer.shutdown()
+
+
+def _analyze_chunk(analyzer: BatchMetadataAnalyzer, chunk: List[tuple],
+                   deep: bool = False) -> Iterator[Dict[str, Any]]:
+    for path, _, result in analyzer.analyze(chunk, deep):
+        yield {"path": path, "risk": risk_level(result), **result}
+
+
+# --- CLI ---
+
+def _emitter(args: argparse.Namespace, out: TextIO) -> Callable[[Dict[str, Any]], None]:
+    """Escribe cada registro como una línea JSON o como un objeto MessagePack"""
+    if getattr(args, 'format', 'json') == 'msgpack':
+        stream = getattr(out, 'buffer', out)
+
+        def emit(record: Dict[str, Any]) -> None:
+            stream.write(serialize(record, use_msgpack=True)[0])
+            stream.flush()
+    else:
+        def emit(record: Dict[str, Any]) -> None:
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            out.flush()
+    return emit
+
+
+def _cmd_scan(args: argparse.Namespace, out: TextIO) -> int:
+    ports = args.ports
+    if ports is None:
+        ports = COMMON_UDP_PORTS if args.protocol == 'udp' else PortScanner.COMMON_PORTS
+    emit = _emitter(args, out)
+    failures = 0
+
+    if args.shards or args.listen:
+        # Barrido repartido entre procesos (o máquinas): ver sharded_scan.py
+        if args.listen:
+            coordinator = SocketCoordinator(args.listen, args.shards or 1, _shard_authkey())
+        else:
+            coordinator = LocalCoordinator(args.shards)
+        scanner = ShardedScanner(coordinator, rate=args.rate, tls=args.tls)
+        for record in scanner.scan(iter_inputs(args.targets, args.file), ports):
+            failures += "error" in record or record.get("status") == "partial"
+            emit(columnar_ports(record) if args.layout == 'columnar' else record)
+        return 1 if failures else 0
+
+    async def run() -> None:
+        nonlocal failures
+        async for record in scan_many(iter_inputs(args.targets, args.file), ports,
+                                      protocol=args.protocol, tls=args.tls,
+                                      concurrency=args.concurrency):
+            failures += "error" in record
+            emit(columnar_ports(record) if args.layout == 'columnar' else record)
+
+    asyncio.run(run())
+    return 1 if failures else 0
+
+
+def _cmd_scan_worker(args: argparse.Namespace, out: TextIO) -> int:
+    try:
+        connect_worker(args.address, _shard_authkey())
+    except (OSError, multiprocessing.AuthenticationError) as e:
+        print(f"No se pudo conectar al coordinador {args.address[0]}:{args.address[1]}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _cmd_gen(args: argparse.Namespace, out: TextIO) -> int:
+    items = iter_inputs(args.items, args.file) if args.items or args.file or not sys.stdin.isatty() else ['1']
+    emit = _emitter(args, out)
+    failures = 0
+    for record in generate_many(items, length=args.length, use_numbers=not args.no_numbers,
+                                use_symbols=not args.no_symbols, use_uppercase=not args.no_uppercase):
+        failures += "error" in record
+        emit(record)
+    return 1 if failures else 0
+
+
+def _cmd_meta(args: argparse.Namespace, out: TextIO) -> int:
+    emit = _emitter(args, out)
+    results = []
+    failures = 0
+    for record in analyze_many(iter_inputs(args.paths, args.file), workers=args.workers,
+                               memory_limit_mb=args.memory_mb or None, deep=args.deep):
+        failures += record["risk"] == "error"
+        if args.summary:
+            results.append((record["path"], record))
+        emit(record)
+    if args.summary:
+        emit({"summary": summarize_batch(results)})
+    return 1 if failures else 0
+
+
+def _cmd_decode(args: argparse.Namespace, out: TextIO) -> int:
+    paths = args.paths or ['-']
+    for path in paths:
+        if path == '-':
+            body = sys.stdin.buffer.read()
+        else:
+            with open(path, 'rb') as f:
+                body = f.read()
+        for record in decode_records(body):
+            if args.rows and isinstance(record, dict):
+                if isinstance(record.get("data"), dict):
+                    record = dict(record, data=expand_columnar(record["data"]))
+                else:
+                    record = expand_columnar(record)
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+    out.flush()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='cybertools',
+        description="Herramientas de CyberTools en línea de comandos (salida JSON Lines)"
+    )
+    parser.add_argument('-v', '--verbose', action='store_true', help="Mostrar logs en stderr")
+    parser.add_argument('--format', choices=('json', 'msgpack'), default='json',
+                        help="Salida: JSON Lines o secuencia de objetos MessagePack")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    scan = sub.add_parser('scan', help="Escanear puertos de uno o varios hosts")
+    scan.add_argument('targets', nargs='*', help="Hosts o IPs (sin argumentos: stdin)")
+    scan.add_argument('-f', '--file', action='append', default=[], help="Archivo con un target por línea ('-' = stdin)")
+    scan.add_argument('-p', '--ports', type=parse_ports, help="Puertos: 22,80,8000-8100 (por defecto, los comunes)")
+    scan.add_argument('--protocol', choices=('tcp', 'udp'), default='tcp')
+    scan.add_argument('--tls', action='store_true', help="Inspeccionar TLS en los puertos abiertos")
+    scan.add_argument('-c', '--concurrency', type=int, default=DEFAULT_SCAN_CONCURRENCY,
+                      help=f"Hosts escaneados a la vez (por defecto {DEFAULT_SCAN_CONCURRENCY})")
+    scan.add_argument('--layout', choices=('rows', 'columnar'), default='rows',
+                      help="columnar: puertos como arrays port/state/service/rtt_ms")
+    scan.add_argument('--shards', type=int, default=0,
+                      help="Repartir el barrido TCP entre N procesos worker (con --listen: workers remotos)")
+    scan.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                      help=f"Conexiones/s entre todos los workers en modo --shards (0 = sin límite; por defecto {DEFAULT_RATE:.0f})")
+    scan.add_argument('--listen', type=parse_address, metavar='HOST:PUERTO',
+                      help="Coordinar workers remotos (scan-worker) en lugar de procesos locales; "
+                           "requiere SCAN_SHARD_AUTHKEY")
+    scan.set_defaults(handler=_cmd_scan)
+
+    worker = sub.add_parser('scan-worker', help="Worker remoto de un escaneo con --listen")
+    worker.add_argument('address', type=parse_address, metavar='HOST:PUERTO')
+    worker.set_defaults(handler=_cmd_scan_worker)
+
+    gen = sub.add_parser('gen', help="Generar contraseñas")
+    gen.add_argument('items', nargs='*', help="Cantidad de contraseñas aleatorias o frase base")
+    gen.add_argument('-f', '--file', action='append', default=[], help="Archivo con una cantidad o frase por línea ('-' = stdin)")
+    gen.add_argument('-l', '--length', type=int, default=DEFAULT_PASSWORD_LENGTH, help="Longitud (8-64)")
+    gen.add_argument('--no-numbers', action='store_true')
+    gen.add_argument('--no-symbols', action='store_true')
+    gen.add_argument('--no-uppercase', action='store_true')
+    gen.set_defaults(handler=_cmd_gen)
+
+    meta = sub.add_parser('meta', help="Analizar metadatos de archivos")
+    meta.add_argument('paths', nargs='*', help="Archivos o directorios (sin argumentos: stdin)")
+    meta.add_argument('-f', '--file', action='append', default=[], help="Archivo con una ruta por línea ('-' = stdin)")
+    meta.add_argument('-w', '--workers', type=int, default=None, help="Procesos de análisis (por defecto, núcleos)")
+    meta.add_argument('--memory-mb', type=int, default=1024, help="Memoria máxima por worker (0 = sin límite)")
+    meta.add_argument('--deep', action='store_true', help="Analizar también imágenes y adjuntos incrustados (DOCX/XLSX/PDF)")
+    meta.add_argument('--summary', action='store_true', help="Emitir al final una línea con el resumen de riesgo")
+    meta.set_defaults(handler=_cmd_meta)
+
+    decode = sub.add_parser('decode', help="Decodificar respuestas o salidas gzip/zstd/MessagePack a JSON Lines")
+    decode.add_argument('paths', nargs='*', help="Archivos (sin argumentos: stdin)")
+    decode.add_argument('--rows', action='store_true', help="Expandir resultados columnares a open_ports")
+    decode.set_defaults(handler=_cmd_decode)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None, out: TextIO = sys.stdout) -> int:
+    """
+    Punto de entrada de la CLI
+
+    Returns:
+        0 si todo terminó bien, 1 si algún elemento falló, 2 si los argumentos son inválidos
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.format == 'msgpack' and not MSGPACK_AVAILABLE:
+        parser.error("--format msgpack requiere el paquete msgpack")
+    distributed = args.command == 'scan-worker' or getattr(args, 'listen', None)
+    if distributed and not _shard_authkey():
+        parser.error("el modo distribuido requiere la variable SCAN_SHARD_AUTHKEY")
+    if args.command == 'scan' and (args.shards or args.listen) and args.protocol != 'tcp':
+        parser.error("--shards/--listen solo admite --protocol tcp")
+    if not args.verbose:
+        # Los errores ya viajan en cada registro JSON; stderr queda limpio
+        logging.getLogger().setLevel(logging.CRITICAL)
+    try:
+        return args.handler(args, out)
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # El consumidor del pipe (head, jq...) cerró la salida: evitar otro
+        # BrokenPipeError al vaciar stdout durante la salida del intérprete
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""
+Análisis Profundo de Contenido Incrustado
+Lista las imágenes y adjuntos incrustados en documentos y analiza cada uno
+con los mismos analizadores que un archivo suelto (EXIF/GPS de las fotos
+de un .docx, adjuntos de un PDF...), en paralelo.
+
+    - .docx/.xlsx: miembros bajo */media/ y */embeddings/ del ZIP
+    - PDF: XObjects de imagen JPEG/JPEG 2000 (también dentro de Form
+      XObjects) y archivos adjuntos (/EmbeddedFiles y anotaciones
+      /FileAttachment)
+
+Los elementos se leen de a uno y en streaming (el contenido Flate de un
+PDF se descomprime por partes), con un presupuesto común a todo el árbol
+de análisis: cantidad de elementos, bytes extraídos, profundidad de
+anidamiento y tiempo total. Un documento hostil (zip bomb, miles de
+imágenes, adjuntos anidados) se corta al agotar el presupuesto y el
+resultado indica el motivo en "truncated".
+"""
+
+import io
+import os
+import re
+import time
+import zlib
+import shutil
+import logging
+import tempfile
+import threading
+import zipfile
+import concurrent.futures
+from typing import Dict, List, Any, Optional, Callable, Iterator, BinaryIO
+
+logger = logging.getLogger(__name__)
+
+DEEP_SCAN_MAX_ITEMS = int(os.environ.get('DEEP_SCAN_MAX_ITEMS', 64))
+DEEP_SCAN_MAX_BYTES = int(os.environ.get('DEEP_SCAN_MAX_BYTES', 64 * 1024 * 1024))
+DEEP_SCAN_TIMEOUT = float(os.environ.get('DEEP_SCAN_TIMEOUT', 30))
+DEEP_SCAN_WORKERS = int(os.environ.get('DEEP_SCAN_WORKERS', 4))
+# Documento -> adjunto -> adjunto del adjunto
+DEEP_SCAN_MAX_DEPTH = 2
+# Form XObjects anidados que se recorren buscando imágenes
+PDF_MAX_FORM_DEPTH = 8
+COPY_CHUNK_SIZE = 64 * 1024
+
+CONTAINER_FORMATS = {'docx', 'xlsx', 'pdf'}
+OOXML_EMBED_DIRS = ('media', 'embeddings')
+# Filtros finales que dejan un archivo de imagen completo (con su EXIF)
+PDF_IMAGE_FILTERS = {'/DCTDecode': '.jpg', '/JPXDecode': '.jp2'}
+# Advertencia ya agrupada por un nivel anidado: "texto (N incrustados)"
+_GROUPED_WARNING = re.compile(r"^(.*) \((\d+) incrustados\)$")
+
+
+class DeepScanBudget:
+    """Límites compartidos por todo un análisis profundo (entre hilos y niveles)"""
+
+    def __init__(self, max_items: int = DEEP_SCAN_MAX_ITEMS, max_bytes: int = DEEP_SCAN_MAX_BYTES,
+                 timeout: float = DEEP_SCAN_TIMEOUT):
+        self.items_left = max_items
+        self.bytes_left = max_bytes
+        self.deadline = time.monotonic() + timeout
+        self._lock = threading.Lock()
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    def take_item(self) -> bool:
+        with self._lock:
+            if self.items_left <= 0:
+                return False
+            self.items_left -= 1
+            return True
+
+    def take_bytes(self, count: int) -> bool:
+        with self._lock:
+            if count > self.bytes_left:
+                self.bytes_left = 0
+                return False
+            self.bytes_left -= count
+            return True
+
+
+class EmbeddedItem:
+    """Elemento incrustado; open() devuelve un stream que se lee bajo demanda"""
+    __slots__ = ("name", "source", "extension", "open")
+
+    def __init__(self, name: str, source: str, extension: str, open: Callable[[], BinaryIO]):
+        self.name = name
+        self.source = source
+        self.extension = extension
+        self.open = open
+
+
+class _InflateReader(io.RawIOBase):
+    """Descompresión Flate incremental: nunca más de `size` bytes por read()"""
+
+    def __init__(self, data: bytes):
+        self._data = data
+        self._inflater = zlib.decompressobj()
+        self._flushed = False
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = COPY_CHUNK_SIZE) -> bytes:
+        if size is None or size < 0:
+            size = COPY_CHUNK_SIZE
+        if self._data:
+            chunk = self._inflater.decompress(self._data, size)
+            self._data = self._inflater.unconsumed_tail
+            return chunk
+        if self._flushed:
+            return b''
+        # Solo queda lo que zlib tenga en su buffer interno
+        self._flushed = True
+        return self._inflater.flush()
+
+
+# --- Listado de elementos ---
+
+def _iter_ooxml(file_path: str) -> Iterator[EmbeddedItem]:
+    with zipfile.ZipFile(file_path) as archive:
+        for info in archive.infolist():
+            parts = info.filename.replace('\\', '/').split('/')
+            if info.is_dir() or '..' in parts or len(parts) < 3 or parts[1] not in OOXML_EMBED_DIRS:
+                continue
+            source = 'ooxml-media' if parts[1] == 'media' else 'ooxml-embedding'
+            yield EmbeddedItem(info.filename, source, os.path.splitext(info.filename)[1].lower(),
+                               lambda info=info: archive.open(info))
+
+
+def _pdf_filters(stream) -> List[str]:
+    filters = stream.get('/Filter')
+    if filters is None:
+        return []
+    return [str(f) for f in filters] if isinstance(filters, list) else [str(filters)]
+
+
+def _pdf_opener(stream, allowed_final: Optional[set]) -> Optional[Callable[[], BinaryIO]]:
+    """Lector del contenido de un stream PDF, o None si sus filtros no se soportan"""
+    filters = _pdf_filters(stream)
+    inflate = bool(filters) and filters[0] == '/FlateDecode'
+    if inflate:
+        if stream.get('/DecodeParms'):
+            return None  # Predictores PNG/TIFF: no es un archivo, son píxeles
+        filters = filters[1:]
+    # Como mucho un filtro final que deje un archivo completo (JPEG, JPEG 2000)
+    if filters and (allowed_final is None or len(filters) > 1 or filters[0] not in allowed_final):
+        return None
+    raw = stream._data
+    return (lambda: _InflateReader(raw)) if inflate else (lambda: io.BytesIO(raw))
+
+
+def _iter_pdf_images(resources, path: str, seen: set, depth: int) -> Iterator[EmbeddedItem]:
+    xobjects = resources.get('/XObject') if resources else None
+    if not xobjects:
+        return
+    for name, ref in xobjects.items():
+        key = getattr(ref, 'idnum', None)
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        obj = ref.get_object()
+        subtype = obj.get('/Subtype')
+        if subtype == '/Image':
+            filters = _pdf_filters(obj)
+            extension = PDF_IMAGE_FILTERS.get(filters[-1]) if filters else None
+            opener = _pdf_opener(obj, set(PDF_IMAGE_FILTERS)) if extension else None
+            if opener is not None:
+                yield EmbeddedItem(f"{path}{name}", 'pdf-image', extension, opener)
+        elif subtype == '/Form' and depth < PDF_MAX_FORM_DEPTH:
+            yield from _iter_pdf_images(obj.get('/Resources'), f"{path}{name}", seen, depth + 1)
+
+
+def _iter_name_tree(node, depth: int = 0) -> Iterator[tuple]:
+    """Pares (nombre, valor) de un name tree de PDF"""
+    if depth > PDF_MAX_FORM_DEPTH:
+        return
+    node = node.get_object()
+    names = node.get('/Names')
+    if names:
+        for i in range(0, len(names) - 1, 2):
+            yield str(names[i]), names[i + 1].get_object()
+    for kid in node.get('/Kids') or []:
+        yield from _iter_name_tree(kid, depth + 1)
+
+
+def _pdf_attachment(filespec, label: str) -> Optional[EmbeddedItem]:
+    embedded = (filespec.get('/EF') or {}).get('/F')
+    if embedded is None:
+        return None
+    opener = _pdf_opener(embedded.get_object(), None)
+    if opener is None:
+        return None
+    filename = str(filespec.get('/UF') or filespec.get('/F') or label)
+    return EmbeddedItem(filename, 'pdf-attachment', os.path.splitext(filename)[1].lower(), opener)
+
+
+def _iter_pdf(file_path: str) -> Iterator[EmbeddedItem]:
+    import PyPDF2
+
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file, strict=False)
+        if reader.is_encrypted:
+            return
+        seen: set = set()
+        for number, page in enumerate(reader.pages, 1):
+            yield from _iter_pdf_images(page.get('/Resources'), f"page{number}", seen, 0)
+            for annot in page.get('/Annots') or []:
+                annot = annot.get_object()
+                if annot.get('/Subtype') == '/FileAttachment' and annot.get('/FS') is not None:
+                    item = _pdf_attachment(annot['/FS'].get_object(), f"page{number}-attachment")
+                    if item is not None:
+                        yield item
+
+        names = reader.trailer['/Root'].get('/Names')
+        tree = names.get_object().get('/EmbeddedFiles') if names else None
+        if tree is not None:
+            for label, filespec in _iter_name_tree(tree):
+                item = _pdf_attachment(filespec, label)
+                if item is not None:
+                    yield item
+
+
+def iter_embedded(file_path: str, file_format: str) -> Iterator[EmbeddedItem]:
+    """Elementos incrustados de un documento, en orden de aparición"""
+    if file_format == 'pdf':
+        return _iter_pdf(file_path)
+    return _iter_ooxml(file_path)
+
+
+# --- Extracción y análisis ---
+
+def _extract(item: EmbeddedItem, dest: str, budget: DeepScanBudget) -> Optional[int]:
+    """Copia un elemento a disco descontando del presupuesto; None si no alcanza"""
+    written = 0
+    with item.open() as src, open(dest, 'wb') as out:
+        while True:
+            chunk = src.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                return written
+            if not budget.take_bytes(len(chunk)):
+                return None
+            out.write(chunk)
+            written += len(chunk)
+
+
+def scan_embedded(file_path: str, file_format: str, budget: DeepScanBudget,
+                  analyze: Callable[[str], Dict[str, Any]], workers: int = DEEP_SCAN_WORKERS) -> Dict[str, Any]:
+    """
+    Extrae y analiza en paralelo el contenido incrustado de un documento
+
+    Args:
+        analyze: Análisis de un elemento extraído (ruta -> resultado de analyze_file)
+
+    Returns:
+        {"count", "analyzed", "items": [...], "truncated": motivo o None}
+    """
+    items: List[Dict[str, Any]] = []
+    futures: Dict[concurrent.futures.Future, Dict[str, Any]] = {}
+    truncated = None
+    tmp_dir = tempfile.mkdtemp(prefix='deep_')
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers),
+                                                 thread_name_prefix='deep-scan')
+    try:
+        try:
+            # Extracción secuencial (un solo lector del documento) y análisis
+            # en el pool a medida que cada elemento queda en disco
+            for index, item in enumerate(iter_embedded(file_path, file_format)):
+                if budget.expired:
+                    truncated = "timeout"
+                    break
+                if not budget.take_item():
+                    truncated = "max_items"
+                    break
+                entry = {"name": item.name, "source": item.source}
+                items.append(entry)
+                dest = os.path.join(tmp_dir, f"{index:04d}{item.extension[:8]}")
+                try:
+                    size = _extract(item, dest, budget)
+                except (OSError, zlib.error, zipfile.BadZipFile) as e:
+                    entry["error"] = f"No se pudo extraer: {e}"
+                    continue
+                if size is None:
+                    entry["error"] = "Límite de bytes extraídos alcanzado"
+                    truncated = "max_bytes"
+                    break
+                entry["size"] = size
+                futures[pool.submit(analyze, dest)] = entry
+        except Exception as e:
+            # Documento corrupto a mitad: se conserva lo ya extraído
+            logger.warning(f"Error listando contenido incrustado de {file_path}: {e}")
+            truncated = truncated or "parse_error"
+
+        remaining = max(0.0, budget.deadline - time.monotonic())
+        done, not_done = concurrent.futures.wait(futures, timeout=remaining)
+        for future in done:
+            entry = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                entry["error"] = str(e)
+                continue
+            if "error" in result and result.get("status") != "success":
+                entry["error"] = result["error"]
+                continue
+            entry["file_type"] = result.get("file_type")
+            entry["format"] = result.get("file_info", {}).get("detected_format")
+            entry["metadata"] = result.get("metadata")
+            entry["warnings"] = result.get("warnings", [])
+        for future in not_done:
+            future.cancel()
+            futures[future]["error"] = "Tiempo de análisis agotado"
+            truncated = truncated or "timeout"
+    finally:
+        # Los análisis que sigan corriendo terminan solos (archivos acotados)
+        pool.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return {
+        "count": len(items),
+        "analyzed": sum(1 for entry in items if "warnings" in entry),
+        "items": items,
+        "truncated": truncated
+    }
+
+
+def embedded_warnings(embedded: Dict[str, Any]) -> List[str]:
+    """
+    Advertencias del contenido incrustado para el documento que lo contiene
+
+    Las críticas (p. ej. GPS de una foto) se listan por elemento; el resto se
+    agrupan con la cantidad de elementos afectados.
+    """
+    critical = []
+    grouped: Dict[str, int] = {}
+    for entry in embedded["items"]:
+        for warning in entry.get("warnings", []):
+            if warning.startswith("✅"):
+                continue
+            if warning.startswith("🚨"):
+                critical.append(f"🚨 [{entry['name']}] {warning[1:].strip()}")
+                continue
+            match = _GROUPED_WARNING.match(warning)
+            text, count = (match.group(1), int(match.group(2))) if match else (warning, 1)
+            grouped[text] = grouped.get(text, 0) + count
+    warnings = critical + [f"{warning} ({count} incrustados)" for warning, count in grouped.items()]
+    if embedded.get("truncated"):
+        warnings.append(f"ℹ️ Análisis de contenido incrustado incompleto ({embedded['truncated']})")
+    return warnings
@@ -0,0 +1,188 @@
+"""
+Detección de Tipo de Archivo por Firma (magic bytes)
+Identifica el formato real de un archivo a partir de sus primeros bytes,
+sin confiar en la extensión
+"""
+
+import struct
+import zipfile
+from typing import Dict, List, Tuple, Optional
+
+from components.ole2 import OleFile, OleError, OLE2_SIGNATURE
+
+# Bytes leídos para identificar el formato
+SNIFF_SIZE = 1024
+
+# Tabla de firmas: (prefijo, tipo de análisis, formato)
+SIGNATURES: List[Tuple[bytes, str, str]] = [
+    (b'%PDF-', 'pdf', 'pdf'),
+    (b'PK\x03\x04', 'archive', 'zip'),
+    (b'PK\x05\x06', 'archive', 'zip'),
+    (OLE2_SIGNATURE, 'ole2', 'ole2'),
+    (b'\xFF\xD8\xFF', 'image', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image', 'png'),
+    (b'GIF87a', 'image', 'gif'),
+    (b'GIF89a', 'image', 'gif'),
+    (b'II*\x00', 'image', 'tiff'),
+    (b'MM\x00*', 'image', 'tiff'),
+    (b'RIFF', 'riff', 'riff'),
+    (b'BM', 'image', 'bmp'),
+]
+
+# Índice precalculado por primer byte: cada archivo solo se compara
+# contra las firmas que comparten su primer byte (más largas primero)
+_PREFIX_TABLE: Dict[int, List[Tuple[bytes, str, str]]] = {}
+for _sig in sorted(SIGNATURES, key=lambda s: -len(s[0])):
+    _PREFIX_TABLE.setdefault(_sig[0][0], []).append(_sig)
+
+# Formatos que sniff_file puede devolver para cada tipo de análisis
+TYPE_FORMATS: Dict[str, set] = {
+    'pdf': {'pdf'}, 'image': {'jpeg', 'png', 'gif', 'tiff', 'webp', 'bmp'},
+    'word': {'docx', 'doc'}, 'excel': {'xlsx', 'xls'}, 'text': {'text'}, 'archive': {'zip'},
+}
+
+# Firmas registradas por analizadores externos: (offset, prefijo, tipo, formato).
+# Se comprueban antes que las propias (ver analyzer_registry.register)
+_PLUGIN_SIGNATURES: List[Tuple[int, bytes, str, str]] = []
+_plugins_loaded = False
+
+# Formatos identificados -> extensión canónica
+FORMAT_EXTENSIONS = {
+    'pdf': '.pdf', 'docx': '.docx', 'xlsx': '.xlsx', 'doc': '.doc', 'xls': '.xls',
+    'jpeg': '.jpg', 'png': '.png', 'gif': '.gif', 'tiff': '.tiff', 'webp': '.webp',
+    'bmp': '.bmp', 'zip': '.zip', 'text': '.txt'
+}
+
+
+def register_signature(offset: int, prefix: bytes, file_type: str, fmt: str) -> None:
+    """Añade la firma de un formato nuevo (prefix en la posición offset)"""
+    if offset < 0 or not prefix or offset + len(prefix) > SNIFF_SIZE:
+        raise ValueError(f"Firma inválida para {fmt}: debe caber en los primeros {SNIFF_SIZE} bytes")
+    _PLUGIN_SIGNATURES.append((offset, prefix, file_type, fmt))
+    TYPE_FORMATS.setdefault(file_type, set()).add(fmt)
+    FORMAT_EXTENSIONS.setdefault(fmt, f".{fmt}")
+
+
+def _load_plugins() -> None:
+    # Los entry points registran sus firmas al cargarse; el registro importa
+    # este módulo, así que se importa aquí y una sola vez
+    global _plugins_loaded
+    if not _plugins_loaded:
+        _plugins_loaded = True
+        from components.analyzer_registry import registry
+        registry.load_plugins()
+
+
+def formats_of_type(file_type: str) -> set:
+    """Formatos detectables de un tipo de análisis"""
+    _load_plugins()
+    return set(TYPE_FORMATS.get(file_type, ()))
+
+
+def sniff_bytes(head: bytes) -> Tuple[str, str]:
+    """
+    Identifica el formato a partir de los primeros bytes
+
+    Returns:
+        Tupla (tipo de análisis, formato). Los contenedores ZIP/OLE2
+        devuelven 'archive'/'ole2' y se refinan con sniff_file.
+    """
+    if not head:
+        return 'unknown', 'empty'
+
+    _load_plugins()
+    for offset, prefix, file_type, fmt in _PLUGIN_SIGNATURES:
+        if head.startswith(prefix, offset):
+            return file_type, fmt
+
+    for prefix, file_type, fmt in _PREFIX_TABLE.get(head[0], ()):
+        if head.startswith(prefix):
+            if fmt == 'riff':
+                if head[8:12] == b'WEBP':
+                    return 'image', 'webp'
+                return 'unknown', 'riff'
+            if fmt == 'bmp' and not _is_bmp(head):
+                continue
+            return file_type, fmt
+
+    # El encabezado PDF puede ir precedido de basura (hasta 1024 bytes)
+    if b'%PDF-' in head[:SNIFF_SIZE]:
+        return 'pdf', 'pdf'
+
+    if _looks_like_text(head):
+        return 'text', 'text'
+
+    return 'unknown', 'unknown'
+
+
+def _is_bmp(head: bytes) -> bool:
+    # 'BM' es un prefijo corto: validar el tamaño del encabezado DIB
+    if len(head) < 18:
+        return False
+    dib_size = int.from_bytes(head[14:18], 'little')
+    return dib_size in (12, 40, 52, 56, 64, 108, 124)
+
+
+def _looks_like_text(head: bytes) -> bool:
+    if b'\x00' in head:
+        return False
+    try:
+        head.decode('utf-8')
+        return True
+    except UnicodeDecodeError as e:
+        # Un carácter multibyte cortado al final del bloque sigue siendo texto
+        return e.start >= len(head) - 3
+
+
+def sniff_file(file_path: str) -> Tuple[str, str]:
+    """
+    Identifica el formato real de un archivo en disco
+
+    Refina los contenedores: ZIP -> docx/xlsx y OLE2 -> doc/xls.
+
+    Returns:
+        Tupla (tipo de análisis, formato)
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_SIZE)
+
+    file_type, fmt = sniff_bytes(head)
+
+    if file_type == 'archive':
+        return _refine_zip(file_path)
+    if file_type == 'ole2':
+        return _refine_ole2(file_path)
+    return file_type, fmt
+
+
+def _refine_zip(file_path: str) -> Tuple[str, str]:
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            names = archive.namelist()
+    except (zipfile.BadZipFile, OSError):
+        return 'unknown', 'zip'
+
+    if '[Content_Types].xml' in names:
+        if any(n.startswith('word/') for n in names):
+            return 'word', 'docx'
+        if any(n.startswith('xl/') for n in names):
+            return 'excel', 'xlsx'
+    return 'archive', 'zip'
+
+
+def _refine_ole2(file_path: str) -> Tuple[str, str]:
+    try:
+        with open(file_path, 'rb') as f:
+            ole = OleFile(f)
+            if ole.exists('WordDocument'):
+                return 'word', 'doc'
+            if ole.exists('Workbook') or ole.exists('Book'):
+                return 'excel', 'xls'
+    except (OleError, OSError, ValueError, struct.error):
+        pass
+    return 'unknown', 'ole2'
+
+
+def extension_for(fmt: str) -> Optional[str]:
+    """Extensión canónica de un formato detectado"""
+    return FORMAT_EXTENSIONS.get(fmt)
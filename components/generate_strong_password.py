@@ -223,22 +223,8 @@ def analyze_password_strength(password: str) -> Dict[str, any]:
     }
 
 
-# Ejemplos de uso
+# python -m components.generate_strong_password ... equivale a: python cybertools.py gen ...
 if __name__ == "__main__":
-    print("=== Contraseñas Aleatorias ===")
-    print("Completa:", generate_strong_password(16))
-    print("Sin símbolos:", generate_strong_password(16, use_symbols=False))
-    print("Solo minúsculas y números:", generate_strong_password(12, use_uppercase=False, use_symbols=False))
-    
-    print("\n=== Contraseñas Basadas en Frases ===")
-    phrase1 = "Me gusta programar en Python todos los dias"
-    pwd1 = generate_strong_password(20, phrase=phrase1)
-    print(f"Frase: '{phrase1}'")
-    print(f"Contraseña: {pwd1}")
-    print(f"Análisis: {analyze_password_strength(pwd1)}")
-    
-    phrase2 = "La seguridad es importante"
-    pwd2 = generate_strong_password(16, phrase=phrase2, use_symbols=False)
-    print(f"\nFrase: '{phrase2}'")
-    print(f"Contraseña: {pwd2}")
-    print(f"Análisis: {analyze_password_strength(pwd2)}")
+    import sys
+    from components.cli import main
+    sys.exit(main(["gen", *sys.argv[1:]]))
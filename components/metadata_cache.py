@@ -0,0 +1,195 @@
+"""
+Caché de resultados del Analizador de Metadatos
+Indexa los resultados por el hash del contenido subido (BLAKE2b), calculado
+mientras el archivo se recibe, con un nivel LRU en memoria y un nivel
+opcional en disco con límite de tamaño.
+"""
+
+import os
+import json
+import copy
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, BinaryIO
+
+from components import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tamaño de bloque para leer el upload en streaming
+CHUNK_SIZE = 64 * 1024
+
+
+def new_hasher():
+    """Crea el hasher usado como clave de caché (BLAKE2b de 256 bits)"""
+    return hashlib.blake2b(digest_size=32)
+
+
+def save_stream_hashed(stream: BinaryIO, dest_path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Copia un stream a disco calculando su hash al mismo tiempo
+
+    Args:
+        stream: Stream binario de entrada (p. ej. FileStorage.stream)
+        dest_path: Ruta de destino
+        chunk_size: Tamaño de bloque de lectura
+
+    Returns:
+        Hash hexadecimal del contenido
+    """
+    hasher = new_hasher()
+    with open(dest_path, 'wb') as out:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            out.write(chunk)
+    return hasher.hexdigest()
+
+
+class MetadataCache:
+    """Caché LRU en memoria con nivel opcional en disco"""
+
+    def __init__(self, max_entries: int = 256, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            max_entries: Máximo de resultados en memoria
+            disk_dir: Carpeta del nivel en disco (None = deshabilitado)
+            disk_max_bytes: Tamaño máximo del nivel en disco
+        """
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Busca un resultado (memoria primero, luego disco)"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                metrics.CACHE_HITS.inc()
+                return copy.deepcopy(self._memory[key])
+
+        result = self._disk_get(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                metrics.CACHE_MISSES.inc()
+                return None
+            self.hits += 1
+            metrics.CACHE_HITS.inc()
+            self._memory_put(key, result)
+        return copy.deepcopy(result)
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Guarda un resultado en ambos niveles"""
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._memory_put(key, result)
+        self._disk_put(key, result)
+
+    def clear(self) -> None:
+        """Vacía el nivel en memoria (el de disco se conserva)"""
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso de la caché"""
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_enabled": bool(self.disk_dir)
+            }
+
+    def _memory_put(self, key: str, result: Dict[str, Any]) -> None:
+        # Se llama con el lock tomado
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            # Actualizar mtime para que la poda sea LRU
+            os.utime(path, None)
+            return result
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Entrada de caché corrupta {key}: {e}")
+            return None
+
+    def _disk_put(self, key: str, result: Dict[str, Any]) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._disk_prune()
+        except Exception as e:
+            logger.warning(f"No se pudo escribir la caché en disco: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _disk_prune(self) -> None:
+        """Elimina las entradas menos usadas hasta respetar disk_max_bytes"""
+        entries = []
+        total = 0
+        with os.scandir(self.disk_dir) as it:
+            for entry in it:
+                if not entry.name.endswith('.json'):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total <= self.disk_max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+def cache_key(digest: str, extension: str, deep: bool = False) -> str:
+    """
+    Construye la clave de caché
+
+    La extensión forma parte de la clave porque influye en el resultado
+    (tipo MIME y aviso de extensión que no coincide con el contenido).
+    El análisis profundo (contenido incrustado) se guarda aparte.
+    """
+    key = f"{digest}{extension.lower().replace('.', '_')}"
+    return f"{key}_deep" if deep else key
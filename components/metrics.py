@@ -0,0 +1,281 @@
+"""
+Métricas en Proceso (formato de exposición de Prometheus)
+Contadores, gauges e histogramas con etiquetas, pensados para el camino
+caliente: cada observación es un bisect y una suma bajo un lock por métrica.
+
+Las métricas son por proceso: con varios workers de gunicorn cada uno expone
+las suyas (Prometheus las agrega por instancia).
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Optional, Callable, Iterator
+
+# Buckets por defecto (segundos): de 1ms a 30s
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base común: nombre, ayuda, etiquetas y lock"""
+
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: se esperaban las etiquetas {self.labelnames}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} {self.metric_type}"]
+
+
+class Counter(_Metric):
+    """Contador monótono"""
+
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        # Las métricas sin etiquetas se exponen desde 0
+        self._values: Dict[Tuple[str, ...], float] = {} if labelnames else {(): 0}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        lines = self.header()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Valor que sube y baja; opcionalmente calculado al recolectar"""
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {} if labelnames else {(): 0}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float], **labels) -> None:
+        """Calcula el valor en cada recolección (p. ej. tamaño de una cola)"""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def value(self, **labels) -> float:
+        key = self._key(labels)
+        if key in self._functions:
+            return self._functions[key]()
+        return self._values.get(key, 0)
+
+    @contextmanager
+    def track_inprogress(self, **labels) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = dict(self._values)
+            functions = list(self._functions.items())
+        for key, function in functions:
+            try:
+                items[key] = function()
+            except Exception:
+                continue
+        lines = self.header()
+        for key, value in items.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Histograma de buckets fijos"""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # clave -> [conteos por bucket (+Inf al final), suma, total]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Mide la duración de un bloque"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels) -> Optional[Dict[str, float]]:
+        entry = self._values.get(self._key(labels))
+        if entry is None:
+            return None
+        return {"count": entry[2], "sum": entry[1]}
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas expuestas en /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                return self._metrics[metric.name]
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def exposition(self) -> str:
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)"""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+# Registro global y métricas de la aplicación
+REGISTRY = MetricsRegistry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'cybertools_http_request_duration_seconds', 'Latencia de las peticiones HTTP por ruta',
+    ('method', 'route', 'status'))
+STAGE_LATENCY = REGISTRY.histogram(
+    'cybertools_stage_duration_seconds',
+    'Duración por etapa (dns_resolve, connect_sweep, upload_receive, generate_password...)',
+    ('stage',))
+PARSER_LATENCY = REGISTRY.histogram(
+    'cybertools_parser_duration_seconds', 'Duración de cada analizador de metadatos',
+    ('parser',))
+
+CACHE_HITS = REGISTRY.counter(
+    'cybertools_metadata_cache_hits_total', 'Aciertos de la caché de análisis de metadatos')
+CACHE_MISSES = REGISTRY.counter(
+    'cybertools_metadata_cache_misses_total', 'Fallos de la caché de análisis de metadatos')
+SCAN_TIMEOUTS = REGISTRY.counter(
+    'cybertools_scan_timeouts_total', 'Puertos cuyo resultado no llegó antes del timeout global')
+OPEN_PORTS_FOUND = REGISTRY.counter(
+    'cybertools_open_ports_found_total', 'Puertos abiertos encontrados')
+PORTS_SCANNED = REGISTRY.counter(
+    'cybertools_ports_scanned_total', 'Puertos sondeados')
+
+SCANS_IN_FLIGHT = REGISTRY.gauge(
+    'cybertools_scans_in_flight', 'Escaneos de puertos en curso')
+EXECUTOR_QUEUE_DEPTH = REGISTRY.gauge(
+    'cybertools_executor_queue_depth', 'Tareas enviadas a un executor que aún no terminaron',
+    ('executor',))
+
+SCHEDULED_SCANS = REGISTRY.counter(
+    'cybertools_scheduled_scans_total', 'Ejecuciones de escaneos recurrentes por resultado',
+    ('result',))
+SCHEDULER_PORTS_PROBED = REGISTRY.counter(
+    'cybertools_scheduler_ports_probed_total', 'Puertos sondeados por el planificador')
+SCHEDULER_PORTS_SKIPPED = REGISTRY.counter(
+    'cybertools_scheduler_ports_skipped_total',
+    'Puertos cerrados que el planificador no re-sondeó en esa ejecución (re-escaneo incremental)')
+SCAN_CHANGE_EVENTS = REGISTRY.counter(
+    'cybertools_scan_change_events_total', 'Eventos de cambio emitidos por tipo', ('kind',))
+TLS_HANDSHAKES = REGISTRY.counter(
+    'cybertools_tls_handshakes_total', 'Inspecciones TLS por resultado (ok, cached, no_tls, failed)',
+    ('result',))
+CHUNKED_UPLOADS = REGISTRY.counter(
+    'cybertools_chunked_uploads_total',
+    'Eventos de subidas por partes (created, completed, aborted, expired, early_ready...)', ('event',))
+CHUNKED_UPLOAD_BYTES = REGISTRY.counter(
+    'cybertools_chunked_upload_bytes_total', 'Bytes recibidos en subidas por partes')
+SCAN_SHARDS = REGISTRY.counter(
+    'cybertools_scan_shards_total',
+    'Shards del escaneo distribuido por evento (dispatched, completed, retried, failed)', ('event',))
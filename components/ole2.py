@@ -0,0 +1,336 @@
+"""
+Lector mínimo de archivos OLE2 (Compound File Binary)
+Permite leer los streams de documentos .doc/.xls heredados y decodificar
+sus propiedades (SummaryInformation / DocumentSummaryInformation)
+sin dependencias externas
+"""
+
+import struct
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, BinaryIO
+
+OLE2_SIGNATURE = b'\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1'
+
+# Valores especiales de la FAT
+FREESECT = 0xFFFFFFFF
+ENDOFCHAIN = 0xFFFFFFFE
+FATSECT = 0xFFFFFFFD
+DIFSECT = 0xFFFFFFFC
+NOSTREAM = 0xFFFFFFFF
+
+# Tipos de entrada de directorio
+STGTY_STORAGE = 1
+STGTY_STREAM = 2
+STGTY_ROOT = 5
+
+# Identificadores de propiedades (MS-OLEPS)
+SUMMARY_PROPERTIES = {
+    2: "title", 3: "subject", 4: "author", 5: "keywords", 6: "comments",
+    7: "template", 8: "last_modified_by", 9: "revision", 11: "last_printed",
+    12: "created", 13: "modified", 14: "page_count", 15: "word_count",
+    16: "char_count", 18: "application", 19: "security"
+}
+
+DOC_SUMMARY_PROPERTIES = {
+    2: "category", 14: "manager", 15: "company"
+}
+
+# Tipos VARIANT usados en propiedades
+VT_I2 = 2
+VT_I4 = 3
+VT_BOOL = 11
+VT_UI4 = 19
+VT_LPSTR = 30
+VT_LPWSTR = 31
+VT_FILETIME = 64
+
+FILETIME_EPOCH = datetime(1601, 1, 1)
+
+
+class OleError(Exception):
+    """Archivo OLE2 inválido o corrupto"""
+
+
+class OleFile:
+    """Lector de solo lectura de un contenedor OLE2"""
+
+    def __init__(self, fp: BinaryIO):
+        self.fp = fp
+        header = fp.read(512)
+        if len(header) < 512 or header[:8] != OLE2_SIGNATURE:
+            raise OleError("No es un archivo OLE2")
+
+        self.sector_size = 1 << struct.unpack_from('<H', header, 0x1E)[0]
+        self.mini_sector_size = 1 << struct.unpack_from('<H', header, 0x20)[0]
+        if self.sector_size not in (512, 4096):
+            raise OleError("Tamaño de sector inválido")
+
+        # Una cadena válida no puede tener más sectores que el archivo
+        fp.seek(0, 2)
+        self._max_sectors = fp.tell() // self.sector_size + 1
+
+        (num_fat, first_dir, _, self.mini_cutoff, first_minifat, num_minifat,
+         first_difat, num_difat) = struct.unpack_from('<IIIIIIII', header, 0x2C)
+
+        self._fat = self._load_fat(header, num_fat, first_difat, num_difat)
+        self.entries = self._load_directory(first_dir)
+        if not self.entries or self.entries[0]["type"] != STGTY_ROOT:
+            raise OleError("Directorio raíz no encontrado")
+
+        root = self.entries[0]
+        self._minifat = self._read_fat_chain_ints(first_minifat) if num_minifat else []
+        self._mini_stream_start = root["start"]
+        self._mini_stream_size = root["size"]
+        self._mini_stream: Optional[bytes] = None
+
+    # ---- Lectura de sectores -------------------------------------------------
+
+    def _read_sector(self, sector: int) -> bytes:
+        self.fp.seek((sector + 1) * self.sector_size)
+        return self.fp.read(self.sector_size)
+
+    def _read_full_sector(self, sector: int) -> bytes:
+        data = self._read_sector(sector)
+        if len(data) < self.sector_size:
+            raise OleError("Sector truncado")
+        return data
+
+    def _chain(self, start: int, fat: List[int], max_length: Optional[int] = None) -> List[int]:
+        max_length = max_length or self._max_sectors
+        chain = []
+        visited = set()
+        sector = start
+        while sector not in (ENDOFCHAIN, FREESECT):
+            if sector >= len(fat):
+                raise OleError("Cadena de sectores fuera de rango")
+            if sector in visited:
+                raise OleError("Cadena de sectores con ciclo")
+            if len(chain) >= max_length:
+                raise OleError("Cadena de sectores más larga que el archivo")
+            visited.add(sector)
+            chain.append(sector)
+            sector = fat[sector]
+        return chain
+
+    def _load_fat(self, header: bytes, num_fat: int, first_difat: int, num_difat: int) -> List[int]:
+        difat = list(struct.unpack_from('<109I', header, 0x4C))
+        sector = first_difat
+        per_sector = self.sector_size // 4 - 1
+        visited = set()
+        for _ in range(min(num_difat, self._max_sectors)):
+            if sector in (ENDOFCHAIN, FREESECT):
+                break
+            if sector in visited:
+                raise OleError("Cadena DIFAT con ciclo")
+            visited.add(sector)
+            data = self._read_full_sector(sector)
+            values = struct.unpack(f'<{per_sector + 1}I', data)
+            difat.extend(values[:per_sector])
+            sector = values[per_sector]
+
+        fat: List[int] = []
+        for fat_sector in difat[:num_fat]:
+            if fat_sector in (FREESECT, ENDOFCHAIN):
+                continue
+            data = self._read_full_sector(fat_sector)
+            fat.extend(struct.unpack(f'<{len(data) // 4}I', data[:len(data) // 4 * 4]))
+        return fat
+
+    def _read_fat_chain_ints(self, start: int) -> List[int]:
+        data = b''.join(self._read_sector(s) for s in self._chain(start, self._fat))
+        return list(struct.unpack(f'<{len(data) // 4}I', data))
+
+    def _load_directory(self, first_dir: int) -> List[Dict[str, Any]]:
+        entries = []
+        for sector in self._chain(first_dir, self._fat):
+            data = self._read_sector(sector)
+            for offset in range(0, len(data), 128):
+                raw = data[offset:offset + 128]
+                if len(raw) < 128:
+                    break
+                name_len = struct.unpack_from('<H', raw, 64)[0]
+                name = raw[:max(0, min(name_len, 64) - 2)].decode('utf-16-le', errors='ignore')
+                entries.append({
+                    "name": name,
+                    "type": raw[66],
+                    "start": struct.unpack_from('<I', raw, 116)[0],
+                    "size": struct.unpack_from('<I', raw, 120)[0],
+                })
+        return entries
+
+    # ---- API pública ---------------------------------------------------------
+
+    def list_streams(self) -> List[str]:
+        """Nombres de todos los streams del contenedor"""
+        return [e["name"] for e in self.entries if e["type"] == STGTY_STREAM]
+
+    def exists(self, name: str) -> bool:
+        return self._find(name) is not None
+
+    def _find(self, name: str) -> Optional[Dict[str, Any]]:
+        lowered = name.lower()
+        for entry in self.entries:
+            if entry["type"] == STGTY_STREAM and entry["name"].lower() == lowered:
+                return entry
+        return None
+
+    def read_stream(self, name: str, max_bytes: Optional[int] = None) -> bytes:
+        """
+        Lee un stream por nombre
+
+        Args:
+            name: Nombre del stream (p. ej. '\\x05SummaryInformation')
+            max_bytes: Leer como máximo esta cantidad de bytes
+        """
+        entry = self._find(name)
+        if entry is None:
+            raise OleError(f"Stream no encontrado: {name!r}")
+
+        size = entry["size"]
+        limit = size if max_bytes is None else min(size, max_bytes)
+
+        if size < self.mini_cutoff:
+            return self._read_mini(entry["start"], limit)
+
+        parts = []
+        read = 0
+        for sector in self._chain(entry["start"], self._fat):
+            if read >= limit:
+                break
+            data = self._read_sector(sector)
+            parts.append(data)
+            read += len(data)
+        return b''.join(parts)[:limit]
+
+    def _read_mini(self, start: int, size: int) -> bytes:
+        if self._mini_stream is None:
+            parts = [self._read_sector(s) for s in self._chain(self._mini_stream_start, self._fat)]
+            self._mini_stream = b''.join(parts)[:self._mini_stream_size]
+
+        parts = []
+        mini_per_sector = self.sector_size // self.mini_sector_size
+        for sector in self._chain(start, self._minifat, self._max_sectors * mini_per_sector):
+            offset = sector * self.mini_sector_size
+            parts.append(self._mini_stream[offset:offset + self.mini_sector_size])
+            if len(parts) * self.mini_sector_size >= size:
+                break
+        return b''.join(parts)[:size]
+
+
+def _filetime_to_str(value: int) -> Optional[str]:
+    if not value:
+        return None
+    try:
+        return str(FILETIME_EPOCH + timedelta(microseconds=value // 10))
+    except OverflowError:
+        return None
+
+
+def parse_property_set(data: bytes, names: Dict[int, str]) -> Dict[str, Any]:
+    """
+    Decodifica la primera sección de un property set (MS-OLEPS)
+
+    Args:
+        data: Contenido del stream
+        names: Mapa de identificador de propiedad -> nombre
+
+    Returns:
+        Diccionario nombre -> valor con las propiedades reconocidas
+    """
+    if len(data) < 48 or data[:2] != b'\xFE\xFF':
+        return {}
+
+    section_offset = struct.unpack_from('<I', data, 44)[0]
+    if section_offset + 8 > len(data):
+        return {}
+
+    _, count = struct.unpack_from('<II', data, section_offset)
+    codepage = 'cp1252'
+    raw_props = []
+    for i in range(min(count, 256)):
+        pos = section_offset + 8 + i * 8
+        if pos + 8 > len(data):
+            break
+        prop_id, prop_offset = struct.unpack_from('<II', data, pos)
+        raw_props.append((prop_id, section_offset + prop_offset))
+
+    # La página de códigos (PID 1) define cómo decodificar VT_LPSTR
+    for prop_id, offset in raw_props:
+        if prop_id == 1 and offset + 6 <= len(data):
+            cp = struct.unpack_from('<H', data, offset + 4)[0]
+            codepage = 'utf-8' if cp == 65001 else f'cp{cp}'
+
+    result = {}
+    for prop_id, offset in raw_props:
+        if prop_id not in names or offset + 4 > len(data):
+            continue
+        try:
+            value = _read_property(data, offset, codepage)
+        except (struct.error, LookupError, UnicodeDecodeError):
+            continue
+        if value not in (None, ''):
+            result[names[prop_id]] = value
+    return result
+
+
+def _read_property(data: bytes, offset: int, codepage: str) -> Any:
+    vtype = struct.unpack_from('<H', data, offset)[0]
+    pos = offset + 4
+
+    if vtype == VT_I2:
+        return struct.unpack_from('<h', data, pos)[0]
+    if vtype in (VT_I4, VT_UI4):
+        return struct.unpack_from('<i' if vtype == VT_I4 else '<I', data, pos)[0]
+    if vtype == VT_BOOL:
+        return struct.unpack_from('<h', data, pos)[0] != 0
+    if vtype == VT_LPSTR:
+        length = struct.unpack_from('<I', data, pos)[0]
+        raw = data[pos + 4:pos + 4 + length]
+        try:
+            text = raw.decode(codepage, errors='ignore')
+        except LookupError:
+            text = raw.decode('cp1252', errors='ignore')
+        return text.rstrip('\x00').strip()
+    if vtype == VT_LPWSTR:
+        length = struct.unpack_from('<I', data, pos)[0]
+        raw = data[pos + 4:pos + 4 + length * 2]
+        return raw.decode('utf-16-le', errors='ignore').rstrip('\x00').strip()
+    if vtype == VT_FILETIME:
+        return _filetime_to_str(struct.unpack_from('<Q', data, pos)[0])
+    return None
+
+
+def read_summary(ole: OleFile) -> Dict[str, Any]:
+    """Combina SummaryInformation y DocumentSummaryInformation"""
+    props: Dict[str, Any] = {}
+    for stream, names in (("\x05SummaryInformation", SUMMARY_PROPERTIES),
+                          ("\x05DocumentSummaryInformation", DOC_SUMMARY_PROPERTIES)):
+        if ole.exists(stream):
+            props.update(parse_property_set(ole.read_stream(stream, max_bytes=1024 * 1024), names))
+    return props
+
+
+def read_xls_sheet_names(ole: OleFile, max_bytes: int = 4 * 1024 * 1024) -> List[str]:
+    """
+    Extrae los nombres de hoja del stream Workbook (BIFF8)
+
+    Solo recorre el substream global (registros BOUNDSHEET) hasta el
+    primer EOF, sin leer el contenido de las hojas.
+    """
+    name = "Workbook" if ole.exists("Workbook") else "Book"
+    data = ole.read_stream(name, max_bytes=max_bytes)
+    sheets = []
+    pos = 0
+    while pos + 4 <= len(data):
+        rec_type, rec_len = struct.unpack_from('<HH', data, pos)
+        body = data[pos + 4:pos + 4 + rec_len]
+        pos += 4 + rec_len
+
+        if rec_type == 0x000A:  # EOF del substream global
+            break
+        if rec_type == 0x0085 and len(body) >= 8:  # BOUNDSHEET
+            cch = body[6]
+            high_byte = body[7] & 0x01
+            raw = body[8:8 + cch * (2 if high_byte else 1)]
+            sheets.append(raw.decode('utf-16-le' if high_byte else 'latin-1', errors='ignore'))
+    return sheets
@@ -0,0 +1,195 @@
+"""
+Perfilado Opcional por Petición
+Captura un perfil (muestreo de pilas o cProfile) de una sola petición cuando
+se activa con el token de administración, y guarda los más recientes en un
+buffer circular descargable en formato "collapsed stacks" (compatible con
+flamegraph.pl, speedscope e inferno).
+
+Sin token configurado el perfilado queda deshabilitado y el costo por
+petición es una comprobación de configuración.
+"""
+
+import os
+import sys
+import time
+import uuid
+import hmac
+import pstats
+import cProfile
+import threading
+from io import StringIO
+from collections import deque, Counter
+from typing import Dict, List, Any, Optional
+
+# Modos de perfilado disponibles
+MODE_SAMPLING = 'sampling'          # Solo el hilo de la petición
+MODE_SAMPLING_ALL = 'sampling-all'  # Todos los hilos (p. ej. workers del escáner)
+MODE_CPROFILE = 'cprofile'
+MODES = (MODE_SAMPLING, MODE_SAMPLING_ALL, MODE_CPROFILE)
+
+DEFAULT_INTERVAL = 0.005  # 5ms entre muestras
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> str:
+    """Convierte una pila en 'raíz;...;hoja'"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+class SamplingProfiler:
+    """Perfilador por muestreo de pilas basado en sys._current_frames()"""
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = DEFAULT_INTERVAL):
+        """
+        Args:
+            thread_id: Hilo a muestrear (None = todos menos el muestreador)
+            interval: Segundos entre muestras
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frame = frames.get(self.thread_id)
+                if frame is not None:
+                    self.samples[_collapse(frame)] += 1
+                continue
+
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                self.samples[f"{names.get(thread_id, thread_id)};{_collapse(frame)}"] += 1
+
+    def collapsed(self) -> str:
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common()) + '\n'
+
+
+def _cprofile_collapsed(profile: cProfile.Profile) -> str:
+    """
+    Aproxima pilas colapsadas a partir de cProfile
+
+    cProfile solo registra pares llamador -> llamado, así que cada línea es
+    'llamador;función' con su tiempo propio en microsegundos.
+    """
+    stats = pstats.Stats(profile)
+    lines = []
+    for (filename, line, name), (_, _, tottime, _, callers) in stats.stats.items():
+        label = f"{name} ({os.path.basename(filename)}:{line})"
+        weight = int(tottime * 1_000_000)
+        if weight <= 0:
+            continue
+        if not callers:
+            lines.append(f"{label} {weight}")
+            continue
+        # Repartir el tiempo propio entre los llamadores según sus llamadas
+        total_calls = sum(c[0] for c in callers.values()) or 1
+        for (c_file, c_line, c_name), caller_stats in callers.items():
+            share = int(weight * caller_stats[0] / total_calls)
+            if share > 0:
+                lines.append(f"{c_name} ({os.path.basename(c_file)}:{c_line});{label} {share}")
+    return '\n'.join(lines) + '\n'
+
+
+class RequestProfile:
+    """Perfil en curso de una petición"""
+
+    def __init__(self, mode: str, route: str, method: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.route = route
+        self.method = method
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[SamplingProfiler] = None
+
+        if mode == MODE_CPROFILE:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            thread_id = threading.get_ident() if mode == MODE_SAMPLING else None
+            self._sampler = SamplingProfiler(thread_id)
+            self._sampler.start()
+
+    def finish(self, status: int) -> Dict[str, Any]:
+        duration = time.perf_counter() - self._start
+        if self._profile is not None:
+            self._profile.disable()
+            collapsed = _cprofile_collapsed(self._profile)
+            stream = StringIO()
+            pstats.Stats(self._profile, stream=stream).sort_stats('cumulative').print_stats(40)
+            report = stream.getvalue()
+            samples = None
+        else:
+            self._sampler.stop()
+            collapsed = self._sampler.collapsed()
+            report = None
+            samples = sum(self._sampler.samples.values())
+
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "route": self.route,
+            "method": self.method,
+            "status": status,
+            "started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)),
+            "duration_ms": round(duration * 1000, 1),
+            "samples": samples,
+            "collapsed": collapsed,
+            "pstats": report
+        }
+
+
+class ProfileStore:
+    """Buffer circular con los perfiles más recientes"""
+
+    def __init__(self, max_profiles: int = 20):
+        self._profiles: deque = deque(maxlen=max_profiles)
+        self._lock = threading.Lock()
+
+    def add(self, profile: Dict[str, Any]) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((p for p in self._profiles if p["id"] == profile_id), None)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Resumen de los perfiles guardados (sin el contenido)"""
+        with self._lock:
+            return [{k: v for k, v in p.items() if k not in ("collapsed", "pstats")}
+                    for p in reversed(self._profiles)]
+
+
+def token_matches(expected: Optional[str], provided: Optional[str]) -> bool:
+    """Compara el token en tiempo constante (False si no hay token configurado)"""
+    if not expected or not provided:
+        return False
+    return hmac.compare_digest(expected.encode(), provided.encode())
@@ -0,0 +1,245 @@
+"""
+Codificación de Respuestas
+Negociación de compresión (zstd/gzip, también en streaming) y de un formato
+compacto para resultados grandes:
+
+    - Accept-Encoding: zstd (si está instalado zstandard) o gzip
+    - Accept: application/msgpack o ?format=msgpack -> MessagePack (si está
+      instalado msgpack; si no, JSON)
+    - ?layout=columnar -> los puertos de un escaneo van como arrays por
+      columna (port, state, service, rtt_ms) en lugar de un objeto por puerto
+
+Compartido por Flask (hook after_request) y el servidor ASGI.
+"""
+
+import json
+import zlib
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+# Por debajo de este tamaño la compresión no compensa
+MIN_COMPRESS_SIZE = 1024
+# Niveles rápidos: el objetivo es reducir el payload sin que la CPU lo pague
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/x-ndjson', MSGPACK_MIMETYPE,
+    'application/javascript', 'text/html', 'text/plain', 'text/css', 'text/csv'
+}
+
+
+def supported_encodings() -> List[str]:
+    """Codificaciones de contenido disponibles, de mayor a menor preferencia"""
+    return (['zstd'] if ZSTD_AVAILABLE else []) + ['gzip']
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Elige la codificación de contenido a partir del header Accept-Encoding
+
+    Respeta los q-values (q=0 excluye); a igual q se prefiere zstd.
+    """
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(mimetype: Optional[str]) -> bool:
+    return (mimetype or '').split(';')[0].strip().lower() in COMPRESSIBLE_TYPES
+
+
+class StreamCompressor:
+    """Compresor incremental: cada parte se entrega completa (sync flush)"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            self._sync = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            # wbits=31: contenedor gzip
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._sync = zlib.Z_SYNC_FLUSH
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        out = self._compressor.compress(data)
+        if flush:
+            out += self._compressor.flush(self._sync)
+        return out
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Comprime un cuerpo completo"""
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Comprime una respuesta en streaming sin retrasar ninguna parte"""
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        if chunk:
+            yield compressor.compress(chunk)
+    yield compressor.finish()
+
+
+def _rtt_ms(value: Any) -> Optional[float]:
+    # "12.3ms" -> 12.3
+    if isinstance(value, str) and value.endswith('ms'):
+        try:
+            return float(value[:-2])
+        except ValueError:
+            return None
+    return None
+
+
+def columnar_ports(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reescribe open_ports de un resultado de escaneo como arrays por columna
+
+    {"open_ports": [{"port": 22, "service": "SSH", "response_time": "0.4ms"}, ...]}
+    -> {"ports": {"port": [22, ...], "state": ["open", ...], "service": ["SSH", ...],
+                  "rtt_ms": [0.4, ...]}}
+
+    La columna tls solo aparece si algún puerto la tiene. Devuelve una copia
+    superficial; el resto de claves no cambia.
+    """
+    rows = result.get("open_ports")
+    if not isinstance(rows, list):
+        return result
+    columns = {
+        "port": [row["port"] for row in rows],
+        "state": [row.get("state", "open") for row in rows],
+        "service": [row.get("service") for row in rows],
+        # Resultados en vivo traen "12.3ms"; los del historial, response_ms numérico
+        "rtt_ms": [row["response_ms"] if "response_ms" in row else _rtt_ms(row.get("response_time"))
+                   for row in rows],
+    }
+    if any("tls" in row for row in rows):
+        columns["tls"] = [row.get("tls") for row in rows]
+    compact = {k: v for k, v in result.items() if k != "open_ports"}
+    compact["ports"] = columns
+    compact["layout"] = "columnar"
+    return compact
+
+
+def rows_from_columns(columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Inversa de columnar_ports (para la CLI y clientes Python)"""
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*(columns[n] for n in names))]
+
+
+def wants_msgpack(accept: Optional[str], fmt: Optional[str]) -> bool:
+    if not MSGPACK_AVAILABLE:
+        return False
+    if fmt:
+        return fmt == 'msgpack'
+    return MSGPACK_MIMETYPE in (accept or '') or 'application/x-msgpack' in (accept or '')
+
+
+def serialize(payload: Any, use_msgpack: bool = False) -> Tuple[bytes, str]:
+    """
+    Serializa un payload
+
+    Returns:
+        Tupla (cuerpo, content-type)
+    """
+    if use_msgpack:
+        return msgpack.packb(payload, use_bin_type=True, default=str), MSGPACK_MIMETYPE
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=str)
+    return body.encode('utf-8'), 'application/json'
+
+
+def encode_body(payload: Any, accept: Optional[str] = None, accept_encoding: Optional[str] = None,
+                fmt: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Serializa y comprime un payload según lo que acepta el cliente
+
+    Returns:
+        Tupla (cuerpo, headers)
+    """
+    body, content_type = serialize(payload, wants_msgpack(accept, fmt))
+    headers = {'Content-Type': content_type, 'Vary': 'Accept, Accept-Encoding'}
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= MIN_COMPRESS_SIZE else None
+    if encoding:
+        body = compress(body, encoding)
+        headers['Content-Encoding'] = encoding
+    headers['Content-Length'] = str(len(body))
+    return body, headers
+
+
+def expand_columnar(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Devuelve un resultado columnar con open_ports como lista de objetos"""
+    if not isinstance(result, dict) or result.get("layout") != "columnar":
+        return result
+    expanded = {k: v for k, v in result.items() if k not in ("ports", "layout")}
+    expanded["open_ports"] = rows_from_columns(result["ports"])
+    return expanded
+
+
+def decode_records(body: bytes) -> Iterator[Any]:
+    """
+    Decodifica un cuerpo de respuesta o una salida de la CLI
+
+    Detecta la compresión (gzip/zstd) y el formato por sus bytes iniciales:
+    JSON, JSON Lines o una secuencia de objetos MessagePack.
+    """
+    if body[:2] == b'\x1f\x8b':
+        body = zlib.decompress(body, 47)
+    elif body[:4] == b'\x28\xb5\x2f\xfd':
+        if not ZSTD_AVAILABLE:
+            raise ValueError("Contenido zstd: instala zstandard para decodificarlo")
+        body = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+
+    if body.lstrip()[:1] in (b'{', b'['):
+        try:
+            yield json.loads(body)
+        except ValueError:
+            for line in body.splitlines():
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    if not MSGPACK_AVAILABLE:
+        raise ValueError("Contenido MessagePack: instala msgpack para decodificarlo")
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(body)
+    yield from unpacker
@@ -0,0 +1,467 @@
+"""
+Eliminación de Metadatos (sanitización)
+Escribe una copia limpia de imágenes, PDF y documentos OOXML procesando el
+archivo como un stream de entrada a salida: la memoria usada no depende del
+tamaño del archivo y los píxeles nunca se re-codifican
+"""
+
+import os
+import re
+import bisect
+import shutil
+import struct
+import zipfile
+import logging
+from typing import Dict, List, Any, BinaryIO, Tuple
+
+from components.file_signatures import sniff_file
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class SanitizeError(Exception):
+    """El archivo no puede sanitizarse"""
+
+
+def _copy_bytes(src: BinaryIO, dst: BinaryIO, length: int) -> None:
+    """Copia exactamente `length` bytes en bloques"""
+    while length > 0:
+        chunk = src.read(min(COPY_CHUNK_SIZE, length))
+        if not chunk:
+            raise SanitizeError("Archivo truncado")
+        dst.write(chunk)
+        length -= len(chunk)
+
+
+def _read_exact(src: BinaryIO, length: int) -> bytes:
+    data = src.read(length)
+    if len(data) != length:
+        raise SanitizeError("Archivo truncado")
+    return data
+
+
+# ---- JPEG ---------------------------------------------------------------------
+
+# Segmentos APPn que se conservan (necesarios para mostrar bien la imagen)
+_JPEG_KEEP_APP = {
+    0xE0: (b'JFIF\x00', b'JFXX\x00'),
+    0xE2: (b'ICC_PROFILE\x00',),
+    0xEE: (b'Adobe',),
+}
+
+_JPEG_SEGMENT_NAMES = {0xE1: "EXIF/XMP (APP1)", 0xED: "IPTC/Photoshop (APP13)", 0xFE: "Comentario (COM)"}
+
+
+def sanitize_jpeg(src: BinaryIO, dst: BinaryIO) -> List[str]:
+    """Elimina segmentos APPn/COM de un JPEG sin tocar los datos de imagen"""
+    removed = []
+    if _read_exact(src, 2) != b'\xFF\xD8':
+        raise SanitizeError("JPEG inválido")
+    dst.write(b'\xFF\xD8')
+
+    while True:
+        marker = _read_exact(src, 2)
+        if marker[0] != 0xFF:
+            raise SanitizeError("Marcador JPEG inválido")
+        # Bytes de relleno 0xFF entre segmentos
+        while marker[1] == 0xFF:
+            marker = marker[1:] + _read_exact(src, 1)
+        code = marker[1]
+
+        if code == 0xD9:  # EOI
+            dst.write(marker)
+            break
+        if 0xD0 <= code <= 0xD7 or code == 0x01:  # Marcadores sin longitud
+            dst.write(marker)
+            continue
+
+        length_bytes = _read_exact(src, 2)
+        length = struct.unpack('>H', length_bytes)[0] - 2
+
+        is_app = 0xE0 <= code <= 0xEF
+        if is_app or code == 0xFE:
+            head = src.read(min(length, 16))
+            keep = is_app and any(head.startswith(p) for p in _JPEG_KEEP_APP.get(code, ()))
+            if not keep:
+                src.seek(length - len(head), os.SEEK_CUR)
+                removed.append(_JPEG_SEGMENT_NAMES.get(code, f"APP{code - 0xE0}"))
+                continue
+            dst.write(marker + length_bytes + head)
+            _copy_bytes(src, dst, length - len(head))
+            continue
+
+        dst.write(marker + length_bytes)
+        _copy_bytes(src, dst, length)
+
+        if code == 0xDA:  # SOS: el resto son datos comprimidos, se copian tal cual
+            shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+            break
+
+    return removed
+
+
+# ---- PNG ----------------------------------------------------------------------
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_PNG_DROP_CHUNKS = {b'tEXt', b'zTXt', b'iTXt', b'eXIf', b'tIME'}
+
+
+def sanitize_png(src: BinaryIO, dst: BinaryIO) -> List[str]:
+    """Elimina chunks de texto, EXIF y fecha de un PNG"""
+    removed = []
+    if _read_exact(src, 8) != _PNG_SIGNATURE:
+        raise SanitizeError("PNG inválido")
+    dst.write(_PNG_SIGNATURE)
+
+    while True:
+        header = src.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type in _PNG_DROP_CHUNKS:
+            src.seek(length + 4, os.SEEK_CUR)
+            removed.append(chunk_type.decode('ascii'))
+            continue
+        dst.write(header)
+        _copy_bytes(src, dst, length + 4)  # datos + CRC
+        if chunk_type == b'IEND':
+            break
+
+    return removed
+
+
+# ---- WebP ---------------------------------------------------------------------
+
+_WEBP_DROP_CHUNKS = {b'EXIF', b'XMP '}
+
+
+def sanitize_webp(src: BinaryIO, dst: BinaryIO) -> List[str]:
+    """Elimina los chunks EXIF/XMP de un WebP y ajusta los flags de VP8X"""
+    header = _read_exact(src, 12)
+    if header[:4] != b'RIFF' or header[8:12] != b'WEBP':
+        raise SanitizeError("WebP inválido")
+
+    # Primera pasada (solo cabeceras): calcular el tamaño final del RIFF
+    chunks: List[Tuple[bytes, int, int]] = []
+    while True:
+        chunk_header = src.read(8)
+        if len(chunk_header) < 8:
+            break
+        fourcc, size = struct.unpack('<4sI', chunk_header)
+        chunks.append((fourcc, size, src.tell()))
+        src.seek(size + (size & 1), os.SEEK_CUR)
+
+    kept = [c for c in chunks if c[0] not in _WEBP_DROP_CHUNKS]
+    removed = [c[0].decode('ascii').strip() for c in chunks if c[0] in _WEBP_DROP_CHUNKS]
+    riff_size = 4 + sum(8 + size + (size & 1) for _, size, _ in kept)
+
+    dst.write(b'RIFF' + struct.pack('<I', riff_size) + b'WEBP')
+    for fourcc, size, offset in kept:
+        src.seek(offset)
+        dst.write(struct.pack('<4sI', fourcc, size))
+        if fourcc == b'VP8X':
+            data = bytearray(_read_exact(src, size))
+            data[0] &= ~(0x08 | 0x04) & 0xFF  # flags EXIF y XMP
+            dst.write(data)
+        else:
+            _copy_bytes(src, dst, size)
+        if size & 1:
+            dst.write(b'\x00')
+
+    return removed
+
+
+# ---- GIF ----------------------------------------------------------------------
+
+def _copy_sub_blocks(src: BinaryIO, dst) -> None:
+    while True:
+        size_byte = _read_exact(src, 1)
+        if dst is not None:
+            dst.write(size_byte)
+        if size_byte == b'\x00':
+            return
+        data = _read_exact(src, size_byte[0])
+        if dst is not None:
+            dst.write(data)
+
+
+def sanitize_gif(src: BinaryIO, dst: BinaryIO) -> List[str]:
+    """Elimina comentarios y bloques XMP de un GIF"""
+    removed = []
+    header = _read_exact(src, 13)
+    if header[:3] != b'GIF':
+        raise SanitizeError("GIF inválido")
+    dst.write(header)
+    if header[10] & 0x80:  # Tabla de color global
+        _copy_bytes(src, dst, 3 * (2 << (header[10] & 0x07)))
+
+    while True:
+        block = _read_exact(src, 1)
+        if block == b'\x3B':  # Trailer
+            dst.write(block)
+            break
+        if block == b'\x2C':  # Imagen
+            descriptor = _read_exact(src, 9)
+            dst.write(block + descriptor)
+            if descriptor[8] & 0x80:
+                _copy_bytes(src, dst, 3 * (2 << (descriptor[8] & 0x07)))
+            dst.write(_read_exact(src, 1))  # Tamaño mínimo de código LZW
+            _copy_sub_blocks(src, dst)
+        elif block == b'\x21':  # Extensión
+            label = _read_exact(src, 1)
+            if label == b'\xFE':
+                _copy_sub_blocks(src, None)
+                removed.append("Comentario")
+                continue
+            if label == b'\xFF':
+                app_block = _read_exact(src, 12)
+                if app_block[1:12] == b'XMP DataXMP':
+                    _copy_sub_blocks(src, None)
+                    removed.append("XMP")
+                    continue
+                dst.write(block + label + app_block)
+            else:
+                dst.write(block + label)
+            _copy_sub_blocks(src, dst)
+        else:
+            raise SanitizeError("Bloque GIF inválido")
+
+    return removed
+
+
+# ---- PDF ----------------------------------------------------------------------
+
+_PDF_SCAN_CHUNK = 1024 * 1024
+_PDF_OVERLAP = 256
+_RE_OBJ = re.compile(rb'(?<![0-9])(\d{1,10})\s+(\d{1,5})\s+obj\b')
+_RE_ENDOBJ = re.compile(rb'\bendobj\b')
+_RE_INFO_REF = re.compile(rb'/Info\s+(\d{1,10})\s+(\d{1,5})\s+R')
+_RE_METADATA_TYPE = re.compile(rb'/Type\s*/Metadata\b')
+_RE_ENCRYPT = re.compile(rb'/Encrypt\s+\d')
+
+
+def _scan_pdf(src: BinaryIO) -> Dict[str, Any]:
+    """Recorre el PDF en bloques y localiza objetos, /Info y streams XMP"""
+    found = {"obj": {}, "endobj": set(), "info": set(), "metadata": set(), "encrypted": False}
+    src.seek(0)
+    base = 0
+    tail = b''
+
+    while True:
+        chunk = src.read(_PDF_SCAN_CHUNK)
+        buffer = tail + chunk
+        buffer_start = base - len(tail)
+        final = not chunk
+        limit = len(buffer) if final else len(buffer) - _PDF_OVERLAP
+
+        for m in _RE_OBJ.finditer(buffer):
+            if m.start() < limit:
+                found["obj"][buffer_start + m.start()] = (int(m.group(1)), buffer_start + m.end())
+        for m in _RE_ENDOBJ.finditer(buffer):
+            if m.start() < limit:
+                found["endobj"].add(buffer_start + m.start())
+        for m in _RE_INFO_REF.finditer(buffer):
+            if m.start() < limit:
+                found["info"].add(int(m.group(1)))
+        for m in _RE_METADATA_TYPE.finditer(buffer):
+            if m.start() < limit:
+                found["metadata"].add(buffer_start + m.start())
+        if _RE_ENCRYPT.search(buffer):
+            found["encrypted"] = True
+
+        if final:
+            break
+        base += len(chunk)
+        tail = buffer[limit:]
+
+    return found
+
+
+_EMPTY_XMP = (b'<x:xmpmeta xmlns:x="adobe:ns:meta/">'
+              b'<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"/></x:xmpmeta>')
+
+
+def _empty_xmp_object(length: int) -> bytes:
+    """
+    Cuerpo de objeto con un stream XMP vacío que ocupa exactamente `length`
+    bytes (el relleno con espacios es válido dentro de un paquete XMP)
+    """
+    suffix = b'\nendstream\n'
+    data_len = length
+    for _ in range(3):  # El largo de /Length depende de sus propios dígitos
+        prefix = b' <</Type/Metadata/Subtype/XML/Length %d>>\nstream\n' % data_len
+        data_len = length - len(prefix) - len(suffix)
+    if data_len < len(_EMPTY_XMP):
+        return b' null'
+    return prefix + _EMPTY_XMP.ljust(data_len) + suffix
+
+
+def sanitize_pdf(src: BinaryIO, dst: BinaryIO) -> List[str]:
+    """
+    Vacía el diccionario /Info y los streams XMP de un PDF
+
+    Los objetos se reescriben en su lugar con el mismo largo
+    (rellenando con espacios), así la tabla xref sigue siendo válida
+    y no hace falta cargar el documento en memoria.
+    """
+    scan = _scan_pdf(src)
+    if scan["encrypted"]:
+        raise SanitizeError("PDF cifrado: no se puede sanitizar sin la contraseña")
+
+    obj_starts = sorted(scan["obj"])
+    endobjs = sorted(scan["endobj"])
+
+    def body_range(obj_start: int) -> Tuple[int, int]:
+        body_start = scan["obj"][obj_start][1]
+        index = bisect.bisect_right(endobjs, body_start)
+        if index == len(endobjs):
+            raise SanitizeError("Objeto PDF sin endobj")
+        return body_start, endobjs[index]
+
+    replacements: Dict[int, Tuple[int, bytes]] = {}
+    removed = []
+
+    # Diccionario de información del documento (todas sus revisiones)
+    info_found = set()
+    for start in obj_starts:
+        number = scan["obj"][start][0]
+        if number in scan["info"]:
+            body_start, body_end = body_range(start)
+            replacements[body_start] = (body_end, b' <<>>')
+            info_found.add(number)
+    if info_found:
+        removed.append("Info (autor, título, productor, fechas)")
+    if scan["info"] - info_found:
+        removed.append("AVISO: /Info dentro de un object stream comprimido (no eliminado)")
+
+    # Streams XMP: se sustituyen por un paquete XMP vacío del mismo largo
+    xmp_count = 0
+    for position in sorted(scan["metadata"]):
+        index = bisect.bisect_right(obj_starts, position)
+        if index == 0:
+            continue
+        body_start, body_end = body_range(obj_starts[index - 1])
+        if body_start not in replacements and position < body_end:
+            replacements[body_start] = (body_end, _empty_xmp_object(body_end - body_start))
+            xmp_count += 1
+    if xmp_count:
+        removed.append(f"XMP ({xmp_count} stream{'s' if xmp_count > 1 else ''})")
+
+    # Segunda pasada: copiar aplicando los reemplazos en su lugar
+    src.seek(0)
+    position = 0
+    for body_start in sorted(replacements):
+        body_end, content = replacements[body_start]
+        if body_start < position:
+            continue
+        _copy_bytes(src, dst, body_start - position)
+        length = body_end - body_start
+        dst.write(content.ljust(length) if length >= len(content) else b' ' * length)
+        src.seek(body_end)
+        position = body_end
+    shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+    return removed
+
+
+# ---- OOXML (docx / xlsx / pptx) -----------------------------------------------
+
+_EMPTY_CORE = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    b'<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+    b'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+    b'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"/>'
+)
+_EMPTY_APP = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    b'<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties"/>'
+)
+_EMPTY_CUSTOM = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    b'<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/custom-properties"/>'
+)
+_OOXML_REWRITES = {
+    "docProps/core.xml": (_EMPTY_CORE, "Propiedades principales (autor, fechas, revisión)"),
+    "docProps/app.xml": (_EMPTY_APP, "Propiedades extendidas (empresa, aplicación, plantilla)"),
+    "docProps/custom.xml": (_EMPTY_CUSTOM, "Propiedades personalizadas"),
+}
+# Fecha neutra para las entradas del zip (las originales también son metadatos)
+_ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+
+def sanitize_ooxml(src: BinaryIO, dst: BinaryIO) -> List[str]:
+    """Reescribe docProps/* de un documento OOXML copiando el resto en streaming"""
+    removed = []
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, 'w') as zout:
+        for info in zin.infolist():
+            out_info = zipfile.ZipInfo(info.filename, date_time=_ZIP_EPOCH)
+            out_info.compress_type = info.compress_type
+            out_info.external_attr = info.external_attr
+
+            if info.filename in _OOXML_REWRITES:
+                content, label = _OOXML_REWRITES[info.filename]
+                zout.writestr(out_info, content)
+                removed.append(label)
+                continue
+
+            with zin.open(info) as member, zout.open(out_info, 'w') as out:
+                shutil.copyfileobj(member, out, COPY_CHUNK_SIZE)
+
+    return removed
+
+
+# ---- Interfaz pública ---------------------------------------------------------
+
+_SANITIZERS = {
+    'jpeg': sanitize_jpeg,
+    'png': sanitize_png,
+    'webp': sanitize_webp,
+    'gif': sanitize_gif,
+    'pdf': sanitize_pdf,
+    'docx': sanitize_ooxml,
+    'xlsx': sanitize_ooxml,
+}
+
+SUPPORTED_FORMATS = sorted(_SANITIZERS)
+
+
+def sanitize_file(src_path: str, dst_path: str) -> Dict[str, Any]:
+    """
+    Escribe en dst_path una copia de src_path sin metadatos
+
+    Args:
+        src_path: Archivo original
+        dst_path: Ruta de la copia limpia
+
+    Returns:
+        Diccionario con el formato detectado y lo eliminado
+
+    Raises:
+        SanitizeError: Si el formato no está soportado o el archivo es inválido
+    """
+    _, file_format = sniff_file(src_path)
+    sanitizer = _SANITIZERS.get(file_format)
+    if sanitizer is None:
+        raise SanitizeError(f"Formato no soportado para sanitizar: {file_format}")
+
+    try:
+        with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+            removed = sanitizer(src, dst)
+    except SanitizeError:
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+        raise
+    except (struct.error, zipfile.BadZipFile, OSError) as e:
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+        raise SanitizeError(f"Archivo inválido o corrupto: {e}")
+
+    return {
+        "format": file_format,
+        "removed": removed if removed else ["Sin metadatos que eliminar"],
+        "original_size": os.path.getsize(src_path),
+        "sanitized_size": os.path.getsize(dst_path)
+    }
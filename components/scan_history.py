@@ -0,0 +1,446 @@
+"""
+Historial de Escaneos de Puertos
+Guarda cada escaneo en una base SQLite embebida (modo WAL) y calcula qué
+cambió respecto del escaneo anterior del mismo host: puertos que se abrieron,
+que se cerraron y cambios de servicio.
+
+Esquema:
+    scans       una fila por escaneo (los puertos sondeados se guardan como
+                rangos compactos, p. ej. "1-1024,3306")
+    open_ports  una fila por puerto abierto encontrado, insertadas en lote
+                dentro de la misma transacción que el escaneo
+    scan_ports  una fila por puerto sondeado (último estado de cada puerto
+                con una sola consulta)
+
+    scan_jobs   escaneos recurrentes del planificador (scan_scheduler.py)
+    scan_events eventos de cambio (puerto abierto/cerrado, cambio de servicio)
+
+Un puerto que estaba abierto y no volvió a sondearse no se reporta como
+cerrado: figura en "not_rescanned".
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Iterable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    target        TEXT    NOT NULL,
+    ip            TEXT,
+    started_at    REAL    NOT NULL,
+    duration      REAL,
+    scanned_ports TEXT    NOT NULL,
+    scanned_count INTEGER NOT NULL,
+    open_count    INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scans_target_time ON scans (target, started_at);
+
+CREATE TABLE IF NOT EXISTS open_ports (
+    scan_id     INTEGER NOT NULL REFERENCES scans (id) ON DELETE CASCADE,
+    target      TEXT    NOT NULL,
+    port        INTEGER NOT NULL,
+    service     TEXT,
+    response_ms REAL,
+    seen_at     REAL    NOT NULL,
+    PRIMARY KEY (scan_id, port)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_open_ports_target_port_time ON open_ports (target, port, seen_at);
+
+CREATE TABLE IF NOT EXISTS scan_ports (
+    scan_id INTEGER NOT NULL REFERENCES scans (id) ON DELETE CASCADE,
+    target  TEXT    NOT NULL,
+    port    INTEGER NOT NULL,
+    PRIMARY KEY (scan_id, port)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_scan_ports_target_port ON scan_ports (target, port, scan_id);
+
+CREATE TABLE IF NOT EXISTS scan_jobs (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    target        TEXT    NOT NULL,
+    ports         TEXT    NOT NULL,
+    interval      REAL    NOT NULL,
+    full_every    INTEGER NOT NULL,
+    enabled       INTEGER NOT NULL DEFAULT 1,
+    created_at    REAL    NOT NULL,
+    next_run      REAL    NOT NULL,
+    last_run      REAL,
+    runs          INTEGER NOT NULL DEFAULT 0,
+    ports_probed  INTEGER NOT NULL DEFAULT 0,
+    ports_skipped INTEGER NOT NULL DEFAULT 0,
+    last_error    TEXT
+);
+
+CREATE TABLE IF NOT EXISTS scan_events (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id  INTEGER,
+    scan_id INTEGER,
+    target  TEXT    NOT NULL,
+    port    INTEGER NOT NULL,
+    kind    TEXT    NOT NULL,
+    before  TEXT,
+    after   TEXT,
+    at      REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scan_events_target_time ON scan_events (target, at);
+"""
+
+
+def encode_ports(ports: Iterable[int]) -> str:
+    """Convierte una lista de puertos en rangos: [1,2,3,80] -> '1-3,80'"""
+    ordered = sorted(set(ports))
+    ranges = []
+    i = 0
+    while i < len(ordered):
+        j = i
+        while j + 1 < len(ordered) and ordered[j + 1] == ordered[j] + 1:
+            j += 1
+        ranges.append(str(ordered[i]) if i == j else f"{ordered[i]}-{ordered[j]}")
+        i = j + 1
+    return ','.join(ranges)
+
+
+def decode_ports(encoded: str) -> List[int]:
+    """Inversa de encode_ports"""
+    ports = []
+    for part in filter(None, encoded.split(',')):
+        if '-' in part:
+            start, end = part.split('-', 1)
+            ports.extend(range(int(start), int(end) + 1))
+        else:
+            ports.append(int(part))
+    return ports
+
+
+def _parse_number(value: Optional[str], unit: str) -> Optional[float]:
+    # "12.3ms" -> 12.3 / "1.52s" -> 1.52
+    if not value or not str(value).endswith(unit):
+        return None
+    try:
+        return float(str(value)[:-len(unit)])
+    except ValueError:
+        return None
+
+
+def _format_time(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+class ScanHistory:
+    """Historial de escaneos persistido en SQLite"""
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Ruta del archivo de base de datos (se crea si no existe)
+        """
+        self.db_path = db_path
+        # Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            self._backfill_scan_ports(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            # WAL: lectores y un escritor simultáneos sin bloquearse
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _backfill_scan_ports(self, conn: sqlite3.Connection) -> None:
+        # Bases creadas antes de scan_ports: se expanden los rangos una vez
+        if conn.execute("SELECT 1 FROM scan_ports LIMIT 1").fetchone() is not None:
+            return
+        for scan in conn.execute("SELECT id, target, scanned_ports FROM scans").fetchall():
+            conn.executemany(
+                "INSERT OR IGNORE INTO scan_ports (scan_id, target, port) VALUES (?, ?, ?)",
+                [(scan["id"], scan["target"], port) for port in decode_ports(scan["scanned_ports"])]
+            )
+
+    # --- Escritura ---
+
+    def record(self, result: Dict[str, Any], scanned_ports: Iterable[int]) -> int:
+        """
+        Guarda un escaneo completado en una sola transacción
+
+        Args:
+            result: Resultado de PortScanner.scan_ports
+            scanned_ports: Puertos sondeados (para distinguir cerrados de no sondeados)
+
+        Returns:
+            ID del escaneo
+        """
+        now = time.time()
+        ports = list(scanned_ports)
+        open_ports = result.get("open_ports", [])
+        duration = _parse_number(result.get("scan_time"), 's')
+
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO scans (target, ip, started_at, duration, scanned_ports, scanned_count, open_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (result["target"], result.get("ip"), now, duration,
+                 encode_ports(ports), len(ports), len(open_ports))
+            )
+            scan_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT OR IGNORE INTO scan_ports (scan_id, target, port) VALUES (?, ?, ?)",
+                [(scan_id, result["target"], port) for port in ports]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO open_ports (scan_id, target, port, service, response_ms, seen_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(scan_id, result["target"], p["port"], p.get("service"),
+                  _parse_number(p.get("response_time"), 'ms'), now) for p in open_ports]
+            )
+        return scan_id
+
+    def prune(self, max_age_days: float) -> int:
+        """Elimina los escaneos y eventos más antiguos que max_age_days; devuelve cuántos escaneos"""
+        cutoff = time.time() - max_age_days * 86400
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute("DELETE FROM scans WHERE started_at < ?", (cutoff,))
+            conn.execute("DELETE FROM scan_events WHERE at < ?", (cutoff,))
+        return cursor.rowcount
+
+    # --- Lectura ---
+
+    def _scan_row(self, scan_id: int) -> Optional[sqlite3.Row]:
+        return self._connect().execute("SELECT * FROM scans WHERE id = ?", (scan_id,)).fetchone()
+
+    def _open_ports(self, scan_id: int) -> Dict[int, sqlite3.Row]:
+        rows = self._connect().execute(
+            "SELECT port, service, response_ms FROM open_ports WHERE scan_id = ? ORDER BY port",
+            (scan_id,)
+        ).fetchall()
+        return {row["port"]: row for row in rows}
+
+    def _summary(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "scan_id": row["id"],
+            "target": row["target"],
+            "ip": row["ip"],
+            "timestamp": _format_time(row["started_at"]),
+            "scanned_count": row["scanned_count"],
+            "open_count": row["open_count"]
+        }
+
+    def get_scan(self, scan_id: int) -> Optional[Dict[str, Any]]:
+        """Detalle de un escaneo (puertos sondeados y abiertos)"""
+        row = self._scan_row(scan_id)
+        if row is None:
+            return None
+        scan = self._summary(row)
+        scan["scanned_ports"] = row["scanned_ports"]
+        scan["open_ports"] = [
+            {"port": p["port"], "service": p["service"], "response_ms": p["response_ms"]}
+            for p in self._open_ports(scan_id).values()
+        ]
+        return scan
+
+    def history(self, target: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Escaneos de un host, del más reciente al más antiguo"""
+        rows = self._connect().execute(
+            "SELECT * FROM scans WHERE target = ? ORDER BY started_at DESC, id DESC LIMIT ?",
+            (target, limit)
+        ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def targets(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Hosts escaneados con la fecha y el resultado de su último escaneo"""
+        rows = self._connect().execute(
+            "SELECT target, COUNT(*) AS scans, MAX(started_at) AS last_scan "
+            "FROM scans GROUP BY target ORDER BY last_scan DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [{"target": r["target"], "scans": r["scans"], "last_scan": _format_time(r["last_scan"])}
+                for r in rows]
+
+    def latest_ids(self, target: str, count: int = 2) -> List[int]:
+        rows = self._connect().execute(
+            "SELECT id FROM scans WHERE target = ? ORDER BY started_at DESC, id DESC LIMIT ?",
+            (target, count)
+        ).fetchall()
+        return [row["id"] for row in rows]
+
+    def known_state(self, target: str) -> Dict[int, Dict[str, Any]]:
+        """
+        Último estado conocido de cada puerto sondeado alguna vez en el host
+
+        Returns:
+            {puerto: {"open": bool, "service": str|None, "seen_at": timestamp}}
+        """
+        rows = self._connect().execute(
+            "SELECT latest.port, s.started_at, o.port IS NOT NULL AS is_open, o.service "
+            "FROM (SELECT port, MAX(scan_id) AS scan_id FROM scan_ports WHERE target = ? GROUP BY port) latest "
+            "JOIN scans s ON s.id = latest.scan_id "
+            "LEFT JOIN open_ports o ON o.scan_id = latest.scan_id AND o.port = latest.port",
+            (target,)
+        ).fetchall()
+        return {row["port"]: {"open": bool(row["is_open"]), "service": row["service"], "seen_at": row["started_at"]}
+                for row in rows}
+
+    def diff(self, target: str, from_id: Optional[int] = None,
+             to_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Cambios entre dos escaneos del mismo host
+
+        Sin IDs compara el último escaneo con el anterior. Devuelve None si el
+        host no tiene escaneos (o los IDs no le pertenecen).
+
+        Solo cuentan como cambio los puertos sondeados en ambos escaneos: un
+        abierto que el anterior no sondeó va a "newly_scanned" y uno que el
+        nuevo no volvió a sondear, a "not_rescanned".
+        """
+        if to_id is None:
+            ids = self.latest_ids(target, 2)
+            if not ids:
+                return None
+            to_id = ids[0]
+            if from_id is None and len(ids) > 1:
+                from_id = ids[1]
+
+        new = self._scan_row(to_id)
+        old = self._scan_row(from_id) if from_id is not None else None
+        if new is None or new["target"] != target or (old is not None and old["target"] != target):
+            return None
+
+        new_open = self._open_ports(to_id)
+        new_scanned = set(decode_ports(new["scanned_ports"]))
+        old_open = self._open_ports(from_id) if old is not None else {}
+        old_scanned = set(decode_ports(old["scanned_ports"])) if old is not None else None
+
+        opened, closed, service_changed, not_rescanned, newly_scanned = [], [], [], [], []
+        for port, row in new_open.items():
+            if port not in old_open:
+                if old_scanned is None or port in old_scanned:
+                    opened.append({"port": port, "service": row["service"]})
+                else:
+                    newly_scanned.append({"port": port, "service": row["service"]})
+            elif old_open[port]["service"] != row["service"]:
+                service_changed.append({"port": port, "before": old_open[port]["service"],
+                                        "after": row["service"]})
+        for port, row in old_open.items():
+            if port in new_open:
+                continue
+            if port in new_scanned:
+                closed.append({"port": port, "service": row["service"]})
+            else:
+                not_rescanned.append(port)
+
+        return {
+            "target": target,
+            "from_scan": self._summary(old) if old is not None else None,
+            "to_scan": self._summary(new),
+            "first_scan": old is None,
+            "changed": bool(opened or closed or service_changed),
+            "opened": opened,
+            "closed": closed,
+            "service_changed": service_changed,
+            "not_rescanned": sorted(not_rescanned),
+            "newly_scanned": newly_scanned,
+            "unchanged_open": sorted(set(new_open) & set(old_open))
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        scans, targets = conn.execute("SELECT COUNT(*), COUNT(DISTINCT target) FROM scans").fetchone()
+        return {"enabled": True, "scans": scans, "targets": targets}
+
+    # --- Escaneos recurrentes y eventos de cambio ---
+
+    def _job(self, row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["ports"] = decode_ports(row["ports"])
+        job["enabled"] = bool(row["enabled"])
+        return job
+
+    def add_job(self, target: str, ports: Iterable[int], interval: float,
+                full_every: int, next_run: float) -> Dict[str, Any]:
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO scan_jobs (target, ports, interval, full_every, created_at, next_run) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (target, encode_ports(ports), interval, full_every, time.time(), next_run)
+            )
+        return self.get_job(cursor.lastrowid)
+
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT * FROM scan_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        rows = self._connect().execute("SELECT * FROM scan_jobs ORDER BY id").fetchall()
+        return [self._job(row) for row in rows]
+
+    def due_jobs(self, now: float) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT * FROM scan_jobs WHERE enabled = 1 AND next_run <= ? ORDER BY next_run", (now,)
+        ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def delete_job(self, job_id: int) -> bool:
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute("DELETE FROM scan_jobs WHERE id = ?", (job_id,))
+        return cursor.rowcount > 0
+
+    def finish_job_run(self, job_id: int, next_run: float, probed: int, skipped: int,
+                       error: Optional[str] = None) -> None:
+        """Actualiza un job tras una ejecución (exitosa o no)"""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "UPDATE scan_jobs SET last_run = ?, next_run = ?, runs = runs + 1, "
+                "ports_probed = ports_probed + ?, ports_skipped = ports_skipped + ?, last_error = ? "
+                "WHERE id = ?",
+                (time.time(), next_run, probed, skipped, error, job_id)
+            )
+
+    def add_events(self, events: List[Dict[str, Any]]) -> None:
+        """Inserta eventos de cambio en lote"""
+        if not events:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO scan_events (job_id, scan_id, target, port, kind, before, after, at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(e.get("job_id"), e.get("scan_id"), e["target"], e["port"], e["kind"],
+                  e.get("before"), e.get("after"), e["at"]) for e in events]
+            )
+
+    def events(self, since_id: int = 0, target: Optional[str] = None,
+               limit: int = 100) -> List[Dict[str, Any]]:
+        """Eventos posteriores a since_id (para consultas incrementales)"""
+        query = "SELECT * FROM scan_events WHERE id > ?"
+        params: list = [since_id]
+        if target:
+            query += " AND target = ?"
+            params.append(target)
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        rows = self._connect().execute(query, params).fetchall()
+        events = []
+        for row in rows:
+            event = dict(row)
+            event["timestamp"] = _format_time(event.pop("at"))
+            events.append(event)
+        return events
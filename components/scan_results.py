@@ -0,0 +1,113 @@
+"""
+Resultados Compactos de Escaneo
+Representación interna del estado de puertos de un host para barridos
+grandes: un puerto cerrado no crea ningún objeto; uno abierto es una
+entrada en dos arrays paralelos (puerto 'H', RTT 'f') y, a partir de
+BITMAP_THRESHOLD abiertos, un bit en un bitmap de 8KB para las consultas
+de pertenencia. Solo la inspección TLS, que es rara, vive en un dict aparte.
+
+Los dicts JSON ({"port", "open", "service", "response_time"}) se arman
+recién al construir el reporte de la API (HostPorts.rows).
+"""
+
+from array import array
+from typing import Dict, List, Any, Optional, Callable, Iterator
+
+# Puertos 0-65535
+PORT_SPACE = 65536
+# Con pocos abiertos, buscar en el array es más barato que un bitmap de 8KB
+BITMAP_THRESHOLD = 64
+
+
+class OpenPort:
+    """Puerto abierto encontrado por una sonda (lo que devuelve scan_port)"""
+    __slots__ = ("port", "rtt_ms", "tls")
+
+    def __init__(self, port: int, rtt_ms: float, tls: Optional[Dict[str, Any]] = None):
+        self.port = port
+        self.rtt_ms = rtt_ms
+        self.tls = tls
+
+    def __repr__(self) -> str:
+        return f"OpenPort({self.port}, {self.rtt_ms:.1f}ms)"
+
+
+class HostPorts:
+    """Puertos abiertos de un host: arrays paralelos (puerto, RTT) + bitmap"""
+    __slots__ = ("bitmap", "ports", "rtts", "tls")
+
+    def __init__(self):
+        self.bitmap: Optional[bytearray] = None
+        self.ports = array('H')
+        self.rtts = array('f')
+        self.tls: Dict[int, Dict[str, Any]] = {}
+
+    def __getstate__(self):
+        # El bitmap se reconstruye: no viaja entre procesos
+        return self.ports, self.rtts, self.tls
+
+    def __setstate__(self, state) -> None:
+        self.ports, self.rtts, self.tls = state
+        self.bitmap = None
+        if len(self.ports) > BITMAP_THRESHOLD:
+            self._build_bitmap()
+
+    def _build_bitmap(self) -> None:
+        self.bitmap = bytearray(PORT_SPACE // 8)
+        for port in self.ports:
+            self.bitmap[port >> 3] |= 1 << (port & 7)
+
+    def __len__(self) -> int:
+        return len(self.ports)
+
+    def __contains__(self, port: int) -> bool:
+        if self.bitmap is None:
+            return port in self.ports
+        return bool(self.bitmap[port >> 3] & (1 << (port & 7)))
+
+    def add(self, port: int, rtt_ms: float, tls: Optional[Dict[str, Any]] = None) -> None:
+        """Registra un puerto abierto (un duplicado se ignora)"""
+        if port in self:
+            return
+        self.ports.append(port)
+        self.rtts.append(rtt_ms)
+        if self.bitmap is not None:
+            self.bitmap[port >> 3] |= 1 << (port & 7)
+        elif len(self.ports) > BITMAP_THRESHOLD:
+            self._build_bitmap()
+        if tls is not None:
+            self.tls[port] = tls
+
+    def add_record(self, record: Optional[OpenPort]) -> None:
+        if record is not None:
+            self.add(record.port, record.rtt_ms, record.tls)
+
+    def merge(self, other: "HostPorts") -> None:
+        """Suma los resultados de otro shard del mismo host"""
+        for port, rtt in zip(other.ports, other.rtts):
+            self.add(port, rtt, other.tls.get(port))
+
+    def _order(self) -> List[int]:
+        return sorted(range(len(self.ports)), key=self.ports.__getitem__)
+
+    def __iter__(self) -> Iterator[OpenPort]:
+        """OpenPort por puerto abierto, ordenados por número de puerto"""
+        for i in self._order():
+            port = self.ports[i]
+            yield OpenPort(port, self.rtts[i], self.tls.get(port))
+
+    def rows(self, service_name: Callable[[int], str],
+             state: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Formato de la API: una lista de dicts ordenada por puerto"""
+        rows = []
+        for i in self._order():
+            port = self.ports[i]
+            row = {"port": port, "open": True}
+            if state is not None:
+                row["state"] = state
+            row["service"] = service_name(port)
+            row["response_time"] = f"{self.rtts[i]:.1f}ms"
+            if port in self.tls:
+                row["tls"] = self.tls[port]
+            rows.append(row)
+        return rows
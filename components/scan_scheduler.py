@@ -0,0 +1,265 @@
+"""
+Planificador de Escaneos Recurrentes
+Ejecuta jobs de escaneo periódicos (guardados en el historial SQLite) con
+jitter y un presupuesto global de escaneos simultáneos, en un hilo propio con
+su event loop (usa el escáner asíncrono).
+
+Re-escaneo incremental:
+    - Los puertos que estaban abiertos se re-verifican en cada ejecución.
+    - Los puertos nunca sondeados se incluyen en cuanto aparecen.
+    - La "cola larga" de puertos cerrados se reparte en full_every porciones
+      y cada ejecución sondea solo una: cada puerto cerrado se re-verifica
+      una vez cada full_every ejecuciones.
+
+Cada diferencia con el último estado conocido se guarda como evento de cambio
+(port_opened, port_closed, service_changed).
+
+Con varios workers de gunicorn solo uno ejecuta el planificador (lock de
+archivo junto a la base); los demás solo gestionan jobs y leen eventos. Ese
+mismo proceso aplica la retención del historial (ScanHistory.prune).
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+from components import metrics
+from components.scan_history import ScanHistory
+from components.scan_website_ports import PortScanner, DEFAULT_TIMEOUT, DEFAULT_MAX_WORKERS
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENT_SCANS = 10
+DEFAULT_JITTER = 0.1       # ±10% del intervalo
+DEFAULT_FULL_EVERY = 12    # Cada puerto cerrado se re-verifica cada 12 ejecuciones
+MIN_INTERVAL = 30.0        # Segundos
+TICK = 1.0                 # Cada cuánto se buscan jobs vencidos
+PRUNE_INTERVAL = 3600.0    # Cada cuánto se aplica la retención del historial
+
+
+def plan_ports(ports: List[int], state: Dict[int, Dict[str, Any]],
+               run_index: int, full_every: int) -> Tuple[List[int], int]:
+    """
+    Elige qué puertos sondear en una ejecución
+
+    Args:
+        ports: Puertos del job
+        state: Último estado conocido {puerto: {"open": bool, ...}}
+        run_index: Número de ejecución del job
+        full_every: Cada cuántas ejecuciones se cubre toda la cola de cerrados
+
+    Returns:
+        Tupla (puertos a sondear, puertos omitidos)
+    """
+    selected = []
+    cold_index = 0
+    for port in ports:
+        known = state.get(port)
+        if known is None or known["open"]:
+            selected.append(port)
+            continue
+        # Puerto cerrado: solo entra en su porción
+        if cold_index % full_every == run_index % full_every:
+            selected.append(port)
+        cold_index += 1
+    return selected, len(ports) - len(selected)
+
+
+def change_events(target: str, state: Dict[int, Dict[str, Any]],
+                  probed: List[int], result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Compara un resultado con el último estado conocido y devuelve los cambios"""
+    now = time.time()
+    open_now = {p["port"]: p.get("service") for p in result.get("open_ports", [])}
+    events = []
+    for port in probed:
+        known = state.get(port)
+        was_open = known is not None and known["open"]
+        if port in open_now and not was_open:
+            events.append({"target": target, "port": port, "kind": "port_opened",
+                           "before": None, "after": open_now[port], "at": now})
+        elif port not in open_now and was_open:
+            events.append({"target": target, "port": port, "kind": "port_closed",
+                           "before": known["service"], "after": None, "at": now})
+        elif port in open_now and known["service"] != open_now[port]:
+            events.append({"target": target, "port": port, "kind": "service_changed",
+                           "before": known["service"], "after": open_now[port], "at": now})
+    return events
+
+
+class ScanScheduler:
+    """Planificador de escaneos recurrentes con re-escaneo incremental"""
+
+    def __init__(self, history: ScanHistory,
+                 max_concurrent_scans: int = DEFAULT_MAX_CONCURRENT_SCANS,
+                 jitter: float = DEFAULT_JITTER,
+                 retention_days: Optional[float] = None):
+        """
+        Args:
+            history: Historial donde viven los jobs, los escaneos y los eventos
+            max_concurrent_scans: Presupuesto global de escaneos simultáneos
+            jitter: Fracción del intervalo que varía aleatoriamente cada ejecución
+            retention_days: Días que se conservan escaneos y eventos (None = sin límite)
+        """
+        self.history = history
+        self.max_concurrent_scans = max_concurrent_scans
+        self.jitter = jitter
+        self.retention_days = retention_days
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # --- Gestión de jobs (cualquier proceso) ---
+
+    def add_job(self, target: str, ports: List[int], interval: float,
+                full_every: int = DEFAULT_FULL_EVERY) -> Dict[str, Any]:
+        """Crea un job; la primera ejecución se reparte en el primer intervalo"""
+        interval = max(float(interval), MIN_INTERVAL)
+        first_run = time.time() + random.uniform(0, interval * self.jitter)
+        return self.history.add_job(target, sorted(set(ports)), interval, max(1, int(full_every)), first_run)
+
+    def remove_job(self, job_id: int) -> bool:
+        return self.history.delete_job(job_id)
+
+    def next_run_after(self, interval: float) -> float:
+        return time.time() + interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    # --- Ejecución ---
+
+    def start(self) -> bool:
+        """
+        Arranca el planificador en un hilo
+
+        Returns:
+            False si otro proceso ya lo está ejecutando
+        """
+        if self.running:
+            return True
+        if not self._acquire_lock():
+            logger.info("El planificador de escaneos ya corre en otro proceso")
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='scan-scheduler', daemon=True)
+        self._thread.start()
+        logger.info("Planificador de escaneos iniciado")
+        return True
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _acquire_lock(self) -> bool:
+        if fcntl is None:
+            return True
+        self._lock_file = open(f"{self.history.db_path}.scheduler.lock", 'w')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+
+    def _run(self) -> None:
+        asyncio.run(self._main())
+
+    async def _main(self) -> None:
+        budget = asyncio.Semaphore(self.max_concurrent_scans)
+        running: Dict[int, asyncio.Task] = {}
+        next_prune = time.time()
+
+        while not self._stop.is_set():
+            if self.retention_days and time.time() >= next_prune:
+                next_prune = time.time() + PRUNE_INTERVAL
+                try:
+                    pruned = self.history.prune(self.retention_days)
+                    if pruned:
+                        logger.info(f"Historial: {pruned} escaneos eliminados por retención")
+                except Exception as e:
+                    logger.error(f"Error aplicando la retención del historial: {e}")
+
+            try:
+                for job in self.history.due_jobs(time.time()):
+                    if job["id"] not in running:
+                        running[job["id"]] = asyncio.ensure_future(self._run_job(job, budget))
+            except Exception as e:
+                logger.error(f"Error leyendo jobs programados: {e}")
+
+            for job_id in [j for j, task in running.items() if task.done()]:
+                running.pop(job_id)
+
+            await asyncio.sleep(TICK)
+
+        for task in running.values():
+            task.cancel()
+        await asyncio.gather(*running.values(), return_exceptions=True)
+
+    def _job_state(self, job: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+        # Se relee en cada ejecución: otros jobs y escaneos manuales del mismo
+        # objetivo también actualizan el historial
+        ports = set(job["ports"])
+        return {port: known for port, known in self.history.known_state(job["target"]).items()
+                if port in ports}
+
+    async def _run_job(self, job: Dict[str, Any], budget: asyncio.Semaphore) -> None:
+        async with budget:
+            try:
+                await self.run_job_once(job)
+            except Exception as e:
+                metrics.SCHEDULED_SCANS.inc(result="error")
+                logger.error(f"Error en el job {job['id']} ({job['target']}): {e}")
+                self.history.finish_job_run(job["id"], self.next_run_after(job["interval"]), 0, 0, str(e))
+
+    async def run_job_once(self, job: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Ejecuta una vez un job y devuelve los eventos de cambio"""
+        state = self._job_state(job)
+        ports, skipped = plan_ports(job["ports"], state, job["runs"], job["full_every"])
+        next_run = self.next_run_after(job["interval"])
+
+        if not ports:
+            # Nada que sondear en esta porción (p. ej. todos los puertos cerrados)
+            metrics.SCHEDULED_SCANS.inc(result="skipped")
+            metrics.SCHEDULER_PORTS_SKIPPED.inc(skipped)
+            self.history.finish_job_run(job["id"], next_run, 0, skipped)
+            return []
+
+        scanner = PortScanner(timeout=DEFAULT_TIMEOUT, max_workers=DEFAULT_MAX_WORKERS)
+        result = await scanner.scan_ports_async(job["target"], ports)
+
+        if "error" in result:
+            metrics.SCHEDULED_SCANS.inc(result="error")
+            self.history.finish_job_run(job["id"], next_run, 0, 0, result["error"])
+            return []
+
+        probed = ports[:result["scanned_ports"]]
+        events = change_events(job["target"], state, probed, result)
+        scan_id = self.history.record(result, probed)
+        for event in events:
+            event["job_id"] = job["id"]
+            event["scan_id"] = scan_id
+            metrics.SCAN_CHANGE_EVENTS.inc(kind=event["kind"])
+        self.history.add_events(events)
+        self.history.finish_job_run(job["id"], next_run, len(probed), skipped)
+
+        metrics.SCHEDULED_SCANS.inc(result="ok")
+        metrics.SCHEDULER_PORTS_PROBED.inc(len(probed))
+        metrics.SCHEDULER_PORTS_SKIPPED.inc(skipped)
+        for event in events:
+            logger.info(f"[{event['target']}] {event['kind']} puerto {event['port']}")
+        return events
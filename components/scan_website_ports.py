@@ -1,4 +1,7 @@
 import socket
+import asyncio
+import weakref
+import queue
 import concurrent.futures
 from typing import List, Dict, Optional, Tuple
 import ipaddress
@@ -7,9 +10,35 @@ import logging
 import os
 from functools import lru_cache
 
+from components import metrics
+from components import udp_scan
+from components import tls_inspect
+from components.scan_results import HostPorts, OpenPort
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Configuración por defecto del escáner (expuesta también en /api/info)
+DEFAULT_TIMEOUT = 1.5
+DEFAULT_MAX_WORKERS = 100
+KNOWN_PORT_TIMEOUT_FACTOR = 0.7
+
+# Modo asíncrono (ASGI): conexiones simultáneas máximas por proceso, compartidas
+# entre todos los escaneos en curso (cada una es un descriptor de archivo)
+ASYNC_MAX_CONNECTIONS = int(os.environ.get('SCAN_ASYNC_MAX_CONNECTIONS', 2000))
+
+_loop_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _connection_semaphore() -> asyncio.Semaphore:
+    """Semáforo global de conexiones del event loop actual"""
+    loop = asyncio.get_running_loop()
+    semaphore = _loop_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _loop_semaphores[loop] = asyncio.Semaphore(ASYNC_MAX_CONNECTIONS)
+    return semaphore
+
+
 class PortScanner:
     """Escáner de puertos optimizado con caché y timeouts dinámicos"""
     
@@ -29,15 +58,18 @@ class PortScanner:
         3389: "RDP", 5900: "VNC", 27017: "MongoDB"
     }
     
-    def __init__(self, timeout: float = 1.5, max_workers: int = 100):
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, max_workers: int = DEFAULT_MAX_WORKERS,
+                 tls: bool = False):
         """
         Configuración optimizada:
         - Timeout reducido: 1.5 segundos
         - Workers aumentados: 100 hilos
         - Caché de DNS habilitado
+        - tls: inspección TLS de los puertos abiertos (ver tls_inspect.py)
         """
         self.timeout = timeout
         self.max_workers = max_workers
+        self.tls = tls
         self.is_render = os.environ.get('RENDER', '').lower() == 'true'
         self._dns_cache = {}
 
@@ -104,23 +136,20 @@ class PortScanner:
         """Detección rápida de servicio"""
         return self.KNOWN_SERVICES.get(port, "unknown")
 
-    def scan_port(self, ip: str, port: int) -> Dict:
-        """Escaneo optimizado con timeout dinámico"""
-        result = {
-            "port": port,
-            "open": False,
-            "service": None,
-            "response_time": None
-        }
-        
-        # Determinar familia de socket
-        try:
-            sock_family = socket.AF_INET6 if ':' in ip else socket.AF_INET
-        except Exception:
-            return result
-        
-        # Timeout dinámico: puertos comunes más rápido
-        timeout = self.timeout * 0.7 if port in self.KNOWN_SERVICES else self.timeout
+    def port_timeout(self, port: int) -> float:
+        """Timeout dinámico: puertos comunes más rápido"""
+        return self.timeout * KNOWN_PORT_TIMEOUT_FACTOR if port in self.KNOWN_SERVICES else self.timeout
+
+    def scan_port(self, ip: str, port: int, server_hostname: Optional[str] = None) -> Optional[OpenPort]:
+        """
+        Escaneo optimizado con timeout dinámico
+
+        Returns:
+            OpenPort si el puerto está abierto; None si está cerrado o filtrado
+            (un puerto cerrado no crea ningún objeto)
+        """
+        sock_family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+        timeout = self.port_timeout(port)
         
         try:
             with socket.socket(sock_family, socket.SOCK_STREAM) as s:
@@ -131,75 +160,117 @@ class PortScanner:
                 
                 try:
                     s.connect((ip, port))
-                    result["open"] = True
-                    result["service"] = self.get_service_name(port)
-                    result["response_time"] = f"{(time.perf_counter() - start)*1000:.1f}ms"
                 except (socket.timeout, ConnectionRefusedError, OSError):
-                    pass  # Puerto cerrado o filtrado
+                    return None  # Puerto cerrado o filtrado
+                record = OpenPort(port, (time.perf_counter() - start) * 1000)
+                
+                # Handshake TLS sobre la misma conexión
+                if self.tls:
+                    record.tls = tls_inspect.inspect_socket(s, ip, port, server_hostname)
+                return record
                     
         except Exception as e:
             logger.debug(f"Error scanning port {port}: {e}")
-        
-        return result
+            return None
 
     def scan_ports(self, target: str, ports: Optional[List[int]] = None) -> Dict:
         """Escaneo paralelo optimizado"""
+        with metrics.SCANS_IN_FLIGHT.track_inprogress():
+            return self._scan_ports(target, ports)
+
+    def _scan_ports(self, target: str, ports: Optional[List[int]] = None) -> Dict:
         # Validación
         is_valid, msg = self.validate_target(target)
         if not is_valid:
             return {"error": msg, "status": "invalid_target"}
         
         # Resolución DNS
-        resolved, ip = self.resolve_host(target)
+        with metrics.STAGE_LATENCY.time(stage="dns_resolve"):
+            resolved, ip = self.resolve_host(target)
         if not resolved:
             return {"error": ip, "status": "resolution_failed"}
         
-        # Configuración de puertos
-        ports_to_scan = ports or self.COMMON_PORTS
+        ports_to_scan = self._ports_to_scan(ports)
         
-        # Limitar en entornos restringidos
-        if self.is_render and len(ports_to_scan) > 25:
-            ports_to_scan = ports_to_scan[:25]
-            logger.warning("Limitado a 25 puertos en Render")
-        
-        results = []
+        results = HostPorts()
         start_time = time.perf_counter()
+        deadline = start_time + len(ports_to_scan) * self.timeout + 5
         
-        # Escaneo paralelo con ThreadPoolExecutor optimizado
+        # Escaneo paralelo con ThreadPoolExecutor optimizado. Solo hay
+        # 2 × workers futures en vuelo: un barrido de 65k puertos no crea
+        # 65k futures de golpe
+        pending = len(ports_to_scan)
+        metrics.EXECUTOR_QUEUE_DEPTH.inc(pending, executor="port_scan")
         try:
             workers = min(self.max_workers, len(ports_to_scan), 100)
             
             with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-                future_to_port = {
-                    executor.submit(self.scan_port, ip, port): port 
-                    for port in ports_to_scan
-                }
+                sni = tls_inspect.sni_for(target) if self.tls else None
+                port_iter = iter(ports_to_scan)
+                done = queue.SimpleQueue()
+                in_flight = 0
+                
+                def submit_next() -> None:
+                    nonlocal in_flight
+                    port = next(port_iter, None)
+                    if port is not None:
+                        executor.submit(self.scan_port, ip, port, sni).add_done_callback(done.put)
+                        in_flight += 1
+                
+                for _ in range(workers * 2):
+                    submit_next()
                 
                 # Recopilar resultados con timeout global
-                for future in concurrent.futures.as_completed(
-                    future_to_port, 
-                    timeout=len(ports_to_scan) * self.timeout + 5
-                ):
+                while in_flight:
+                    try:
+                        future = done.get(timeout=max(0.0, deadline - time.perf_counter()))
+                    except queue.Empty:
+                        raise concurrent.futures.TimeoutError("timeout global del escaneo")
+                    in_flight -= 1
+                    pending -= 1
+                    metrics.EXECUTOR_QUEUE_DEPTH.dec(executor="port_scan")
                     try:
-                        result = future.result(timeout=1)
-                        if result["open"]:  # Solo guardar puertos abiertos
-                            results.append(result)
-                    except concurrent.futures.TimeoutError:
-                        logger.warning(f"Timeout en puerto {future_to_port[future]}")
+                        results.add_record(future.result())
                     except Exception as e:
                         logger.error(f"Error procesando resultado: {e}")
+                    submit_next()
         
         except Exception as e:
+            if isinstance(e, concurrent.futures.TimeoutError):
+                metrics.SCAN_TIMEOUTS.inc(pending)
             logger.error(f"Error en escaneo paralelo: {e}")
             return {
                 "error": f"Error en escaneo: {str(e)}",
                 "status": "scan_failed"
             }
+        finally:
+            metrics.EXECUTOR_QUEUE_DEPTH.dec(pending, executor="port_scan")
         
-        # Ordenar por número de puerto
-        results.sort(key=lambda x: x["port"])
+        return self._build_report(target, ip, ports_to_scan, results, time.perf_counter() - start_time)
+
+    def _ports_to_scan(self, ports: Optional[List[int]]) -> List[int]:
+        """Configuración de puertos"""
+        ports_to_scan = ports or self.COMMON_PORTS
+        
+        # Limitar en entornos restringidos
+        if self.is_render and len(ports_to_scan) > 25:
+            ports_to_scan = ports_to_scan[:25]
+            logger.warning("Limitado a 25 puertos en Render")
+        return ports_to_scan
+
+    def _build_report(self, target: str, ip: str, ports_to_scan: List[int],
+                      open_ports: HostPorts, scan_duration: float,
+                      service_name=None, state: Optional[str] = None) -> Dict:
+        """
+        Resultado final del escaneo (mismo formato en modo síncrono y asíncrono)
+
+        Los dicts por puerto abierto se arman recién aquí, ordenados por puerto.
+        """
+        results = open_ports.rows(service_name or self.get_service_name, state)
         
-        scan_duration = time.perf_counter() - start_time
+        metrics.STAGE_LATENCY.observe(scan_duration, stage="connect_sweep")
+        metrics.PORTS_SCANNED.inc(len(ports_to_scan))
+        metrics.OPEN_PORTS_FOUND.inc(len(results))
         
         return {
             "status": "completed",
@@ -213,11 +284,162 @@ class PortScanner:
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
         }
 
+    # --- Modo UDP ---
+
+    def scan_ports_udp(self, target: str, ports: Optional[List[int]] = None) -> Dict:
+        """
+        Escaneo UDP con payloads por protocolo (ver components/udp_scan.py)
+
+        open_ports incluye solo los puertos que respondieron; los que no
+        respondieron tras las retransmisiones van en open_filtered_ports.
+        """
+        with metrics.SCANS_IN_FLIGHT.track_inprogress():
+            is_valid, msg = self.validate_target(target)
+            if not is_valid:
+                return {"error": msg, "status": "invalid_target"}
+            
+            with metrics.STAGE_LATENCY.time(stage="dns_resolve"):
+                resolved, ip = self.resolve_host(target)
+            if not resolved:
+                return {"error": ip, "status": "resolution_failed"}
+            
+            ports_to_scan = self._ports_to_scan(ports or udp_scan.COMMON_UDP_PORTS)
+            start_time = time.perf_counter()
+            
+            with metrics.STAGE_LATENCY.time(stage="udp_sweep"):
+                states = udp_scan.scan_udp(ip, ports_to_scan, timeout=self.timeout * KNOWN_PORT_TIMEOUT_FACTOR)
+            
+            results = HostPorts()
+            counts = {state: 0 for state in (udp_scan.STATE_OPEN, udp_scan.STATE_CLOSED,
+                                             udp_scan.STATE_FILTERED, udp_scan.STATE_OPEN_FILTERED)}
+            open_filtered = []
+            for port, (state, rtt) in states.items():
+                counts[state] += 1
+                if state == udp_scan.STATE_OPEN:
+                    results.add(port, rtt)
+                elif state == udp_scan.STATE_OPEN_FILTERED:
+                    open_filtered.append(port)
+            
+            report = self._build_report(target, ip, ports_to_scan, results, time.perf_counter() - start_time,
+                                        service_name=lambda port: udp_scan.UDP_SERVICES.get(port, "unknown"),
+                                        state=udp_scan.STATE_OPEN)
+            report["protocol"] = "udp"
+            report["open_filtered_ports"] = sorted(open_filtered)
+            report["port_states"] = counts
+            return report
+
+    # --- Modo asíncrono (servidor ASGI) ---
+
+    async def resolve_host_async(self, target: str) -> Tuple[bool, str]:
+        """Resolución DNS sin bloquear el event loop"""
+        if target in self._dns_cache:
+            return True, self._dns_cache[target]
+        
+        try:
+            addr_info = await asyncio.get_running_loop().getaddrinfo(
+                target, None,
+                family=socket.AF_UNSPEC,
+                type=socket.SOCK_STREAM,
+                flags=socket.AI_ADDRCONFIG
+            )
+            ip = addr_info[0][4][0]
+            self._dns_cache[target] = ip
+            return True, ip
+        except socket.gaierror as e:
+            logger.error(f"DNS resolution failed for {target}: {e}")
+            return False, f"No se pudo resolver {target}"
+        except Exception as e:
+            logger.error(f"Unexpected error resolving {target}: {e}")
+            return False, f"Error: {str(e)}"
+
+    async def scan_port_async(self, ip: str, port: int,
+                              server_hostname: Optional[str] = None) -> Optional[OpenPort]:
+        """Equivalente asíncrono de scan_port (una corrutina en lugar de un hilo)"""
+        record = None
+        async with _connection_semaphore():
+            start = time.perf_counter()
+            writer = None
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(ip, port), timeout=self.port_timeout(port)
+                )
+                record = OpenPort(port, (time.perf_counter() - start) * 1000)
+                
+                # Handshake TLS sobre la misma conexión
+                if self.tls:
+                    record.tls = await tls_inspect.inspect_stream(writer, ip, port, server_hostname)
+            except (asyncio.TimeoutError, ConnectionRefusedError, OSError):
+                pass  # Puerto cerrado o filtrado
+            except Exception as e:
+                logger.debug(f"Error scanning port {port}: {e}")
+            finally:
+                if writer is not None:
+                    writer.close()
+        
+        return record
 
-def scan_website_ports(target: str, ports: Optional[List[int]] = None) -> Dict:
+    async def scan_ports_async(self, target: str, ports: Optional[List[int]] = None) -> Dict:
+        """
+        Escaneo concurrente sin hilos: cada puerto es una corrutina
+
+        Mismo contrato que scan_ports. El paralelismo por escaneo lo limita
+        max_workers y el total por proceso ASYNC_MAX_CONNECTIONS.
+        """
+        with metrics.SCANS_IN_FLIGHT.track_inprogress():
+            is_valid, msg = self.validate_target(target)
+            if not is_valid:
+                return {"error": msg, "status": "invalid_target"}
+            
+            with metrics.STAGE_LATENCY.time(stage="dns_resolve"):
+                resolved, ip = await self.resolve_host_async(target)
+            if not resolved:
+                return {"error": ip, "status": "resolution_failed"}
+            
+            ports_to_scan = self._ports_to_scan(ports)
+            start_time = time.perf_counter()
+            
+            pending = len(ports_to_scan)
+            metrics.EXECUTOR_QUEUE_DEPTH.inc(pending, executor="port_scan_async")
+            results = HostPorts()
+            sni = tls_inspect.sni_for(target) if self.tls else None
+            port_iter = iter(ports_to_scan)
+            
+            # max_workers corrutinas toman puertos de un iterador común: no
+            # se crea una tarea por puerto
+            async def sweep() -> None:
+                nonlocal pending
+                for port in port_iter:
+                    results.add_record(await self.scan_port_async(ip, port, sni))
+                    pending -= 1
+                    metrics.EXECUTOR_QUEUE_DEPTH.dec(executor="port_scan_async")
+            
+            workers = [asyncio.ensure_future(sweep())
+                       for _ in range(min(self.max_workers, len(ports_to_scan)))]
+            try:
+                await asyncio.wait_for(asyncio.gather(*workers),
+                                       timeout=len(ports_to_scan) * self.timeout + 5)
+            except asyncio.TimeoutError as e:
+                metrics.SCAN_TIMEOUTS.inc(pending)
+                logger.error(f"Error en escaneo asíncrono: {e}")
+                return {
+                    "error": "Error en escaneo: timeout global",
+                    "status": "scan_failed"
+                }
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                metrics.EXECUTOR_QUEUE_DEPTH.dec(pending, executor="port_scan_async")
+            
+            return self._build_report(target, ip, ports_to_scan, results, time.perf_counter() - start_time)
+
+
+def scan_website_ports(target: str, ports: Optional[List[int]] = None, protocol: str = "tcp",
+                       tls: bool = False) -> Dict:
     """Interfaz pública del escáner optimizado"""
     try:
-        scanner = PortScanner(timeout=1.5, max_workers=100)
+        scanner = PortScanner(timeout=DEFAULT_TIMEOUT, max_workers=DEFAULT_MAX_WORKERS, tls=tls)
+        if protocol == "udp":
+            return scanner.scan_ports_udp(target, ports)
         return scanner.scan_ports(target, ports)
     except Exception as e:
         logger.error(f"Error fatal: {e}")
@@ -227,10 +449,26 @@ def scan_website_ports(target: str, ports: Optional[List[int]] = None) -> Dict:
         }
 
 
-# Test rápido
+async def scan_website_ports_async(target: str, ports: Optional[List[int]] = None,
+                                   protocol: str = "tcp", tls: bool = False) -> Dict:
+    """Interfaz pública del escáner en modo asíncrono (servidor ASGI)"""
+    try:
+        scanner = PortScanner(timeout=DEFAULT_TIMEOUT, max_workers=DEFAULT_MAX_WORKERS, tls=tls)
+        if protocol == "udp":
+            # Un solo hilo con selector atiende todas las sondas del escaneo
+            return await asyncio.get_running_loop().run_in_executor(
+                None, scanner.scan_ports_udp, target, ports)
+        return await scanner.scan_ports_async(target, ports)
+    except Exception as e:
+        logger.error(f"Error fatal: {e}")
+        return {
+            "error": f"Error interno: {str(e)}",
+            "status": "failed"
+        }
+
+
+# python -m components.scan_website_ports ... equivale a: python cybertools.py scan ...
 if __name__ == "__main__":
-    result = scan_website_ports("google.com")
-    print(f"\nResultados: {result.get('open_count', 0)} puertos abiertos")
-    print(f"Tiempo: {result.get('scan_time', '?')}")
-    for port in result.get('open_ports', []):
-        print(f"  Puerto {port['port']}: {port['service']} ({port['response_time']})")
+    import sys
+    from components.cli import main
+    sys.exit(main(["scan", *sys.argv[1:]]))
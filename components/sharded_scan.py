@@ -0,0 +1,438 @@
+"""
+Escaneo Distribuido por Shards
+Reparte el espacio target × puertos de un barrido grande en shards que
+procesan varios procesos worker, cada uno con su propio event loop de
+conexiones (sock_connect sin streams). El proceso coordinador solo
+reparte shards y arma los reportes: el trabajo por puerto ya no comparte
+un único GIL.
+
+    - Presupuesto global de conexiones/s compartido por todos los workers
+      locales (GCRA sobre un double en memoria compartida; cada worker
+      reserva tandas de tokens, no uno por conexión)
+    - Los resultados vuelven por un canal por worker (Pipe o socket, un
+      solo productor y un solo consumidor: sin lock compartido entre
+      workers); el coordinador los multiplexa con connection.wait()
+    - Cada worker tiene hasta SHARD_PIPELINE shards asignados, así nunca
+      espera al coordinador; un worker que muere devuelve sus shards a la cola
+
+El coordinador es intercambiable: LocalCoordinator lanza procesos en esta
+máquina y SocketCoordinator espera workers remotos por TCP
+(`python cybertools.py scan-worker HOST:PUERTO`), con el mismo protocolo
+de mensajes. En modo socket el presupuesto se divide en partes iguales
+entre los workers conectados.
+
+    python cybertools.py scan -f hosts.txt -p 1-65535 --shards 8 --rate 20000
+"""
+
+import os
+import time
+import socket
+import asyncio
+import logging
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import Connection, Listener, Client, wait
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Windows
+    RESOURCE_AVAILABLE = False
+
+from components import metrics
+from components import tls_inspect
+from components.scan_website_ports import PortScanner, DEFAULT_TIMEOUT
+from components.scan_results import HostPorts
+
+logger = logging.getLogger(__name__)
+
+# Procesos worker (0 = núcleos disponibles)
+DEFAULT_PROCESSES = int(os.environ.get('SCAN_SHARD_PROCESSES', 0))
+# Conexiones por segundo entre todos los workers (0 = sin límite)
+DEFAULT_RATE = float(os.environ.get('SCAN_SHARD_RATE', 5000))
+# Conexiones simultáneas por worker (acotado además por RLIMIT_NOFILE)
+DEFAULT_CONCURRENCY = int(os.environ.get('SCAN_SHARD_CONCURRENCY', 500))
+# Puertos por shard: reparto fino sin un mensaje por puerto
+SHARD_PORTS = 1024
+# Shards asignados a la vez a cada worker
+SHARD_PIPELINE = 2
+# Un shard cuyo worker murió se reintenta hasta esta cantidad de veces
+SHARD_MAX_ATTEMPTS = 2
+# Tokens reservados por tanda: a lo sumo ~20ms de ráfaga por worker
+RATE_BATCH_SECONDS = 0.02
+# Descriptores que se dejan libres para el resto del proceso
+RESERVED_FDS = 64
+
+
+class RateBudget:
+    """
+    Presupuesto de conexiones/s compartido entre procesos (GCRA)
+
+    Un solo double compartido guarda el "tiempo teórico de llegada": reservar
+    n tokens lo avanza n/rate segundos y devuelve cuándo se pueden usar.
+    No acumula crédito si nadie consume. time.monotonic() es el mismo reloj
+    en todos los procesos de la máquina.
+    """
+
+    def __init__(self, rate: float, context=multiprocessing):
+        self.rate = rate
+        self._tat = context.Value('d', 0.0)
+
+    def reserve(self, tokens: int) -> float:
+        """Reserva tokens y devuelve el instante (monotonic) desde el que valen"""
+        with self._tat.get_lock():
+            start = max(time.monotonic(), self._tat.value)
+            self._tat.value = start + tokens / self.rate
+        return start
+
+
+class _RateGate:
+    """Lado del worker: consume tokens de tandas reservadas en el RateBudget"""
+
+    def __init__(self, budget: Optional[RateBudget]):
+        self.budget = budget
+        self.batch = max(1, int(budget.rate * RATE_BATCH_SECONDS)) if budget else 0
+        self.tokens = 0
+        self.interval = 1 / budget.rate if budget else 0
+        self.next_at = 0.0
+
+    async def acquire(self) -> None:
+        if self.budget is None:
+            return
+        # Reserva, descuento y turno sin ningún await en medio: los shards del
+        # worker comparten la puerta y cada llamada se lleva su propio token
+        if self.tokens <= 0:
+            self.next_at = self.budget.reserve(self.batch)
+            self.tokens = self.batch
+        self.tokens -= 1
+        # Los tokens de la tanda se reparten a lo largo de su ventana
+        at = self.next_at
+        self.next_at += self.interval
+        delay = at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _concurrency_limit(requested: int) -> int:
+    if not RESOURCE_AVAILABLE:
+        return requested
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return requested
+    return max(1, min(requested, soft - RESERVED_FDS))
+
+
+# --- Worker ---
+
+class _ShardEngine:
+    """Motor de conexiones de un worker: varios shards a la vez con un límite común"""
+
+    def __init__(self, conn: Connection, config: Dict[str, Any], budget: Optional[RateBudget]):
+        self.conn = conn
+        self.scanner = PortScanner(timeout=config["timeout"])
+        self.tls = config["tls"]
+        self.limit = asyncio.Semaphore(_concurrency_limit(config["concurrency"]))
+        self.gate = _RateGate(budget)
+
+    async def probe(self, ip: str, port: int, family: int, sni: Optional[str],
+                    found: HostPorts) -> None:
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            start = time.perf_counter()
+            await asyncio.wait_for(loop.sock_connect(sock, (ip, port)),
+                                   timeout=self.scanner.port_timeout(port))
+            rtt = (time.perf_counter() - start) * 1000
+            tls = None
+            if self.tls:
+                _, writer = await asyncio.open_connection(sock=sock)
+                sock = None  # ahora es del transporte
+                try:
+                    tls = await tls_inspect.inspect_stream(writer, ip, port, sni)
+                finally:
+                    writer.close()
+            found.add(port, rtt, tls)
+        except (asyncio.TimeoutError, OSError):
+            pass  # Puerto cerrado o filtrado
+        except Exception as e:
+            # Nunca debe impedir que el shard se reporte
+            logger.debug(f"Error scanning port {port}: {e}")
+        finally:
+            if sock is not None:
+                sock.close()
+            self.limit.release()
+
+    async def run_shard(self, shard_id: int, ip: str, ports: List[int], sni: Optional[str]) -> None:
+        family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+        found = HostPorts()
+        probes = []
+        for port in ports:
+            await self.gate.acquire()
+            await self.limit.acquire()
+            probes.append(asyncio.ensure_future(self.probe(ip, port, family, sni, found)))
+        await asyncio.gather(*probes)
+        # Un mensaje por shard: solo los puertos abiertos cruzan el canal
+        # (dos arrays y el bitmap: unos KB aunque el shard tenga 1024 puertos)
+        self.conn.send(("done", shard_id, found))
+
+    async def serve(self) -> None:
+        loop = asyncio.get_running_loop()
+        running = set()
+        while True:
+            # recv bloquea: en un hilo, mientras los shards ya asignados avanzan
+            message = await loop.run_in_executor(None, self.conn.recv)
+            if message[0] == "stop":
+                break
+            task = asyncio.ensure_future(self.run_shard(*message[1:]))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        if running:
+            await asyncio.gather(*running)
+
+
+def serve(conn: Connection, budget: Optional[RateBudget] = None) -> None:
+    """
+    Atiende shards de un coordinador hasta recibir ("stop",)
+
+    El primer mensaje es ("config", {...}); sin presupuesto compartido
+    (worker remoto) se usa uno propio con el rate de la config.
+    """
+    try:
+        _, config = conn.recv()
+        if budget is None and config.get("rate"):
+            budget = RateBudget(config["rate"])
+        asyncio.run(_ShardEngine(conn, config, budget).serve())
+    except (EOFError, ConnectionError, KeyboardInterrupt):
+        pass
+    finally:
+        conn.close()
+
+
+def connect_worker(address: Tuple[str, int], authkey: bytes) -> None:
+    """Worker remoto: se conecta a un SocketCoordinator y atiende sus shards"""
+    serve(Client(address, authkey=authkey))
+
+
+# --- Coordinadores ---
+
+class LocalCoordinator:
+    """Workers en procesos de esta máquina, conectados por Pipe"""
+
+    def __init__(self, processes: int = DEFAULT_PROCESSES):
+        self.processes = processes or os.cpu_count() or 1
+        # spawn: el coordinador puede tener hilos (servidor, executors)
+        self._context = multiprocessing.get_context('spawn')
+        self._workers: List[multiprocessing.process.BaseProcess] = []
+        self._budget: Optional[RateBudget] = None
+
+    def start(self, config: Dict[str, Any]) -> List[Connection]:
+        # Referencia hasta close(): los workers lo des-serializan al arrancar
+        self._budget = RateBudget(config["rate"], self._context) if config.get("rate") else None
+        conns = []
+        for _ in range(self.processes):
+            parent, child = self._context.Pipe()
+            worker = self._context.Process(target=serve, args=(child, self._budget), daemon=True)
+            worker.start()
+            child.close()
+            parent.send(("config", config))
+            conns.append(parent)
+            self._workers.append(worker)
+        return conns
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers.clear()
+        self._budget = None
+
+
+class SocketCoordinator:
+    """
+    Workers remotos que se conectan por TCP (multiprocessing.connection)
+
+    authkey es obligatoria: autentica a los workers con HMAC antes de
+    intercambiar ningún mensaje.
+    """
+
+    def __init__(self, address: Tuple[str, int], workers: int, authkey: bytes):
+        if not authkey:
+            raise ValueError("El coordinador por socket requiere una authkey (SCAN_SHARD_AUTHKEY)")
+        self.address = address
+        self.workers = workers
+        self.authkey = authkey
+        self._listener: Optional[Listener] = None
+
+    def start(self, config: Dict[str, Any]) -> List[Connection]:
+        self._listener = Listener(self.address, authkey=self.authkey)
+        logger.info(f"Esperando {self.workers} workers en {self.address[0]}:{self.address[1]}")
+        # Bloquea hasta que se conecten todos (los que fallan la authkey se descartan)
+        conns = []
+        while len(conns) < self.workers:
+            try:
+                conns.append(self._listener.accept())
+            except (multiprocessing.AuthenticationError, OSError) as e:
+                logger.warning(f"Conexión de worker rechazada: {e}")
+        share = dict(config, rate=config["rate"] / len(conns) if config.get("rate") else 0)
+        for conn in conns:
+            conn.send(("config", share))
+        return conns
+
+    def close(self) -> None:
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+
+# --- Reparto y armado de reportes ---
+
+class _TargetState:
+    __slots__ = ("target", "ip", "ports", "shards_left", "found", "failed_ports", "started")
+
+    def __init__(self, target: str, ip: str, ports: List[int], shards: int):
+        self.target = target
+        self.ip = ip
+        self.ports = ports
+        self.shards_left = shards
+        self.found = HostPorts()
+        self.failed_ports = 0
+        self.started = time.perf_counter()
+
+
+class ShardedScanner:
+    """Escaneo TCP de muchos targets/puertos repartido entre workers"""
+
+    def __init__(self, coordinator=None, processes: int = DEFAULT_PROCESSES,
+                 rate: float = DEFAULT_RATE, concurrency: int = DEFAULT_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT, tls: bool = False, shard_ports: int = SHARD_PORTS):
+        self.coordinator = coordinator or LocalCoordinator(processes)
+        self.config = {"rate": rate, "concurrency": concurrency, "timeout": timeout, "tls": tls}
+        self.tls = tls
+        self.shard_ports = shard_ports
+        self.scanner = PortScanner(timeout=timeout, tls=tls)
+
+    def _shards(self, targets: Iterable[str], ports: List[int],
+                errors: deque) -> Iterator[Tuple[_TargetState, List[int], Optional[str]]]:
+        """Resuelve cada target cuando hace falta y lo parte en shards de puertos"""
+        ports = self.scanner._ports_to_scan(ports)
+        for target in targets:
+            is_valid, msg = self.scanner.validate_target(target)
+            if not is_valid:
+                errors.append({"target": target, "error": msg, "status": "invalid_target"})
+                continue
+            with metrics.STAGE_LATENCY.time(stage="dns_resolve"):
+                resolved, ip = self.scanner.resolve_host(target)
+            if not resolved:
+                errors.append({"target": target, "error": ip, "status": "resolution_failed"})
+                continue
+            chunks = [ports[i:i + self.shard_ports] for i in range(0, len(ports), self.shard_ports)]
+            state = _TargetState(target, ip, ports, len(chunks))
+            sni = tls_inspect.sni_for(target) if self.tls else None
+            for chunk in chunks:
+                yield state, chunk, sni
+
+    def _report(self, state: _TargetState) -> Dict[str, Any]:
+        report = self.scanner._build_report(state.target, state.ip, state.ports, state.found,
+                                            time.perf_counter() - state.started)
+        if state.failed_ports:
+            report["status"] = "partial"
+            report["unscanned_ports"] = state.failed_ports
+        return {"target": state.target, **report}
+
+    def scan(self, targets: Iterable[str], ports: Optional[List[int]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Escanea targets (iterable perezoso) y entrega un reporte por target
+        cuando terminan todos sus shards, con el mismo formato que scan_ports
+        """
+        errors: deque = deque()
+        source = self._shards(targets, ports or PortScanner.COMMON_PORTS, errors)
+        queue: deque = deque()  # (intentos, state, puertos, sni) a reintentar
+        shard_seq = 0
+        in_flight: Dict[int, Tuple[int, _TargetState, List[int], Optional[str]]] = {}
+        assigned: Dict[Connection, set] = {}
+        exhausted = False
+
+        def next_shard():
+            nonlocal exhausted
+            if queue:
+                return queue.popleft()
+            if not exhausted:
+                item = next(source, None)
+                if item is not None:
+                    return (0,) + item
+                exhausted = True
+            return None
+
+        def dispatch(conn: Connection) -> None:
+            nonlocal shard_seq
+            while len(assigned[conn]) < SHARD_PIPELINE:
+                shard = next_shard()
+                if shard is None:
+                    return
+                shard_seq += 1
+                attempts, state, chunk, sni = shard
+                in_flight[shard_seq] = (attempts + 1, state, chunk, sni)
+                assigned[conn].add(shard_seq)
+                conn.send(("shard", shard_seq, state.ip, chunk, sni))
+                metrics.SCAN_SHARDS.inc(event="dispatched")
+
+        conns = self.coordinator.start(self.config)
+        try:
+            for conn in conns:
+                assigned[conn] = set()
+                dispatch(conn)
+            while assigned:
+                while errors:
+                    yield errors.popleft()
+                if not in_flight:
+                    break
+                for conn in wait(list(assigned)):
+                    try:
+                        _, shard_id, found = conn.recv()
+                    except (EOFError, OSError):
+                        # Worker caído: sus shards vuelven a la cola
+                        for shard_id in assigned.pop(conn):
+                            attempts, state, chunk, sni = in_flight.pop(shard_id)
+                            if attempts < SHARD_MAX_ATTEMPTS:
+                                metrics.SCAN_SHARDS.inc(event="retried")
+                                queue.append((attempts, state, chunk, sni))
+                            else:
+                                metrics.SCAN_SHARDS.inc(event="failed")
+                                state.failed_ports += len(chunk)
+                                state.shards_left -= 1
+                                if state.shards_left == 0:
+                                    yield self._report(state)
+                        logger.warning(f"Worker desconectado; quedan {len(assigned)}")
+                        for other in assigned:
+                            dispatch(other)
+                        continue
+                    assigned[conn].discard(shard_id)
+                    _, state, _, _ = in_flight.pop(shard_id)
+                    metrics.SCAN_SHARDS.inc(event="completed")
+                    state.found.merge(found)
+                    state.shards_left -= 1
+                    if state.shards_left == 0:
+                        yield self._report(state)
+                    dispatch(conn)
+            while errors:
+                yield errors.popleft()
+            if in_flight or queue or not exhausted:
+                raise RuntimeError("Todos los workers se desconectaron antes de terminar el escaneo")
+        finally:
+            for conn in assigned:
+                try:
+                    conn.send(("stop",))
+                except OSError:
+                    pass
+            for conn in conns:
+                conn.close()
+            self.coordinator.close()
+
+
+def scan_sharded(targets: Iterable[str], ports: Optional[List[int]] = None,
+                 **options) -> Iterator[Dict[str, Any]]:
+    """Interfaz pública: un reporte por target (ver ShardedScanner)"""
+    return ShardedScanner(**options).scan(targets, ports)
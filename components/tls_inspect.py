@@ -0,0 +1,298 @@
+"""
+Inspección TLS de Puertos Abiertos
+Hace el handshake TLS sobre la conexión que el escáner ya abrió y registra
+el certificado (sujeto, SANs, emisor, validez, clave), la versión y el
+cifrado negociados, y marca configuraciones débiles.
+
+- Los handshakes comparten un límite de concurrencia global (hilos y event
+  loop por separado).
+- Los resultados (también "no habla TLS") se cachean por ip:puerto (y SNI)
+  con TTL, así un host re-escaneado no repite handshakes.
+- No se verifica el certificado: justamente interesa ver los inválidos.
+  Se reporta la configuración negociada con un cliente moderno, no la lista
+  de todas las versiones/cifrados que el servidor aceptaría.
+"""
+
+import os
+import ssl
+import time
+import socket
+import asyncio
+import weakref
+import logging
+import threading
+import ipaddress
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple
+
+from components import metrics
+from components.x509 import parse_certificate, X509Error
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Puertos donde TLS es lo esperado (el resto de puertos abiertos se prueba igual)
+TLS_PORTS = {443, 465, 636, 853, 989, 990, 993, 995, 5061, 6443, 8443, 9443}
+
+MAX_CONCURRENT_HANDSHAKES = int(os.environ.get('SCAN_TLS_MAX_CONCURRENT', 32))
+CACHE_TTL = float(os.environ.get('SCAN_TLS_CACHE_TTL', 600))
+CACHE_MAX_ENTRIES = 2048
+HANDSHAKE_TIMEOUT = 3.0
+# Puertos fuera de TLS_PORTS: el handshake es especulativo, se espera menos
+SPECULATIVE_HANDSHAKE_TIMEOUT = 1.0
+EXPIRY_WARNING_DAYS = 30
+# Motivos de ssl.SSLError que indican que el par respondió algo que no es TLS
+NON_TLS_REPLY_REASONS = {
+    'WRONG_VERSION_NUMBER', 'UNKNOWN_PROTOCOL', 'PACKET_LENGTH_TOO_LONG',
+    'RECORD_LENGTH_MISMATCH', 'HTTP_REQUEST', 'HTTPS_PROXY_REQUEST'
+}
+
+WEAK_PROTOCOLS = {'SSLv2', 'SSLv3', 'TLSv1', 'TLSv1.1'}
+WEAK_CIPHER_MARKERS = ('NULL', 'EXPORT', 'RC4', 'DES', '3DES', 'MD5', 'ANON', 'ADH', 'AECDH')
+WEAK_SIGNATURES = {'md5WithRSAEncryption', 'sha1WithRSAEncryption', 'ecdsa-with-SHA1'}
+MIN_KEY_BITS = {'RSA': 2048, 'EC': 256}
+
+_thread_limit = threading.BoundedSemaphore(MAX_CONCURRENT_HANDSHAKES)
+_loop_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _async_limit() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    limit = _loop_limits.get(loop)
+    if limit is None:
+        limit = _loop_limits[loop] = asyncio.Semaphore(MAX_CONCURRENT_HANDSHAKES)
+    return limit
+
+
+def _client_context() -> ssl.SSLContext:
+    """Contexto sin verificación que acepta versiones y cifrados antiguos para poder reportarlos"""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    try:
+        context.minimum_version = ssl.TLSVersion.TLSv1
+        context.set_ciphers('ALL:@SECLEVEL=0')
+    except (ValueError, ssl.SSLError):
+        pass  # OpenSSL compilado sin soporte: se usa la configuración por defecto
+    return context
+
+
+CLIENT_CONTEXT = _client_context()
+
+
+class TlsCache:
+    """Caché LRU con TTL de resultados de inspección"""
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, result = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            # {} = se comprobó que el puerto no habla TLS
+            return dict(result, cached=True) if result else {}
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+cache = TlsCache()
+
+
+def cache_key(ip: str, port: int, server_hostname: Optional[str]) -> str:
+    # El certificado puede depender del SNI, por eso forma parte de la clave
+    return f"{ip}:{port}/{server_hostname or ''}"
+
+
+def _hostname_matches(hostname: str, cert: Dict[str, Any]) -> bool:
+    hostname = hostname.lower().rstrip('.')
+    names = [n[4:].lower() for n in cert["san"] if n.startswith('DNS:')]
+    if not names and 'CN' in cert["subject"]:
+        names = [cert["subject"]["CN"].lower()]
+    for name in names:
+        if name == hostname:
+            return True
+        # Comodín solo en la etiqueta izquierda: *.example.com
+        if name.startswith('*.') and '.' in hostname and hostname.split('.', 1)[1] == name[2:]:
+            return True
+    return False
+
+
+def weak_flags(version: Optional[str], cipher: Optional[Tuple[str, str, int]],
+               cert: Optional[Dict[str, Any]], server_hostname: Optional[str]) -> List[str]:
+    """Lista de problemas de configuración detectados"""
+    flags = []
+    if version in WEAK_PROTOCOLS:
+        flags.append(f"Protocolo obsoleto negociado: {version}")
+    if cipher:
+        name, _, bits = cipher
+        if any(marker in name.upper() for marker in WEAK_CIPHER_MARKERS):
+            flags.append(f"Cifrado débil: {name}")
+        elif bits and bits < 128:
+            flags.append(f"Cifrado de {bits} bits")
+        if version and version != 'TLSv1.3' and not any(kx in name for kx in ('ECDHE', 'DHE')):
+            flags.append("Sin secreto perfecto hacia adelante (PFS)")
+
+    if cert is None:
+        return flags
+
+    now = datetime.now(timezone.utc)
+    if cert["not_after"] < now:
+        flags.append("Certificado vencido")
+    elif (cert["not_after"] - now).days < EXPIRY_WARNING_DAYS:
+        flags.append(f"Certificado vence en {(cert['not_after'] - now).days} días")
+    if cert["not_before"] > now:
+        flags.append("Certificado aún no válido")
+    if cert["subject"] == cert["issuer"]:
+        flags.append("Certificado autofirmado")
+    if cert["signature_algorithm"] in WEAK_SIGNATURES:
+        flags.append(f"Firma débil: {cert['signature_algorithm']}")
+    key = cert["public_key"]
+    minimum = MIN_KEY_BITS.get(key["type"])
+    if minimum and key["bits"] and key["bits"] < minimum:
+        flags.append(f"Clave {key['type']} de {key['bits']} bits")
+    if server_hostname and not _hostname_matches(server_hostname, cert):
+        flags.append(f"El certificado no corresponde a {server_hostname}")
+    return flags
+
+
+def describe(ssl_object, server_hostname: Optional[str]) -> Dict[str, Any]:
+    """Resultado de la inspección a partir de un SSLSocket/SSLObject con handshake hecho"""
+    version = ssl_object.version()
+    cipher = ssl_object.cipher()
+    der = ssl_object.getpeercert(binary_form=True)
+
+    cert = None
+    certificate = None
+    if der:
+        try:
+            cert = parse_certificate(der)
+            now = datetime.now(timezone.utc)
+            certificate = {
+                "subject": cert["subject"],
+                "issuer": cert["issuer"],
+                "san": cert["san"],
+                "not_before": cert["not_before"].strftime("%Y-%m-%d %H:%M:%S"),
+                "not_after": cert["not_after"].strftime("%Y-%m-%d %H:%M:%S"),
+                "days_left": (cert["not_after"] - now).days,
+                "serial": cert["serial"],
+                "signature_algorithm": cert["signature_algorithm"],
+                "public_key": cert["public_key"],
+                "self_signed": cert["subject"] == cert["issuer"]
+            }
+        except X509Error as e:
+            certificate = {"error": str(e)}
+
+    return {
+        "version": version,
+        "cipher": cipher[0] if cipher else None,
+        "cipher_bits": cipher[2] if cipher else None,
+        "certificate": certificate,
+        "weak": weak_flags(version, cipher, cert, server_hostname),
+        "cached": False
+    }
+
+
+def handshake_timeout(port: int) -> float:
+    return HANDSHAKE_TIMEOUT if port in TLS_PORTS else SPECULATIVE_HANDSHAKE_TIMEOUT
+
+
+def sni_for(target: str) -> Optional[str]:
+    """Nombre para SNI (None si el target es una IP)"""
+    try:
+        ipaddress.ip_address(target)
+        return None
+    except ValueError:
+        return target
+
+
+def _handshake_failed(key: str, ip: str, port: int, error: Exception) -> None:
+    """
+    Solo se cachea un "no habla TLS" seguro (el par respondió algo que no es
+    TLS). Timeouts, resets, cierres a mitad del handshake y demás errores
+    pueden ser pasajeros: no se cachean para no ocultar el servicio durante
+    CACHE_TTL.
+    """
+    if isinstance(error, ssl.SSLError) and getattr(error, 'reason', None) in NON_TLS_REPLY_REASONS:
+        metrics.TLS_HANDSHAKES.inc(result="no_tls")
+        logger.debug(f"Sin TLS en {ip}:{port}: {error}")
+        cache.put(key, {})
+    else:
+        metrics.TLS_HANDSHAKES.inc(result="failed")
+        logger.debug(f"Handshake TLS fallido en {ip}:{port} (no se cachea): {error!r}")
+
+
+def inspect_socket(sock: socket.socket, ip: str, port: int, server_hostname: Optional[str],
+                   timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Handshake TLS sobre un socket ya conectado (modo con hilos)
+
+    El socket queda inutilizable para otros usos: se envuelve y se cierra.
+
+    Returns:
+        Resultado de la inspección o None si el puerto no habla TLS
+    """
+    key = cache_key(ip, port, server_hostname)
+    cached = cache.get(key)
+    if cached is not None:
+        metrics.TLS_HANDSHAKES.inc(result="cached")
+        return cached or None
+
+    with _thread_limit, metrics.STAGE_LATENCY.time(stage="tls_handshake"):
+        sock.settimeout(timeout or handshake_timeout(port))
+        try:
+            with CLIENT_CONTEXT.wrap_socket(sock, server_hostname=server_hostname) as tls_sock:
+                result = describe(tls_sock, server_hostname)
+        except (ssl.SSLError, OSError, ValueError) as e:
+            _handshake_failed(key, ip, port, e)
+            return None
+
+    metrics.TLS_HANDSHAKES.inc(result="ok")
+    cache.put(key, result)
+    return result
+
+
+async def inspect_stream(writer: asyncio.StreamWriter, ip: str, port: int,
+                         server_hostname: Optional[str],
+                         timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Equivalente asíncrono de inspect_socket sobre la conexión del escáner asíncrono"""
+    key = cache_key(ip, port, server_hostname)
+    cached = cache.get(key)
+    if cached is not None:
+        metrics.TLS_HANDSHAKES.inc(result="cached")
+        return cached or None
+
+    async with _async_limit():
+        with metrics.STAGE_LATENCY.time(stage="tls_handshake"):
+            try:
+                await asyncio.wait_for(
+                    writer.start_tls(CLIENT_CONTEXT, server_hostname=server_hostname),
+                    timeout=timeout or handshake_timeout(port)
+                )
+                result = describe(writer.get_extra_info('ssl_object'), server_hostname)
+            except (ssl.SSLError, OSError, ValueError, asyncio.TimeoutError) as e:
+                _handshake_failed(key, ip, port, e)
+                return None
+
+    metrics.TLS_HANDSHAKES.inc(result="ok")
+    cache.put(key, result)
+    return result
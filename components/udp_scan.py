@@ -0,0 +1,234 @@
+"""
+Escaneo de Puertos UDP
+Envía a cada puerto un payload válido para su protocolo (DNS, NTP, SNMP,
+NetBIOS, SSDP...) desde un socket UDP "conectado": así el kernel entrega el
+ICMP port-unreachable como ConnectionRefusedError en ese mismo socket.
+
+Un solo hilo atiende cientos de sondas a la vez con un selector; las que no
+reciben respuesta se retransmiten con backoff exponencial.
+
+Estados por puerto:
+    open           llegó una respuesta UDP
+    closed         llegó ICMP port-unreachable
+    filtered       llegó otro ICMP de destino inalcanzable (p. ej. prohibido)
+    open|filtered  sin respuesta tras todas las retransmisiones
+"""
+
+import os
+import time
+import socket
+import struct
+import selectors
+from typing import Dict, List, Optional, Tuple
+
+STATE_OPEN = 'open'
+STATE_CLOSED = 'closed'
+STATE_FILTERED = 'filtered'
+STATE_OPEN_FILTERED = 'open|filtered'
+
+DEFAULT_UDP_TIMEOUT = 1.0
+DEFAULT_UDP_RETRIES = 2
+DEFAULT_BACKOFF = 2.0
+DEFAULT_MAX_IN_FLIGHT = 256
+
+UDP_SERVICES = {
+    53: "DNS", 67: "DHCP", 69: "TFTP", 111: "RPCbind", 123: "NTP",
+    137: "NetBIOS-NS", 161: "SNMP", 500: "IKE", 514: "Syslog",
+    1434: "MSSQL-Browser", 1900: "SSDP", 5060: "SIP", 5353: "mDNS",
+    11211: "Memcached"
+}
+
+# Syslog (514) no se incluye: nunca responde, así que solo distinguiría cerrado
+COMMON_UDP_PORTS = [53, 67, 69, 111, 123, 137, 161, 500, 1900, 5353]
+
+
+# --- Payloads por protocolo ---
+
+def _dns_query() -> bytes:
+    # Consulta NS de la raíz: la responde cualquier servidor DNS
+    header = struct.pack('>HHHHHH', 0x4354, 0x0100, 1, 0, 0, 0)
+    return header + b'\x00' + struct.pack('>HH', 2, 1)
+
+
+def _ber(tag: int, content: bytes) -> bytes:
+    # Longitudes cortas alcanzan para los mensajes de sondeo (< 128 bytes)
+    return bytes([tag, len(content)]) + content
+
+
+def _snmp_get() -> bytes:
+    # SNMPv1 GetRequest de sysDescr.0 con la comunidad "public"
+    oid = bytes([0x2b, 6, 1, 2, 1, 1, 1, 0])  # 1.3.6.1.2.1.1.1.0
+    varbind = _ber(0x30, _ber(0x06, oid) + b'\x05\x00')
+    pdu = _ber(0xa0, _ber(0x02, b'\x43\x54\x00\x01') + _ber(0x02, b'\x00') +
+               _ber(0x02, b'\x00') + _ber(0x30, varbind))
+    return _ber(0x30, _ber(0x02, b'\x00') + _ber(0x04, b'public') + pdu)
+
+
+def _netbios_status() -> bytes:
+    # NBSTAT del nombre comodín "*"
+    name = b'\x20' + b'CK' + b'A' * 30 + b'\x00'
+    return struct.pack('>HHHHHH', 0x4354, 0, 1, 0, 0, 0) + name + struct.pack('>HH', 0x21, 1)
+
+
+def _rpc_null_call() -> bytes:
+    # Llamada NULL a portmapper (programa 100000, versión 2)
+    return struct.pack('>IIIIIIIIII', 0x43540001, 0, 2, 100000, 2, 0, 0, 0, 0, 0)
+
+
+def _dhcp_discover() -> bytes:
+    # BOOTREQUEST con DHCPDISCOVER y una MAC localmente administrada
+    chaddr = b'\x02\x43\x54\x00\x00\x01'.ljust(16, b'\x00')
+    header = struct.pack('>BBBBIHH', 1, 1, 6, 0, 0x43540001, 0, 0) + b'\x00' * 16 + chaddr
+    options = b'\x35\x01\x01' + b'\x37\x03\x01\x03\x06' + b'\xff'
+    return header + b'\x00' * 192 + b'\x63\x82\x53\x63' + options
+
+
+def _ike_payload(next_payload: int, content: bytes) -> bytes:
+    return struct.pack('>BBH', next_payload, 0, len(content) + 4) + content
+
+
+def _ike_sa_init() -> bytes:
+    # IKEv2 IKE_SA_INIT (AES-CBC-128, HMAC-SHA1, MODP-2048): un respondedor
+    # contesta aunque no acepte la propuesta (NO_PROPOSAL_CHOSEN, INVALID_KE)
+    def transform(last: bool, kind: int, ident: int, attributes: bytes = b'') -> bytes:
+        return _ike_payload(0 if last else 3, struct.pack('>BBH', kind, 0, ident) + attributes)
+
+    transforms = (transform(False, 1, 12, struct.pack('>HH', 0x800e, 128)) +
+                  transform(False, 2, 2) + transform(False, 3, 2) + transform(True, 4, 14))
+    proposal = _ike_payload(0, struct.pack('>BBBB', 1, 1, 0, 4) + transforms)
+    payloads = (_ike_payload(34, proposal) +                                    # SA
+                _ike_payload(40, struct.pack('>HH', 14, 0) + os.urandom(256)) +  # KE
+                _ike_payload(0, os.urandom(32)))                                # Nonce
+    return (b'cybertls' + b'\x00' * 8 +
+            struct.pack('>BBBBII', 33, 0x20, 34, 0x08, 0, 28 + len(payloads)) + payloads)
+
+
+UDP_PROBES: Dict[int, bytes] = {
+    53: _dns_query(),
+    67: _dhcp_discover(),
+    69: b'\x00\x01cybertools\x00netascii\x00',  # RRQ: un servidor TFTP responde con error
+    111: _rpc_null_call(),
+    123: b'\x1b' + b'\x00' * 47,  # NTPv3, modo cliente
+    137: _netbios_status(),
+    161: _snmp_get(),
+    500: _ike_sa_init(),
+    1434: b'\x02',
+    1900: (b'M-SEARCH * HTTP/1.1\r\nHOST: 239.255.255.250:1900\r\n'
+           b'MAN: "ssdp:discover"\r\nMX: 1\r\nST: ssdp:all\r\n\r\n'),
+    5060: (b'OPTIONS sip:nm SIP/2.0\r\nVia: SIP/2.0/UDP nm;branch=z9hG4bK-cybertools\r\n'
+           b'From: <sip:nm@nm>;tag=cybertools\r\nTo: <sip:nm2@nm2>\r\nCall-ID: cybertools\r\n'
+           b'CSeq: 1 OPTIONS\r\nMax-Forwards: 70\r\nContent-Length: 0\r\n\r\n'),
+    5353: _dns_query(),
+    # Comando "version" (no "stats", que amplifica la respuesta)
+    11211: b'\x00\x01\x00\x00\x00\x01\x00\x00version\r\n',
+}
+
+
+def probe_payload(port: int) -> bytes:
+    """Payload de sondeo de un puerto (vacío si no hay uno específico)"""
+    return UDP_PROBES.get(port, b'')
+
+
+class _Probe:
+    """Sonda en vuelo"""
+
+    __slots__ = ('port', 'sock', 'attempts', 'deadline', 'sent_at')
+
+    def __init__(self, port: int, sock: socket.socket):
+        self.port = port
+        self.sock = sock
+        self.attempts = 0
+        self.deadline = 0.0
+        self.sent_at = 0.0
+
+
+def scan_udp(ip: str, ports: List[int], timeout: float = DEFAULT_UDP_TIMEOUT,
+             retries: int = DEFAULT_UDP_RETRIES, backoff: float = DEFAULT_BACKOFF,
+             max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> Dict[int, Tuple[str, Optional[float]]]:
+    """
+    Sondea puertos UDP de un host desde un único hilo
+
+    Args:
+        ip: Dirección IPv4 o IPv6 ya resuelta
+        ports: Puertos a sondear
+        timeout: Espera de la primera respuesta (segundos)
+        retries: Retransmisiones antes de declarar open|filtered
+        backoff: Factor de crecimiento de la espera en cada retransmisión
+        max_in_flight: Sockets abiertos simultáneamente como máximo
+
+    Returns:
+        {puerto: (estado, tiempo de respuesta en ms o None)}
+    """
+    family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+    results: Dict[int, Tuple[str, Optional[float]]] = {}
+    queue = list(reversed(dict.fromkeys(ports)))
+    in_flight: Dict[int, _Probe] = {}
+    selector = selectors.DefaultSelector()
+
+    def finish(probe: _Probe, state: str, rtt: Optional[float] = None) -> None:
+        results[probe.port] = (state, rtt)
+        in_flight.pop(probe.port, None)
+        selector.unregister(probe.sock)
+        probe.sock.close()
+
+    def send(probe: _Probe) -> None:
+        now = time.perf_counter()
+        probe.sent_at = now
+        probe.deadline = now + timeout * (backoff ** probe.attempts)
+        probe.attempts += 1
+        try:
+            probe.sock.send(probe_payload(probe.port))
+        except ConnectionRefusedError:
+            # ICMP de un envío anterior
+            finish(probe, STATE_CLOSED)
+        except OSError:
+            finish(probe, STATE_FILTERED)
+
+    try:
+        while queue or in_flight:
+            while queue and len(in_flight) < max_in_flight:
+                port = queue.pop()
+                sock = socket.socket(family, socket.SOCK_DGRAM)
+                sock.setblocking(False)
+                try:
+                    sock.connect((ip, port))
+                except OSError:
+                    sock.close()
+                    results[port] = (STATE_FILTERED, None)
+                    continue
+                probe = _Probe(port, sock)
+                in_flight[port] = probe
+                selector.register(sock, selectors.EVENT_READ, probe)
+                send(probe)
+
+            if not in_flight:
+                continue
+
+            wait = min(p.deadline for p in in_flight.values()) - time.perf_counter()
+            for key, _ in selector.select(max(0.0, wait)):
+                probe = key.data
+                try:
+                    probe.sock.recv(4096)
+                    finish(probe, STATE_OPEN, (time.perf_counter() - probe.sent_at) * 1000)
+                except ConnectionRefusedError:
+                    finish(probe, STATE_CLOSED)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    # Host/red inalcanzable o administrativamente prohibido
+                    finish(probe, STATE_FILTERED)
+
+            now = time.perf_counter()
+            for probe in [p for p in in_flight.values() if p.deadline <= now]:
+                if probe.attempts > retries:
+                    finish(probe, STATE_OPEN_FILTERED)
+                else:
+                    send(probe)
+    finally:
+        for probe in list(in_flight.values()):
+            selector.unregister(probe.sock)
+            probe.sock.close()
+        selector.close()
+
+    return results
+
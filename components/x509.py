@@ -0,0 +1,236 @@
+"""
+Lector mínimo de certificados X.509 (DER)
+Extrae sujeto, emisor, SANs, validez, número de serie, algoritmo de firma y
+tipo/tamaño de la clave pública sin dependencias externas.
+
+ssl.getpeercert() solo decodifica el certificado cuando fue verificado; el
+inspector TLS no verifica (quiere ver también certificados inválidos), así
+que recibe el DER crudo y lo decodifica aquí.
+"""
+
+import ipaddress
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple
+
+# Tags DER
+TAG_BOOLEAN = 0x01
+TAG_INTEGER = 0x02
+TAG_BIT_STRING = 0x03
+TAG_OCTET_STRING = 0x04
+TAG_OID = 0x06
+TAG_UTC_TIME = 0x17
+TAG_GENERALIZED_TIME = 0x18
+TAG_SEQUENCE = 0x30
+TAG_SET = 0x31
+
+NAME_ATTRIBUTES = {
+    '2.5.4.3': 'CN', '2.5.4.6': 'C', '2.5.4.7': 'L', '2.5.4.8': 'ST',
+    '2.5.4.10': 'O', '2.5.4.11': 'OU', '2.5.4.5': 'serialNumber',
+    '1.2.840.113549.1.9.1': 'emailAddress'
+}
+
+SIGNATURE_ALGORITHMS = {
+    '1.2.840.113549.1.1.4': 'md5WithRSAEncryption',
+    '1.2.840.113549.1.1.5': 'sha1WithRSAEncryption',
+    '1.2.840.113549.1.1.10': 'rsassaPss',
+    '1.2.840.113549.1.1.11': 'sha256WithRSAEncryption',
+    '1.2.840.113549.1.1.12': 'sha384WithRSAEncryption',
+    '1.2.840.113549.1.1.13': 'sha512WithRSAEncryption',
+    '1.2.840.10045.4.1': 'ecdsa-with-SHA1',
+    '1.2.840.10045.4.3.2': 'ecdsa-with-SHA256',
+    '1.2.840.10045.4.3.3': 'ecdsa-with-SHA384',
+    '1.2.840.10045.4.3.4': 'ecdsa-with-SHA512',
+    '1.3.101.112': 'ed25519',
+    '1.3.101.113': 'ed448'
+}
+
+KEY_RSA = '1.2.840.113549.1.1.1'
+KEY_EC = '1.2.840.10045.2.1'
+KEY_TYPES = {KEY_RSA: 'RSA', KEY_EC: 'EC', '1.3.101.112': 'Ed25519', '1.3.101.113': 'Ed448'}
+EC_CURVES = {
+    '1.2.840.10045.3.1.7': ('prime256v1', 256),
+    '1.3.132.0.34': ('secp384r1', 384),
+    '1.3.132.0.35': ('secp521r1', 521)
+}
+
+EXT_SUBJECT_ALT_NAME = '2.5.29.17'
+EXT_BASIC_CONSTRAINTS = '2.5.29.19'
+
+
+class X509Error(Exception):
+    """Certificado mal formado"""
+
+
+def _read_tlv(data: bytes, offset: int) -> Tuple[int, int, int]:
+    """Lee un TLV; devuelve (tag, inicio del valor, fin del valor)"""
+    if offset + 2 > len(data):
+        raise X509Error("TLV truncado")
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        count = length & 0x7F
+        if count == 0 or count > 4 or offset + count > len(data):
+            raise X509Error("Longitud DER inválida")
+        length = int.from_bytes(data[offset:offset + count], 'big')
+        offset += count
+    end = offset + length
+    if end > len(data):
+        raise X509Error("Valor DER truncado")
+    return tag, offset, end
+
+
+def _children(data: bytes, start: int, end: int) -> List[Tuple[int, int, int]]:
+    """TLVs contenidos en un SEQUENCE/SET"""
+    items = []
+    while start < end:
+        tag, value_start, value_end = _read_tlv(data, start)
+        items.append((tag, value_start, value_end))
+        start = value_end
+    return items
+
+
+def _oid(value: bytes) -> str:
+    if not value:
+        raise X509Error("OID vacío")
+    parts = [value[0] // 40, value[0] % 40] if value[0] < 80 else [2, value[0] - 80]
+    number = 0
+    for byte in value[1:]:
+        number = (number << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(number)
+            number = 0
+    return '.'.join(str(p) for p in parts)
+
+
+def _string(tag: int, value: bytes) -> str:
+    if tag == 0x1E:  # BMPString
+        return value.decode('utf-16-be', errors='replace')
+    if tag == 0x1C:  # UniversalString
+        return value.decode('utf-32-be', errors='replace')
+    return value.decode('utf-8', errors='replace')
+
+
+def _time(tag: int, value: bytes) -> datetime:
+    text = value.decode('ascii').rstrip('Z')
+    if tag == TAG_UTC_TIME:
+        # Años 50-99 -> 19xx, 00-49 -> 20xx (RFC 5280)
+        year = int(text[:2])
+        text = f"{1900 + year if year >= 50 else 2000 + year}{text[2:]}"
+    fmt = '%Y%m%d%H%M%S' if len(text) >= 14 else '%Y%m%d%H%M'
+    return datetime.strptime(text[:14] if len(text) >= 14 else text, fmt).replace(tzinfo=timezone.utc)
+
+
+def _name(data: bytes, start: int, end: int) -> Dict[str, str]:
+    """Name (RDNSequence) -> {"CN": ..., "O": ...}"""
+    result: Dict[str, str] = {}
+    for _, set_start, set_end in _children(data, start, end):
+        for _, seq_start, seq_end in _children(data, set_start, set_end):
+            (oid_tag, oid_start, oid_end), (val_tag, val_start, val_end) = _children(data, seq_start, seq_end)[:2]
+            key = NAME_ATTRIBUTES.get(_oid(data[oid_start:oid_end]), _oid(data[oid_start:oid_end]))
+            value = _string(val_tag, data[val_start:val_end])
+            result[key] = f"{result[key]}, {value}" if key in result else value
+    return result
+
+
+def _algorithm(data: bytes, start: int, end: int) -> Tuple[str, Optional[str]]:
+    """AlgorithmIdentifier -> (OID, OID del parámetro si lo hay)"""
+    items = _children(data, start, end)
+    oid = _oid(data[items[0][1]:items[0][2]])
+    param = None
+    if len(items) > 1 and items[1][0] == TAG_OID:
+        param = _oid(data[items[1][1]:items[1][2]])
+    return oid, param
+
+
+def _public_key(data: bytes, start: int, end: int) -> Dict[str, Any]:
+    (alg_tag, alg_start, alg_end), (_, key_start, key_end) = _children(data, start, end)[:2]
+    oid, param = _algorithm(data, alg_start, alg_end)
+    key: Dict[str, Any] = {"type": KEY_TYPES.get(oid, oid), "bits": None}
+
+    if oid == KEY_RSA:
+        # BIT STRING (primer byte = bits sin usar) con SEQUENCE { módulo, exponente }
+        _, seq_start, seq_end = _read_tlv(data, key_start + 1)
+        (_, mod_start, mod_end) = _children(data, seq_start, seq_end)[0]
+        key["bits"] = int.from_bytes(data[mod_start:mod_end], 'big').bit_length()
+    elif oid == KEY_EC and param in EC_CURVES:
+        key["curve"], key["bits"] = EC_CURVES[param]
+    elif oid == '1.3.101.112':
+        key["bits"] = 256
+    elif oid == '1.3.101.113':
+        key["bits"] = 456
+    return key
+
+
+def _subject_alt_names(value: bytes) -> List[str]:
+    names = []
+    _, start, end = _read_tlv(value, 0)
+    for tag, item_start, item_end in _children(value, start, end):
+        raw = value[item_start:item_end]
+        if tag == 0x82:  # dNSName
+            names.append(f"DNS:{raw.decode('ascii', errors='replace')}")
+        elif tag == 0x87:  # iPAddress
+            try:
+                names.append(f"IP:{ipaddress.ip_address(raw)}")
+            except ValueError:
+                continue
+        elif tag == 0x81:  # rfc822Name
+            names.append(f"email:{raw.decode('ascii', errors='replace')}")
+        elif tag == 0x86:  # URI
+            names.append(f"URI:{raw.decode('ascii', errors='replace')}")
+    return names
+
+
+def parse_certificate(der: bytes) -> Dict[str, Any]:
+    """
+    Decodifica un certificado X.509 en DER
+
+    Returns:
+        Diccionario con subject, issuer, san, not_before, not_after (datetime
+        UTC), serial (hex), signature_algorithm, public_key e is_ca
+    """
+    try:
+        _, cert_start, cert_end = _read_tlv(der, 0)
+        (_, tbs_start, tbs_end), (_, sig_start, sig_end) = _children(der, cert_start, cert_end)[:2]
+        fields = _children(der, tbs_start, tbs_end)
+
+        # version [0] EXPLICIT es opcional
+        if fields[0][0] == 0xA0:
+            fields = fields[1:]
+        serial, _, issuer, validity, subject, spki = fields[:6]
+        extensions = next((f for f in fields[6:] if f[0] == 0xA3), None)
+
+        (nb_tag, nb_start, nb_end), (na_tag, na_start, na_end) = _children(der, validity[1], validity[2])[:2]
+        signature_oid, _ = _algorithm(der, sig_start, sig_end)
+
+        result: Dict[str, Any] = {
+            "subject": _name(der, subject[1], subject[2]),
+            "issuer": _name(der, issuer[1], issuer[2]),
+            "san": [],
+            "not_before": _time(nb_tag, der[nb_start:nb_end]),
+            "not_after": _time(na_tag, der[na_start:na_end]),
+            "serial": der[serial[1]:serial[2]].hex().lstrip('0') or '0',
+            "signature_algorithm": SIGNATURE_ALGORITHMS.get(signature_oid, signature_oid),
+            "public_key": _public_key(der, spki[1], spki[2]),
+            "is_ca": False
+        }
+
+        if extensions is not None:
+            _, ext_seq_start, ext_seq_end = _read_tlv(der, extensions[1])
+            for _, ext_start, ext_end in _children(der, ext_seq_start, ext_seq_end):
+                items = _children(der, ext_start, ext_end)
+                ext_oid = _oid(der[items[0][1]:items[0][2]])
+                value_tlv = items[-1]
+                value = der[value_tlv[1]:value_tlv[2]]
+                if ext_oid == EXT_SUBJECT_ALT_NAME:
+                    result["san"] = _subject_alt_names(value)
+                elif ext_oid == EXT_BASIC_CONSTRAINTS:
+                    _, bc_start, bc_end = _read_tlv(value, 0)
+                    bc = _children(value, bc_start, bc_end)
+                    result["is_ca"] = bool(bc and bc[0][0] == TAG_BOOLEAN and value[bc[0][1]] != 0)
+        return result
+
+    except X509Error:
+        raise
+    except (IndexError, ValueError, UnicodeDecodeError) as e:
+        raise X509Error(f"Certificado mal formado: {e}")
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+CLI de CyberTools (escáner, generador y analizador sin servidor web)
+
+    python cybertools.py --help
+"""
+
+import sys
+
+from components.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+"""
+Configuración de gunicorn para el modo ASGI (workers de uvicorn)
+
+    gunicorn -c gunicorn_asgi.conf.py asgi:app
+
+No se llama gunicorn.conf.py a propósito: gunicorn carga ese nombre
+automáticamente y cambiaría el arranque WSGI clásico (gunicorn app:app).
+"""
+
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Cada worker es un event loop: pocos procesos alcanzan para miles de
+# escaneos simultáneos (el límite real es SCAN_ASYNC_MAX_CONNECTIONS)
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 4)))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Un escaneo largo puede superar el timeout por defecto (30s)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
@@ -0,0 +1,106 @@
+// ===== DECODIFICACIÓN DE RESPUESTAS COMPACTAS =====
+// MessagePack (Accept: application/msgpack) y resultados columnares
+// (?layout=columnar). La descompresión gzip/zstd la hace el navegador.
+
+const textDecoder = new TextDecoder("utf-8");
+
+function decodeMsgpack(buffer) {
+  const bytes = new Uint8Array(buffer);
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  let pos = 0;
+
+  function str(length) {
+    const value = textDecoder.decode(bytes.subarray(pos, pos + length));
+    pos += length;
+    return value;
+  }
+
+  function bin(length) {
+    const value = bytes.slice(pos, pos + length);
+    pos += length;
+    return value;
+  }
+
+  function array(length) {
+    const items = new Array(length);
+    for (let i = 0; i < length; i++) items[i] = read();
+    return items;
+  }
+
+  function map(length) {
+    const obj = {};
+    for (let i = 0; i < length; i++) {
+      const key = read();
+      obj[key] = read();
+    }
+    return obj;
+  }
+
+  function read() {
+    const type = bytes[pos++];
+    if (type <= 0x7f) return type;                       // positive fixint
+    if (type >= 0xe0) return type - 0x100;               // negative fixint
+    if ((type & 0xf0) === 0x80) return map(type & 0x0f); // fixmap
+    if ((type & 0xf0) === 0x90) return array(type & 0x0f); // fixarray
+    if ((type & 0xe0) === 0xa0) return str(type & 0x1f); // fixstr
+
+    let value;
+    switch (type) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: value = bytes[pos]; pos += 1; return bin(value);
+      case 0xc5: value = view.getUint16(pos); pos += 2; return bin(value);
+      case 0xc6: value = view.getUint32(pos); pos += 4; return bin(value);
+      case 0xca: value = view.getFloat32(pos); pos += 4; return value;
+      case 0xcb: value = view.getFloat64(pos); pos += 8; return value;
+      case 0xcc: value = bytes[pos]; pos += 1; return value;
+      case 0xcd: value = view.getUint16(pos); pos += 2; return value;
+      case 0xce: value = view.getUint32(pos); pos += 4; return value;
+      case 0xcf: value = Number(view.getBigUint64(pos)); pos += 8; return value;
+      case 0xd0: value = view.getInt8(pos); pos += 1; return value;
+      case 0xd1: value = view.getInt16(pos); pos += 2; return value;
+      case 0xd2: value = view.getInt32(pos); pos += 4; return value;
+      case 0xd3: value = Number(view.getBigInt64(pos)); pos += 8; return value;
+      case 0xd9: value = bytes[pos]; pos += 1; return str(value);
+      case 0xda: value = view.getUint16(pos); pos += 2; return str(value);
+      case 0xdb: value = view.getUint32(pos); pos += 4; return str(value);
+      case 0xdc: value = view.getUint16(pos); pos += 2; return array(value);
+      case 0xdd: value = view.getUint32(pos); pos += 4; return array(value);
+      case 0xde: value = view.getUint16(pos); pos += 2; return map(value);
+      case 0xdf: value = view.getUint32(pos); pos += 4; return map(value);
+      default:
+        throw new Error(`MessagePack: tipo no soportado 0x${type.toString(16)}`);
+    }
+  }
+
+  return read();
+}
+
+// Lee una respuesta JSON o MessagePack según su Content-Type
+async function readApiResponse(response) {
+  const contentType = response.headers.get("content-type") || "";
+  if (contentType.includes("application/msgpack")) {
+    return decodeMsgpack(await response.arrayBuffer());
+  }
+  return response.json();
+}
+
+// {ports: {port: [...], service: [...], rtt_ms: [...]}} -> open_ports: [{port, service, response_time}]
+function expandColumnar(data) {
+  if (!data || data.layout !== "columnar") return data;
+  const columns = data.ports;
+  const names = Object.keys(columns);
+  const count = names.length ? columns[names[0]].length : 0;
+  const rows = [];
+  for (let i = 0; i < count; i++) {
+    const row = {};
+    names.forEach((name) => { row[name] = columns[name][i]; });
+    row.response_time = row.rtt_ms !== null && row.rtt_ms !== undefined ? `${row.rtt_ms}ms` : "?";
+    rows.push(row);
+  }
+  const expanded = { ...data, open_ports: rows };
+  delete expanded.ports;
+  delete expanded.layout;
+  return expanded;
+}
@@ -56,6 +56,10 @@ async function runPortScan() {
   const targetInput = document.getElementById("port-scan-input");
   const outputArea = document.getElementById("port-scan-output");
   const target = targetInput.value.trim();
+  const protocolSelect = document.getElementById("port-scan-protocol");
+  const protocol = protocolSelect ? protocolSelect.value : "tcp";
+  const tlsCheckbox = document.getElementById("port-scan-tls");
+  const tls = tlsCheckbox ? tlsCheckbox.checked : false;
 
   if (!target) {
     showError(outputArea, "Por favor, ingresa una dirección IP o dominio válido.");
@@ -65,19 +69,23 @@ async function runPortScan() {
   showLoading(outputArea, "Iniciando escaneo optimizado...");
 
   try {
-    const response = await fetch("/api/scan_ports", {
+    // Formato compacto: MessagePack con los puertos en columnas (ver codec.js)
+    const response = await fetch("/api/scan_ports?layout=columnar", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ target }),
+      headers: {
+        "Content-Type": "application/json",
+        "Accept": "application/msgpack, application/json"
+      },
+      body: JSON.stringify({ target, protocol, tls }),
     });
 
-    const result = await response.json();
+    const result = await readApiResponse(response);
 
     if (!response.ok) {
       throw new Error(result.message || result.error || "Error en el servidor");
     }
 
-    const data = result.data;
+    const data = expandColumnar(result.data);
 
     // Formateo mejorado con métricas de rendimiento
     let resultText = `╔══════════════════════════════════════╗
@@ -86,6 +94,7 @@ async function runPortScan() {
 
 🎯 Target: ${data.target}
 🌐 IP: ${data.ip}
+📡 Protocolo: ${(data.protocol || "tcp").toUpperCase()}
 ⏱️  Tiempo total: ${data.scan_time}
 📊 Puertos escaneados: ${data.scanned_ports}
 ✅ Puertos abiertos: ${data.open_count || 0}
@@ -103,6 +112,19 @@ async function runPortScan() {
         const service = port.service || "unknown";
         const time = port.response_time || "?";
         resultText += `🔓 Puerto ${String(port.port).padEnd(6)} │ ${service.padEnd(15)} │ ${time}\n`;
+        if (port.tls) {
+          const cert = port.tls.certificate || {};
+          resultText += `   🔒 ${port.tls.version} │ ${port.tls.cipher}\n`;
+          if (cert.subject) {
+            resultText += `   📜 ${cert.subject.CN || "?"} (emisor: ${(cert.issuer && cert.issuer.CN) || "?"}) │ vence ${cert.not_after} (${cert.days_left} días)\n`;
+          }
+          if (cert.san && cert.san.length > 0) {
+            resultText += `   🏷️  ${cert.san.join(", ")}\n`;
+          }
+          (port.tls.weak || []).forEach((flag) => {
+            resultText += `   ⚠️  ${flag}\n`;
+          });
+        }
       });
     } else {
       resultText += `╔════════════════════════════════════╗
@@ -112,6 +134,32 @@ async function runPortScan() {
 ✓ Sistema bien protegido o filtrado`;
     }
 
+    // UDP: puertos sin respuesta (abiertos o filtrados)
+    if (data.open_filtered_ports && data.open_filtered_ports.length > 0) {
+      resultText += `\n\n❔ Sin respuesta (open|filtered): ${data.open_filtered_ports.join(", ")}`;
+    }
+
+    // Cambios respecto del escaneo anterior (historial)
+    const changes = data.history && data.history.changes;
+    if (changes && !changes.first_scan) {
+      resultText += `\n\n🕑 Desde el escaneo anterior (${changes.from_scan.timestamp}):\n`;
+      if (!changes.changed) {
+        resultText += `   Sin cambios\n`;
+      }
+      changes.opened.forEach((p) => {
+        resultText += `   ➕ Puerto ${p.port} abierto (${p.service || "unknown"})\n`;
+      });
+      changes.closed.forEach((p) => {
+        resultText += `   ➖ Puerto ${p.port} cerrado\n`;
+      });
+      changes.service_changed.forEach((p) => {
+        resultText += `   🔁 Puerto ${p.port}: ${p.before || "?"} → ${p.after || "?"}\n`;
+      });
+      (changes.newly_scanned || []).forEach((p) => {
+        resultText += `   🔎 Puerto ${p.port} abierto (no sondeado antes)\n`;
+      });
+    }
+
     resultText += `
 
 📅 ${data.timestamp}`;
@@ -418,10 +466,15 @@ function setupFileUpload() {
   });
 }
 
+// Archivos mayores se suben por partes (/api/uploads)
+const DIRECT_UPLOAD_LIMIT = 16 * 1024 * 1024;
+const CHUNKED_UPLOAD_LIMIT = 2 * 1024 * 1024 * 1024;
+const CHUNK_RETRIES = 3;
+
 function handleFileSelect(file) {
-  // Validar tamaño (16MB)
-  if (file.size > 16 * 1024 * 1024) {
-    showNotification("Archivo muy grande (máx 16MB)", "error");
+  // Validar tamaño (más de 16MB: subida por partes)
+  if (file.size > CHUNKED_UPLOAD_LIMIT) {
+    showNotification("Archivo muy grande (máx 2GB)", "error");
     return;
   }
 
@@ -460,6 +513,84 @@ function removeFile() {
   if (fileSelected) fileSelected.style.display = "none";
 }
 
+async function readJsonResponse(response) {
+  // Verificar si la respuesta es JSON
+  const contentType = response.headers.get("content-type");
+  if (!contentType || !(contentType.includes("application/json") || contentType.includes("application/msgpack"))) {
+    throw new Error("Respuesta del servidor no es JSON. Verifica que el servidor esté corriendo.");
+  }
+
+  const result = await readApiResponse(response);
+
+  if (!response.ok) {
+    const error = new Error(result.error || result.message || "Error analizando archivo");
+    error.status = response.status;
+    error.offset = result.offset;
+    throw error;
+  }
+  return result;
+}
+
+async function uploadInChunks(file, outputArea) {
+  const upload = await readJsonResponse(await fetch("/api/uploads", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ filename: file.name, size: file.size })
+  }));
+
+  let offset = upload.offset;
+  let retries = 0;
+  let early = null;
+
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + upload.chunk_size);
+    try {
+      const status = await readJsonResponse(await fetch(`/api/uploads/${upload.upload_id}`, {
+        method: "PUT",
+        headers: { "Upload-Offset": String(offset), "Content-Type": "application/octet-stream" },
+        body: chunk
+      }));
+      offset = status.offset;
+      retries = 0;
+      if (status.early_result && status.early_result.status === "ready") {
+        early = status.early_result;
+      }
+    } catch (error) {
+      if (error.status === 409 && error.offset !== undefined) {
+        offset = error.offset;  // Continuar desde lo que el servidor ya tiene
+        continue;
+      }
+      if (error.status !== undefined || ++retries > CHUNK_RETRIES) {
+        throw error;
+      }
+      // Corte de red: preguntar el offset real y reanudar
+      const status = await readJsonResponse(await fetch(`/api/uploads/${upload.upload_id}`));
+      offset = status.offset;
+    }
+
+    const percent = Math.floor((offset / file.size) * 100);
+    if (early) {
+      // Los metadatos de la cabecera ya están: mostrarlos mientras sigue la subida
+      const exif = early.data.metadata.exif || {};
+      const lines = Object.entries(exif).slice(0, 15).map(([k, v]) => `${k}: ${v}`);
+      showResult(outputArea, `⏳ Subiendo por partes... ${percent}%
+
+🔍 METADATOS PRELIMINARES (cabecera)
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+${lines.join("\n").replace(/</g, "&lt;") || "Sin EXIF en la cabecera"}`);
+    } else {
+      showLoading(outputArea, `Subiendo por partes... ${percent}%`);
+    }
+  }
+
+  showLoading(outputArea, "Analizando metadatos del archivo...");
+  const deep = document.getElementById("metadata-deep").checked ? "?deep=1" : "";
+  return readJsonResponse(await fetch(`/api/uploads/${upload.upload_id}/complete${deep}`, {
+    method: "POST",
+    headers: { "Accept": "application/msgpack, application/json" }
+  }));
+}
+
 async function analyzeMetadata() {
   const outputArea = document.getElementById("metadata-output");
 
@@ -472,24 +603,22 @@ async function analyzeMetadata() {
   showLoading(outputArea, "Analizando metadatos del archivo...");
 
   try {
-    const formData = new FormData();
-    formData.append("file", selectedFile);
-
-    const response = await fetch("/api/analyze_metadata", {
-      method: "POST",
-      body: formData
-    });
-
-    // Verificar si la respuesta es JSON
-    const contentType = response.headers.get("content-type");
-    if (!contentType || !contentType.includes("application/json")) {
-      throw new Error("Respuesta del servidor no es JSON. Verifica que el servidor esté corriendo.");
-    }
-
-    const result = await response.json();
+    let result;
+    if (selectedFile.size > DIRECT_UPLOAD_LIMIT) {
+      result = await uploadInChunks(selectedFile, outputArea);
+    } else {
+      const formData = new FormData();
+      formData.append("file", selectedFile);
+      if (document.getElementById("metadata-deep").checked) {
+        formData.append("deep", "1");
+      }
 
-    if (!response.ok) {
-      throw new Error(result.error || result.message || "Error analizando archivo");
+      const response = await fetch("/api/analyze_metadata", {
+        method: "POST",
+        headers: { "Accept": "application/msgpack, application/json" },
+        body: formData
+      });
+      result = await readJsonResponse(response);
     }
 
     const data = result.data;
@@ -504,8 +633,10 @@ async function analyzeMetadata() {
 Nombre: ${data.file_info.filename}
 Tamaño: ${data.file_info.size}
 Tipo: ${data.file_type.toUpperCase()}
+Formato real: ${(data.file_info.detected_format || '?').toUpperCase()}
 MIME: ${data.file_info.mime_type}
 Extensión: ${data.file_info.extension}
+Caché: ${data.cache_hit ? 'Sí (resultado reutilizado)' : 'No'}
 
 📅 FECHAS
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -579,6 +710,59 @@ Nombres: ${meta.sheet_names.join(', ')}
         }
       }
 
+      // Ubicación GPS decodificada
+      if (meta.gps) {
+        const gps = meta.gps;
+        output += `
+📍 UBICACIÓN GPS
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Coordenadas: ${gps.latitude}, ${gps.longitude}
+`;
+        if (gps.nearest_place) {
+          const place = gps.nearest_place;
+          output += `Cerca de: ${place.name}, ${place.country} (a ${place.distance_km} km)
+`;
+        }
+        if (gps.altitude_m !== undefined) {
+          output += `Altitud: ${gps.altitude_m} m
+`;
+        }
+        if (gps.timestamp) {
+          output += `Hora GPS: ${gps.timestamp}
+`;
+        }
+        output += `Mapa: https://www.openstreetmap.org/?mlat=${gps.latitude}&mlon=${gps.longitude}#map=14/${gps.latitude}/${gps.longitude}
+`;
+      }
+
+      // Contenido incrustado (análisis profundo)
+      if (meta.embedded) {
+        const embedded = meta.embedded;
+        output += `
+📦 CONTENIDO INCRUSTADO
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Elementos: ${embedded.count} (analizados: ${embedded.analyzed})
+`;
+        for (const item of embedded.items) {
+          output += `• ${item.name} [${item.format || item.source}]`;
+          if (item.error) {
+            output += ` ⚠️ ${item.error}`;
+          } else if (item.metadata && item.metadata.gps) {
+            const place = item.metadata.gps.nearest_place;
+            output += ` 📍 ${item.metadata.gps.latitude}, ${item.metadata.gps.longitude}`;
+            if (place) {
+              output += ` (${place.name}, ${place.country})`;
+            }
+          }
+          output += `
+`;
+        }
+        if (embedded.truncated) {
+          output += `Análisis incompleto: ${embedded.truncated}
+`;
+        }
+      }
+
       // EXIF
       if (meta.exif && meta.exif !== null) {
         if (typeof meta.exif === 'object' && Object.keys(meta.exif).length > 0) {
@@ -667,3 +851,67 @@ Análisis completado: ${data.timestamp}`;
     showNotification("Error en el análisis - Verifica la consola", "error");
   }
 }
+
+
+// ======== ELIMINACIÓN DE METADATOS ========
+async function sanitizeMetadata() {
+  const outputArea = document.getElementById("metadata-output");
+
+  if (!selectedFile) {
+    showError(outputArea, "❌ Por favor, selecciona un archivo primero");
+    showNotification("Selecciona un archivo para limpiar", "error");
+    return;
+  }
+
+  showLoading(outputArea, "Eliminando metadatos del archivo...");
+
+  try {
+    const formData = new FormData();
+    formData.append("file", selectedFile);
+
+    const response = await fetch("/api/sanitize", {
+      method: "POST",
+      body: formData
+    });
+
+    if (!response.ok) {
+      const result = await response.json();
+      throw new Error(result.error || "Error limpiando archivo");
+    }
+
+    const report = JSON.parse(response.headers.get("X-Sanitize-Report") || "{}");
+    const blob = await response.blob();
+
+    // Descargar la copia limpia
+    const link = document.createElement("a");
+    link.href = URL.createObjectURL(blob);
+    link.download = `clean_${selectedFile.name}`;
+    document.body.appendChild(link);
+    link.click();
+    link.remove();
+    URL.revokeObjectURL(link.href);
+
+    let output = `╔══════════════════════════════════════════════╗
+║        METADATOS ELIMINADOS                  ║
+╚══════════════════════════════════════════════╝
+
+Formato: ${(report.format || '?').toUpperCase()}
+Tamaño original: ${report.original_size} bytes
+Tamaño limpio: ${report.sanitized_size} bytes
+
+🧹 ELEMENTOS ELIMINADOS
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+`;
+    (report.removed || []).forEach(item => {
+      output += `${item}
+`;
+    });
+
+    showResult(outputArea, output);
+    showNotification("Copia limpia descargada", "success");
+
+  } catch (error) {
+    showError(outputArea, `❌ Error: ${error.message}`);
+    showNotification("Error limpiando el archivo", "error");
+  }
+}
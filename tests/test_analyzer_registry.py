@@ -0,0 +1,88 @@
+"""
+Pruebas de analizadores externos que añaden formatos nuevos
+
+    python -m pytest tests/
+"""
+
+import os
+import time
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from components.analyzer_registry import AnalyzerRegistry, registry
+from components.analyze_metadata import analyze_metadata
+from components.file_signatures import sniff_file
+
+
+def _analyze_fake(analyzer, file_path):
+    return {"plugin": "cybertest"}
+
+
+# Formato inventado: 'CYBT' en el offset 4
+registry.register('image', _analyze_fake, formats=('cybertest',),
+                  signatures=[(4, b'CYBT')], priority=10, name='cybertest')
+
+
+class PluginFormatTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.cybertest')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'\x00\x00\x00\x10CYBT' + bytes(64))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_signature_is_sniffed(self):
+        self.assertEqual(sniff_file(self.path), ('image', 'cybertest'))
+
+    def test_new_format_is_accepted_and_analyzed(self):
+        from app import is_supported_content, supported_formats
+
+        self.assertEqual(is_supported_content(self.path), (True, 'cybertest'))
+        self.assertIn('cybertest', supported_formats())
+        result = analyze_metadata(self.path)
+        self.assertEqual(result["metadata"]["plugin"], "cybertest")
+
+    def test_signatures_need_a_single_format(self):
+        with self.assertRaises(ValueError):
+            registry.register('image', _analyze_fake, signatures=[(0, b'XX')])
+
+
+class _EntryPoint:
+    """Entry point falso que devuelve su función register"""
+
+    def __init__(self, name, register):
+        self.name = name
+        self._register = register
+
+    def load(self):
+        return self._register
+
+
+class EntryPointLoadingTest(unittest.TestCase):
+
+    def test_other_threads_wait_for_plugins_to_load(self):
+        fresh = AnalyzerRegistry()
+
+        def slow_plugin(reg):
+            # Un plugin que consulta el registro mientras se carga
+            reg.specs()
+            time.sleep(0.2)
+            reg.register('image', _analyze_fake, formats=('slow',), name='slow')
+
+        with mock.patch('importlib.metadata.entry_points',
+                        return_value=[_EntryPoint('slow', slow_plugin)]):
+            loader = threading.Thread(target=fresh.load_plugins)
+            loader.start()
+            time.sleep(0.05)
+            seen = [spec.name for spec in fresh.specs()]
+            loader.join()
+
+        self.assertEqual(seen, ['slow'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+Pruebas del lector OLE2 frente a contenedores corruptos
+
+    python -m pytest tests/
+"""
+
+import io
+import struct
+import unittest
+
+from components.ole2 import OleFile, OleError, OLE2_SIGNATURE, ENDOFCHAIN, FREESECT
+
+
+def _header(num_fat=1, first_dir=0, first_difat=ENDOFCHAIN, num_difat=0, difat=(1,)):
+    header = bytearray(512)
+    header[:8] = OLE2_SIGNATURE
+    struct.pack_into('<HH', header, 0x1E, 9, 6)
+    struct.pack_into('<IIIIIIII', header, 0x2C, num_fat, first_dir, 0, 4096,
+                     ENDOFCHAIN, 0, first_difat, num_difat)
+    entries = list(difat) + [FREESECT] * (109 - len(difat))
+    struct.pack_into('<109I', header, 0x4C, *entries)
+    return bytes(header)
+
+
+class OleFileTest(unittest.TestCase):
+
+    def test_self_referencing_fat_raises(self):
+        # fat[0] = 0: el directorio apunta a sí mismo indefinidamente
+        fat = struct.pack('<128I', 0, *([FREESECT] * 127))
+        data = _header() + b'\0' * 512 + fat
+        with self.assertRaisesRegex(OleError, 'ciclo'):
+            OleFile(io.BytesIO(data))
+
+    def test_truncated_difat_sector_raises(self):
+        data = _header(first_difat=1, num_difat=1) + b'\0' * 512 + b'\0' * 100
+        with self.assertRaises(OleError):
+            OleFile(io.BytesIO(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
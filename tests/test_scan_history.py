@@ -0,0 +1,64 @@
+"""
+Pruebas de los cambios entre escaneos del historial
+
+    python -m pytest tests/
+"""
+
+import os
+import tempfile
+import unittest
+
+from components.scan_history import ScanHistory
+
+
+def _result(*open_ports):
+    return {"target": "example.com", "ip": "93.184.216.34", "scan_time": "1.0s",
+            "open_ports": [{"port": p, "service": "http", "response_time": "5.0ms"} for p in open_ports]}
+
+
+class DiffTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.history = ScanHistory(os.path.join(self.dir.name, 'history.db'))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_port_not_probed_before_is_not_reported_as_opened(self):
+        self.history.record(_result(80), [22, 80, 443])
+        self.history.record(_result(80, 8443), [8443, 80])
+
+        diff = self.history.diff("example.com")
+        self.assertFalse(diff["changed"])
+        self.assertEqual(diff["opened"], [])
+        self.assertEqual(diff["newly_scanned"], [{"port": 8443, "service": "http"}])
+
+    def test_opened_and_closed_between_common_scans(self):
+        self.history.record(_result(80), [22, 80, 443])
+        self.history.record(_result(443), [22, 80, 443])
+
+        diff = self.history.diff("example.com")
+        self.assertTrue(diff["changed"])
+        self.assertEqual([p["port"] for p in diff["opened"]], [443])
+        self.assertEqual([p["port"] for p in diff["closed"]], [80])
+        self.assertEqual(diff["newly_scanned"], [])
+
+    def test_known_state_keeps_latest_probe_of_each_port(self):
+        self.history.record(_result(80, 443), [22, 80, 443])
+        self.history.record(_result(22), [22, 80])
+
+        state = self.history.known_state("example.com")
+        self.assertEqual({port: known["open"] for port, known in state.items()},
+                         {22: True, 80: False, 443: True})
+        self.assertEqual(state[22]["service"], "http")
+        self.assertIsNone(state[80]["service"])
+
+    def test_prune_drops_old_scans_from_known_state(self):
+        self.history.record(_result(80), [80])
+        self.assertEqual(self.history.prune(-1), 1)
+        self.assertEqual(self.history.known_state("example.com"), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
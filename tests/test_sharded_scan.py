@@ -0,0 +1,83 @@
+"""
+Pruebas del presupuesto de conexiones compartido del escaneo por shards
+
+    python -m pytest tests/
+"""
+
+import socket
+import asyncio
+import unittest
+
+from components.sharded_scan import RateBudget, _RateGate, _ShardEngine
+
+
+class _CountingBudget(RateBudget):
+    """RateBudget que cuenta los tokens reservados"""
+
+    def __init__(self, rate: float):
+        super().__init__(rate)
+        self.reserved = 0
+
+    def reserve(self, tokens: int) -> float:
+        self.reserved += tokens
+        return super().reserve(tokens)
+
+
+class _Conn:
+    """Extremo del canal que solo guarda lo enviado"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message) -> None:
+        self.sent.append(message)
+
+
+class RateGateTest(unittest.TestCase):
+
+    def setUp(self):
+        # Tarpit: con el backlog lleno cada connect() queda colgado hasta el
+        # timeout, así el semáforo del worker se satura como en un barrido real
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(0)
+        self.filler = socket.create_connection(self.listener.getsockname())
+        self.port = self.listener.getsockname()[1]
+
+    def tearDown(self):
+        self.filler.close()
+        self.listener.close()
+
+    def test_concurrent_acquires_each_take_a_token(self):
+        budget = _CountingBudget(1000)
+        gate = _RateGate(budget)
+
+        async def run():
+            await asyncio.gather(*(gate.acquire() for _ in range(100)))
+
+        asyncio.run(run())
+        self.assertEqual(budget.reserved, 100)
+        self.assertEqual(gate.tokens, 0)
+
+    def test_two_shards_on_one_worker_charge_budget_per_connection(self):
+        budget = _CountingBudget(1000)
+        conn = _Conn()
+        engine_config = {"timeout": 0.03, "tls": False, "concurrency": 30}
+        ports = [self.port] * 300
+
+        async def run():
+            engine = _ShardEngine(conn, engine_config, budget)
+            await asyncio.gather(engine.run_shard(0, '127.0.0.1', ports, None),
+                                 engine.run_shard(1, '127.0.0.1', ports, None))
+            return engine.gate
+
+        gate = asyncio.run(run())
+
+        self.assertEqual(sorted(message[1] for message in conn.sent), [0, 1])
+        # Cada conexión salió de un token reservado en el presupuesto común
+        self.assertEqual(budget.reserved - gate.tokens, 2 * len(ports))
+        self.assertGreaterEqual(gate.tokens, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Pruebas de la caché negativa de la inspección TLS
+
+    python -m pytest tests/
+"""
+
+import ssl
+import socket
+import threading
+import unittest
+
+from components import tls_inspect
+
+
+class _Server:
+    """Servidor local de una conexión: responde texto plano o se queda callado"""
+
+    def __init__(self, reply: bytes = b''):
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(1)
+        self.port = self.listener.getsockname()[1]
+        self.reply = reply
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self) -> None:
+        conn, _ = self.listener.accept()
+        with conn:
+            if self.reply:
+                conn.recv(4096)
+                conn.sendall(self.reply)
+            self.done.wait(5)
+
+    def close(self) -> None:
+        self.done.set()
+        self.thread.join()
+        self.listener.close()
+
+
+class NegativeCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        tls_inspect.cache.clear()
+
+    def _inspect(self, server: _Server):
+        sock = socket.create_connection(('127.0.0.1', server.port))
+        try:
+            return tls_inspect.inspect_socket(sock, '127.0.0.1', server.port, None, timeout=0.3)
+        finally:
+            sock.close()
+            server.close()
+
+    def test_plaintext_reply_is_cached_as_no_tls(self):
+        server = _Server(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n')
+        self.assertIsNone(self._inspect(server))
+        self.assertEqual(tls_inspect.cache.get(tls_inspect.cache_key('127.0.0.1', server.port, None)), {})
+
+    def test_handshake_timeout_is_not_cached(self):
+        server = _Server()
+        self.assertIsNone(self._inspect(server))
+        self.assertIsNone(tls_inspect.cache.get(tls_inspect.cache_key('127.0.0.1', server.port, None)))
+
+    def test_other_handshake_errors_are_not_cached(self):
+        key = tls_inspect.cache_key('127.0.0.1', 1, None)
+        alert = ssl.SSLError(1, '[SSL: TLSV1_ALERT_INTERNAL_ERROR] tlsv1 alert internal error')
+        alert.reason = 'TLSV1_ALERT_INTERNAL_ERROR'
+        for error in (alert, ValueError("hostname inválido"), OSError("host unreachable")):
+            tls_inspect._handshake_failed(key, '127.0.0.1', 1, error)
+            self.assertIsNone(tls_inspect.cache.get(key))
+
+
+if __name__ == '__main__':
+    unittest.main()